@@ -0,0 +1,277 @@
+# CF-003: Shared, mtime-invalidated project config loader
+# One module parses embeddings.json / config.yaml at most once per (mtime, size)
+# per process; EM-001, EM-003, DM-006, CF-001 and CF-002 read through it.
+# 11 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+CONF = commands + "/config.js"
+
+create("CF-003: project-config module",
+    PROJECT_CONFIG,
+    """// project-config.js — added by claude-flow patch CF-003.
+// Parses .claude-flow/embeddings.json and .claude-flow/config.yaml at most once
+// per (path, mtime, size) per process. Every reader shares the parsed object,
+// so an unchanged file costs one stat() per access.
+import { statSync, readFileSync } from 'fs';
+import { join, resolve } from 'path';
+
+const cache = new Map();
+
+// CF-002's two-level `key: value` parser (sections one level deep, quotes stripped).
+// Lines it cannot read are skipped; with PROBLEMS, each is also reported there
+// as "line N: reason" so strict callers can reject the file.
+export function parseYaml(content, problems = null) {
+    const config = {};
+    let currentSection = null;
+    let blockIndent = -1; // inside a `key: |` / `key: >` block scalar
+    const lines = content.split('\n');
+    const report = (i, reason) => { if (problems) problems.push(`line ${i + 1}: ${reason}`); };
+    for (let i = 0; i < lines.length; i++) {
+        const line = lines[i];
+        const trimmed = line.trim();
+        if (!trimmed || trimmed.startsWith('#')) continue;
+        const indent = line.match(/^\s*/)[0].length;
+        if (blockIndent >= 0 && indent > blockIndent) continue;
+        blockIndent = -1;
+        if (/^ *\t/.test(line)) { report(i, 'tab in indentation'); continue; }
+        if (trimmed === '-' || trimmed.startsWith('- ')) continue; // sequence item: not read
+        if (!trimmed.includes(':')) { report(i, 'expected "key: value"'); continue; }
+        const [key, ...rest] = trimmed.split(':');
+        const value = rest.join(':').trim();
+        if (!key.trim()) { report(i, 'missing key'); continue; }
+        if (/^["']/.test(value) && !/^(?:"[^"]*"|'[^']*')\\s*(#.*)?$/.test(value)) { report(i, 'unterminated quoted value'); continue; }
+        if (/^[|>][-+0-9]*$/.test(value)) { blockIndent = indent; continue; }
+        if (indent === 0) {
+            if (value && value !== '') {
+                config[key.trim()] = value.replace(/^["']|["']$/g, '');
+            } else {
+                currentSection = key.trim();
+                config[currentSection] = {};
+            }
+        } else if (currentSection && indent > 0) {
+            if (value && value !== '') {
+                config[currentSection][key.trim()] = value.replace(/^["']|["']$/g, '');
+            }
+        } else {
+            report(i, 'indented line outside a section');
+        }
+    }
+    return config;
+}
+
+// Cache entry for FILE, or null if absent. A YAML file with unreadable lines
+// keeps its parsed value and a SyntaxError; a malformed JSON file only the error.
+function loadConfigFile(file) {
+    const full = resolve(file);
+    let st;
+    try { st = statSync(full); } catch { cache.delete(full); return null; }
+    let hit = cache.get(full);
+    if (!hit || hit.mtimeMs !== st.mtimeMs || hit.size !== st.size) {
+        hit = { mtimeMs: st.mtimeMs, size: st.size, value: null, error: null };
+        try {
+            const content = readFileSync(full, 'utf8');
+            if (/\.ya?ml$/.test(full)) {
+                const problems = [];
+                hit.value = parseYaml(content, problems);
+                if (problems.length) hit.error = new SyntaxError(`${full}: ${problems.join('; ')}`);
+            } else {
+                hit.value = JSON.parse(content);
+            }
+        } catch (error) { hit.error = error; }
+        cache.set(full, hit);
+    }
+    return hit;
+}
+
+// Parsed FILE (JSON, or YAML by extension); null if absent. Throws the
+// (cached) parse error for a malformed file.
+export function readConfigFile(file) {
+    const hit = loadConfigFile(file);
+    if (hit?.error) throw hit.error;
+    return hit ? hit.value : null;
+}
+
+// Lenient: whatever parsed, {} for an absent or unparsable file.
+function readOptional(file) {
+    return loadConfigFile(file)?.value || {};
+}
+
+function number(value, fallback) {
+    const n = typeof value === 'number' ? value : parseFloat(value);
+    return Number.isFinite(n) ? n : fallback;
+}
+
+export function readEmbeddingsConfig(root = process.cwd()) {
+    return readOptional(join(root, '.claude-flow', 'embeddings.json'));
+}
+
+// config.yaml, or config.yml only when there is no config.yaml at all.
+export function readProjectConfig(root = process.cwd()) {
+    const yaml = loadConfigFile(join(root, '.claude-flow', 'config.yaml'));
+    return yaml ? yaml.value || {} : readOptional(join(root, '.claude-flow', 'config.yml'));
+}
+
+// EM-001 semantics: MiniLM/384 unless embeddings.json names a model (then dimension || 768).
+export function getEmbeddingModel(root) {
+    const emb = readEmbeddingsConfig(root);
+    if (!emb.model) return { model: 'all-MiniLM-L6-v2', dimension: 384, configured: false };
+    return { model: emb.model, dimension: number(emb.dimension, 768), configured: true };
+}
+
+export function getHNSWConfig(root) {
+    const emb = readEmbeddingsConfig(root);
+    const hnsw = emb.hnsw || {};
+    return {
+        dimensions: number(emb.dimension, 768),
+        m: number(hnsw.m, null),
+        efConstruction: number(hnsw.efConstruction, null),
+        efSearch: number(hnsw.efSearch, null),
+        tombstoneCompactRatio: number(hnsw.tombstoneCompactRatio, null),
+    };
+}
+
+export function getEmbeddingCacheConfig(root) {
+    const cacheConfig = readEmbeddingsConfig(root).cache || {};
+    return { maxMB: number(cacheConfig.maxMB, null) };
+}
+
+// daemon: section of config.yaml; null = keep the daemon's built-in default.
+export function getDaemonConfig(root) {
+    const daemon = readProjectConfig(root).daemon || {};
+    return {
+        maxCpuLoad: number(daemon.maxCpuLoad, null),
+        minFreeMemoryPercent: number(daemon.minFreeMemoryPercent, null),
+        maxConcurrent: number(daemon.maxConcurrent, null),
+    };
+}
+""")
+
+# ── memory-initializer.js ──
+append("CF-003: memory-initializer imports project-config",
+    MI,
+    """
+// CF-003: shared mtime-cached project config
+import { getEmbeddingModel as projectEmbeddingModel, getHNSWConfig as projectHNSWConfig, getEmbeddingCacheConfig as projectEmbeddingCacheConfig } from '../services/project-config.js';
+""")
+
+patch("CF-003: model from project-config",
+    MI,
+    """        let modelName = 'all-MiniLM-L6-v2';
+        let modelDimensions = 384;
+        try {
+            const embConfigPath = path.join(process.cwd(), '.claude-flow', 'embeddings.json');
+            if (fs.existsSync(embConfigPath)) {
+                const embConfig = JSON.parse(fs.readFileSync(embConfigPath, 'utf-8'));
+                if (embConfig.model) {
+                    modelName = embConfig.model;
+                    modelDimensions = embConfig.dimension || 768;
+                }
+            }
+        } catch { /* use defaults */ }""",
+    """        const { model: modelName, dimension: modelDimensions } = projectEmbeddingModel();""",
+    replaces="8: config-driven model")
+
+patch("CF-003: HNSW dims from project-config",
+    MI,
+    """    if (!dimensions) {
+        try {
+            const embConfigPath = path.join(process.cwd(), '.claude-flow', 'embeddings.json');
+            if (fs.existsSync(embConfigPath)) {
+                const embConfig = JSON.parse(fs.readFileSync(embConfigPath, 'utf-8'));
+                dimensions = embConfig.dimension || 768;
+            }
+        } catch { /* ignore */ }
+        dimensions = dimensions || 768;
+    }""",
+    """    if (!dimensions) {
+        dimensions = projectHNSWConfig().dimensions;
+    }""",
+    replaces="9: HNSW dim default")
+
+patch("CF-003: embedding cache cap from project-config",
+    MI,
+    """    let maxBytes = EMBEDDING_CACHE_DEFAULT_MB * 1024 * 1024;
+    try {
+        const embConfig = JSON.parse(fs.readFileSync(path.join(process.cwd(), '.claude-flow', 'embeddings.json'), 'utf-8'));
+        if (embConfig.cache?.maxMB > 0) maxBytes = embConfig.cache.maxMB * 1024 * 1024;
+    } catch { /* defaults */ }""",
+    """    const maxBytes = (projectEmbeddingCacheConfig().maxMB || EMBEDDING_CACHE_DEFAULT_MB) * 1024 * 1024;""",
+    replaces="EM-003: embedding cache")
+
+patch("CF-003: tombstone ratio from project-config",
+    MI,
+    """    const threshold = options.threshold ?? HNSW_TOMBSTONE_COMPACT_RATIO;""",
+    """    const threshold = options.threshold ?? projectHNSWConfig().tombstoneCompactRatio ?? HNSW_TOMBSTONE_COMPACT_RATIO;""",
+    replaces="GV-002: tombstone journal")
+
+# ── worker-daemon.js ──
+patch("CF-003: consolidate watermark config",
+    WD,
+    """            let embConfig = {};
+            try { embConfig = JSON.parse(readFileSync(join(this.projectRoot, '.claude-flow', 'embeddings.json'), 'utf-8')); } catch { /* defaults */ }""",
+    """            const { readEmbeddingsConfig } = await import('./project-config.js');
+            const embConfig = readEmbeddingsConfig(this.projectRoot);""",
+    replaces="DM-006: consolidate from watermark")
+
+# ── commands/config.js ──
+patch("CF-003: readYamlConfig delegates",
+    CONF,
+    """function readYamlConfig() {
+    const configPath = join(process.cwd(), '.claude-flow', 'config.yaml');
+    if (!existsSync(configPath)) { return {}; }
+    try {
+        const content = readFileSync(configPath, 'utf8');
+        const config = {};
+        const lines = content.split('\\n');
+        let currentSection = null;
+        for (const line of lines) {
+            const trimmed = line.trim();
+            if (!trimmed || trimmed.startsWith('#')) continue;
+            if (!trimmed.includes(':')) continue;
+            const indent = line.match(/^\\s*/)[0].length;
+            if (indent === 0) {
+                const [key, ...rest] = trimmed.split(':');
+                const value = rest.join(':').trim();
+                if (value && value !== '') {
+                    config[key.trim()] = value.replace(/^["']|["']$/g, '');
+                } else {
+                    currentSection = key.trim();
+                    config[currentSection] = {};
+                }
+            } else if (currentSection && indent > 0) {
+                const [key, ...rest] = trimmed.split(':');
+                const value = rest.join(':').trim();
+                if (value && value !== '') {
+                    config[currentSection][key.trim()] = value.replace(/^["']|["']$/g, '');
+                }
+            }
+        }
+        return config;
+    } catch (error) { return {}; }
+}""",
+    """function readYamlConfig() {
+    // CF-003: shared parser, cached by mtime/size
+    return readProjectConfig();
+}""",
+    replaces="16a: config.js add readYamlConfig")
+
+append("CF-003: config.js imports project-config",
+    CONF,
+    """
+// CF-003: shared mtime-cached project config
+import { readProjectConfig } from '../services/project-config.js';
+""")
+
+# ── commands/doctor.js ──
+patch("CF-003: doctor validates through project-config",
+    DOC,
+    "                if (configPath.endsWith('.json')) { JSON.parse(content); }",
+    "                readConfigFile(configPath); // CF-003: JSON or YAML; throws on a syntax error or an unreadable YAML line",
+    replaces="7: YAML JSON.parse skip")
+
+append("CF-003: doctor imports project-config",
+    DOC,
+    """
+// CF-003: shared mtime-cached project config
+import { readConfigFile } from '../services/project-config.js';
+""")
@@ -0,0 +1,108 @@
+# DM-006: Incremental HNSW consolidation using a change watermark
+# consolidation.json keeps {updatedAt, model, dimension, refreshed}; only rows
+# changed since then are indexed, full rebuild on model/dim change or ghosts.
+# 2 ops
+
+append("DM-006: incremental HNSW update",
+    MI,
+    """
+// DM-006: incremental HNSW maintenance for the consolidate worker. Rows with
+// updated_at in (since, watermark] are added to the loaded index, or have their
+// metadata refreshed if already in it, instead of rebuilding everything.
+async function readMemoryRows(queries) {
+    const dbPath = path.join(process.cwd(), '.swarm', 'memory.db');
+    if (!fs.existsSync(dbPath)) return queries.map(() => []);
+    const initSqlJs = (await import('sql.js')).default;
+    const SQL = await initSqlJs();
+    const db = new SQL.Database(fs.readFileSync(dbPath));
+    try {
+        return queries.map(([sql, params]) => {
+            const stmt = db.prepare(sql);
+            const rows = [];
+            try {
+                stmt.bind(params);
+                while (stmt.step()) rows.push(stmt.getAsObject());
+            } finally { stmt.free(); }
+            return rows;
+        });
+    } finally { db.close(); }
+}
+const MEMORY_WATERMARK_SQL = `SELECT MAX(updated_at) AS updatedAt FROM memory_entries WHERE status = 'active'`;
+export async function getMemoryWatermark() {
+    const [[row]] = await readMemoryRows([[MEMORY_WATERMARK_SQL, []]]);
+    return { updatedAt: row?.updatedAt ?? 0 };
+}
+export async function updateHNSWIndex(options = {}) {
+    const since = options.since ?? 0;
+    if (typeof addToHNSWIndex !== 'function') return { unsupported: true, indexed: 0, refreshed: 0, watermark: since };
+    const index = await getHNSWIndex();
+    if (!index?.entries) return { unsupported: true, indexed: 0, refreshed: 0, watermark: since };
+    // Watermark and changed rows from one snapshot, so nothing falls between runs.
+    const [[mark], rows] = await readMemoryRows([
+        [MEMORY_WATERMARK_SQL, []],
+        [`SELECT id, key, namespace, content, embedding, updated_at FROM memory_entries
+          WHERE status = 'active' AND embedding IS NOT NULL AND updated_at > ?`, [since]],
+    ]);
+    let indexed = 0, refreshed = 0;
+    for (const row of rows) {
+        const id = String(row.id);
+        const entry = { id, key: row.key, namespace: row.namespace, content: row.content };
+        if (index.entries.has(id)) {
+            index.entries.set(id, { ...index.entries.get(id), ...entry });
+            refreshed++;
+            continue;
+        }
+        let embedding;
+        try { embedding = JSON.parse(row.embedding); } catch { continue; }
+        if (!Array.isArray(embedding) || embedding.length !== index.dimensions) continue;
+        await addToHNSWIndex(id, embedding, entry);
+        indexed++;
+    }
+    return { indexed, refreshed, watermark: Math.max(since, mark?.updatedAt ?? 0) };
+}
+""")
+
+patch("DM-006: consolidate from watermark",
+    WD,
+    """            // 2. Rebuild HNSW index with current data (drops the GV-002 tombstone journal)
+            const hnsw = await mi.compactHNSWIndex({ force: true });
+            result.hnswRebuilt = hnsw.entries;
+            result.tombstonesCompacted = hnsw.tombstones;""",
+    """            // 2. Index rows changed since the last run's watermark (DM-006). Full
+            //    rebuild only for a new model/dimension or too many ghost vectors.
+            let prev = null;
+            try { prev = JSON.parse(readFileSync(consolidateFile, 'utf-8')).watermark || null; } catch { /* first run */ }
+            let embConfig = {};
+            try { embConfig = JSON.parse(readFileSync(join(this.projectRoot, '.claude-flow', 'embeddings.json'), 'utf-8')); } catch { /* defaults */ }
+            const model = embConfig.model ?? null;
+            const dimension = embConfig.dimension ?? null;
+            let full = !prev || prev.model !== model || prev.dimension !== dimension;
+            let hnsw = full ? null : await mi.compactHNSWIndex();
+            let refreshed = prev?.refreshed || 0;
+            let watermark = prev?.updatedAt ?? 0;
+            if (hnsw && !hnsw.compacted) {
+                if (refreshed > 0.2 * hnsw.entries) {
+                    full = true;
+                } else {
+                    const update = await mi.updateHNSWIndex({ since: watermark });
+                    if (update.unsupported) full = true;
+                    else {
+                        result.hnswIndexed = update.indexed;
+                        refreshed += update.refreshed;
+                        watermark = update.watermark;
+                    }
+                }
+            }
+            if (full || hnsw?.compacted) {
+                if (full) {
+                    watermark = (await mi.getMemoryWatermark()).updatedAt;
+                    hnsw = await mi.compactHNSWIndex({ force: true });
+                } else {
+                    watermark = (await mi.updateHNSWIndex({ since: watermark })).watermark;
+                }
+                refreshed = 0;
+                result.hnswRebuilt = hnsw.entries;
+                result.tombstonesCompacted = hnsw.tombstones;
+            }
+            result.watermark = { updatedAt: watermark, model, dimension, refreshed };""",
+    replaces="GV-002: consolidate compacts tombstones")
@@ -0,0 +1,159 @@
+# DM-007: Core-normalized, cgroup-aware resource gate with headroom-based slots
+# Replaces DM-002's per-machine maxCpuLoad and DM-003's macOS memory bypass:
+# canRunWorker() measures CPU/memory headroom (cgroup v2 + PSI on Linux) and
+# admits workers while running < slots.
+# 3 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("DM-007: gate settings in project-config",
+    PROJECT_CONFIG,
+    """        maxConcurrent: number(daemon.maxConcurrent, null),
+    };""",
+    """        maxConcurrent: number(daemon.maxConcurrent, null),
+        workerMemoryMB: number(daemon.workerMemoryMB, null),
+        maxCpuPressure: number(daemon.maxCpuPressure, null),
+        maxMemoryPressure: number(daemon.maxMemoryPressure, null),
+    };""",
+    replaces="CF-003: project-config module")
+
+patch("DM-007: core-normalized CPU default",
+    WD,
+    "maxCpuLoad: 28.0",
+    "maxCpuLoad: os.cpus().length * 0.8",
+    replaces="5: CPU load threshold")
+
+append("DM-007: headroom resource gate",
+    WD,
+    """
+// DM-007: resource gate measured against the cgroup the daemon actually runs in.
+// CPU: when cgroup v2 cpu.max sets a quota, that quota and the cgroup's cpu.stat
+// deltas; otherwise host cores and /proc/stat deltas (else load average). The
+// first delta is taken against a reading made in start(). Memory: memory.max - memory.current
+// + inactive_file (else MemAvailable; no check on macOS, whose freemem() excludes
+// cache). PSI "some avg10" above the limits closes the gate, above half of them
+// halves the extra slots. Each slot is one core and workerMemoryMB of memory.
+import { getDaemonConfig as gateDaemonConfig } from './project-config.js';
+const GATE_SAMPLE_MS = 1000;
+const GATE_MIN_WINDOW_MS = 50;
+const GATE_USER_HZ = 100; // USER_HZ: /proc/stat counts in these ticks on every Linux arch Node runs on
+const GATE_DEFAULTS = { utilization: 0.8, workerMemoryMB: 512, maxCpuPressure: 50, maxMemoryPressure: 20 };
+function readGateFile(file) {
+    try { return readFileSync(file, 'utf-8'); } catch { return null; }
+}
+function cgroupDir() {
+    if (os.platform() !== 'linux') return null;
+    const line = (readGateFile('/proc/self/cgroup') || '').split('\\n').find((l) => l.startsWith('0::'));
+    const dir = line ? '/sys/fs/cgroup' + line.slice(3).trim() : null;
+    return dir && existsSync(dir + '/cgroup.controllers') ? dir.replace(/\\/$/, '') : null;
+}
+function pressure(file) {
+    const match = /^some avg10=([\\d.]+)/m.exec(readGateFile(file) || '');
+    return match ? Number(match[1]) : null;
+}
+// Cores the cgroup's cpu.max quota allows, or null when it sets none: an
+// uncapped cgroup shares the host's cores with everything else on it.
+function cgroupQuotaCores(cgroup) {
+    const [quota, period] = (cgroup && readGateFile(cgroup + '/cpu.max') || 'max').trim().split(/\\s+/);
+    return quota !== 'max' && Number(period) > 0 ? Number(quota) / Number(period) : null;
+}
+// CPU time used so far in core-milliseconds: the cgroup's own when it has a
+// quota, else the host's busy time.
+function cpuTimeMs(cgroup, quotaCores) {
+    if (quotaCores !== null) {
+        const match = /^usage_usec (\\d+)/m.exec(readGateFile(cgroup + '/cpu.stat') || '');
+        return match ? Number(match[1]) / 1000 : null;
+    }
+    const fields = /^cpu\\s+(.*)$/m.exec(readGateFile('/proc/stat') || '')?.[1].trim().split(/\\s+/).map(Number);
+    if (!fields) return null;
+    const [user, nice, system, , , irq, softirq, steal = 0] = fields;
+    return (user + nice + system + irq + softirq + steal) * 1000 / GATE_USER_HZ;
+}
+function readCpuTime(state) {
+    const cgroup = state.cgroup === undefined ? (state.cgroup = cgroupDir()) : state.cgroup;
+    const quotaCores = cgroupQuotaCores(cgroup);
+    return { at: Date.now(), quotaCores, cpuMs: cpuTimeMs(cgroup, quotaCores) };
+}
+function measureHeadroom(state) {
+    const now = Date.now();
+    if (state.sample && now - state.sample.at < GATE_SAMPLE_MS) return state.sample;
+    const cgroup = state.cgroup === undefined ? (state.cgroup = cgroupDir()) : state.cgroup;
+    const hostCores = os.cpus().length || 1;
+    const reading = readCpuTime(state);
+    const cores = reading.quotaCores !== null ? Math.min(hostCores, reading.quotaCores) : hostCores;
+    const base = state.cpuTime;
+    const measured = reading.cpuMs !== null && base?.cpuMs != null && base.quotaCores === reading.quotaCores
+        && reading.at - base.at >= GATE_MIN_WINDOW_MS;
+    const usedCores = measured
+        ? (reading.cpuMs - base.cpuMs) / (reading.at - base.at)
+        : (os.loadavg()[0] / hostCores) * cores;
+    if (measured || !base || base.quotaCores !== reading.quotaCores) state.cpuTime = reading;
+    let memAvailable = null, memTotal = null;
+    const memMax = cgroup && (readGateFile(cgroup + '/memory.max') || '').trim();
+    if (memMax && memMax !== 'max') {
+        const current = Number(readGateFile(cgroup + '/memory.current')) || 0;
+        const inactive = Number(/^inactive_file (\\d+)/m.exec(readGateFile(cgroup + '/memory.stat') || '')?.[1]) || 0;
+        memTotal = Number(memMax);
+        memAvailable = Math.max(0, memTotal - current + inactive);
+    } else if (os.platform() === 'linux') {
+        const kb = /^MemAvailable:\\s+(\\d+)/m.exec(readGateFile('/proc/meminfo') || '')?.[1];
+        memTotal = os.totalmem();
+        memAvailable = kb ? Number(kb) * 1024 : os.freemem();
+    }
+    const psiDir = cgroup || '/proc/pressure';
+    state.sample = {
+        at: now, cores, usedCores, memAvailable, memTotal,
+        cpuPressure: pressure(psiDir + (cgroup ? '/cpu.pressure' : '/cpu')),
+        memoryPressure: pressure(psiDir + (cgroup ? '/memory.pressure' : '/memory')),
+    };
+    return state.sample;
+}
+// Measured usage already includes the RUNNING workers, so headroom buys extra
+// slots on top of them; an idle daemon under target always gets one.
+function gateSlots(sample, thresholds, config, running) {
+    const utilization = Math.min(1, (thresholds.maxCpuLoad ?? (os.cpus().length || 1) * GATE_DEFAULTS.utilization) / (os.cpus().length || 1));
+    const reasons = [];
+    const headroom = sample.cores * utilization - sample.usedCores;
+    let extra = headroom >= 1 ? Math.floor(headroom) : (headroom > 0 && running === 0 ? 1 : 0);
+    if (extra <= 0) reasons.push(`CPU busy: ${sample.usedCores.toFixed(2)}/${sample.cores.toFixed(2)} cores`);
+    if (sample.memAvailable !== null) {
+        const reserve = sample.memTotal * (thresholds.minFreeMemoryPercent ?? 20) / 100;
+        const memExtra = Math.floor((sample.memAvailable - reserve) / ((config.workerMemoryMB ?? GATE_DEFAULTS.workerMemoryMB) * 1024 * 1024));
+        if (memExtra <= 0) reasons.push(`Memory low: ${(sample.memAvailable / 1048576).toFixed(0)}MB available`);
+        extra = Math.min(extra, memExtra);
+    }
+    for (const [kind, value, limit] of [['CPU', sample.cpuPressure, config.maxCpuPressure ?? GATE_DEFAULTS.maxCpuPressure],
+                                         ['Memory', sample.memoryPressure, config.maxMemoryPressure ?? GATE_DEFAULTS.maxMemoryPressure]]) {
+        if (value === null) continue;
+        if (value >= limit) { extra = 0; reasons.push(`${kind} pressure: ${value}%`); }
+        else if (value >= limit / 2) extra = Math.floor(extra / 2);
+    }
+    return { slots: running + Math.max(0, extra), reasons };
+}
+try {
+    const startUngated = WorkerDaemon.prototype.start;
+    WorkerDaemon.prototype.start = async function (...args) {
+        this.resourceGate = this.resourceGate || {};
+        this.resourceGate.cpuTime = readCpuTime(this.resourceGate);
+        const { maxConcurrent } = gateDaemonConfig(this.projectRoot);
+        if (maxConcurrent !== null) this.config.maxConcurrent = maxConcurrent;
+        return startUngated.apply(this, args);
+    };
+    WorkerDaemon.prototype.canRunWorker = function () {
+        const config = gateDaemonConfig(this.projectRoot);
+        const thresholds = {
+            ...this.config.resourceThresholds,
+            ...(config.maxCpuLoad !== null && { maxCpuLoad: config.maxCpuLoad }),
+            ...(config.minFreeMemoryPercent !== null && { minFreeMemoryPercent: config.minFreeMemoryPercent }),
+        };
+        const maxConcurrent = config.maxConcurrent ?? this.config.maxConcurrent;
+        const sample = measureHeadroom(this.resourceGate || (this.resourceGate = {}));
+        const running = this.runningWorkers?.size ?? 0;
+        const { slots, reasons } = gateSlots(sample, thresholds, config, running);
+        const allowed = running < Math.min(slots, maxConcurrent ?? slots);
+        this.resourceGate.last = { slots, running, allowed, ...sample };
+        return allowed ? { allowed: true }
+            : { allowed: false, reason: reasons.join('; ') || `No headroom: ${running} running, ${slots} slots` };
+    };
+} catch { /* WorkerDaemon not declared in this build */ }
+""")
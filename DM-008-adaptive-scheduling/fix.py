@@ -0,0 +1,155 @@
+# DM-008: Adaptive worker scheduling with change detection
+# Workers fingerprint their inputs (git tree + dirty files, or watched mtimes;
+# the memory watermark for consolidate) and skip the run when nothing changed. Idle
+# projects back off exponentially (up to 8x), changes reset to the base
+# interval, and intervals/offsets get +-10% jitter.
+# 1 op
+
+append("DM-008: adaptive schedule helpers",
+    WD,
+    """
+// DM-008: adaptive scheduling. schedule.json keeps, per worker, the fingerprint
+// of the inputs its last successful run saw and how many runs in a row found
+// them unchanged (the backoff exponent).
+import { execFile as scheduleExecFile } from 'child_process';
+import { createHash as scheduleHash } from 'crypto';
+import { readdirSync as scheduleReaddir, statSync as scheduleStat } from 'fs';
+const SCHEDULE_INPUTS = {
+    audit: 'source', optimize: 'source', testgaps: 'source', map: 'source', document: 'source',
+    deepdive: 'source', refactor: 'source', benchmark: 'source', ultralearn: 'source',
+    consolidate: 'memory',
+};
+const SCHEDULE_WATCH = ['src', 'lib', 'app', 'packages', 'test', 'tests', 'package.json'];
+const SCHEDULE_STATE_DIRS = ['.claude-flow/', '.swarm/', '.claude/'];
+const SCHEDULE_WALK_LIMIT = 5000;
+const SCHEDULE_MAX_BACKOFF = 3; // 2^3 = 8x the base interval
+// Time-based work no fingerprint sees (MS-003 decay pruning): run at least this often.
+const SCHEDULE_MAX_SKIP_AGE_MS = { consolidate: 12 * 60 * 60 * 1000 };
+const SCHEDULE_JITTER = 0.1;
+function scheduleJitter(ms) {
+    return Math.round(ms * (1 + (Math.random() * 2 - 1) * SCHEDULE_JITTER));
+}
+function statKey(file) {
+    try { const st = scheduleStat(file); return `${st.size}:${st.mtimeMs}`; } catch { return '-'; }
+}
+function gitOutput(root, args) {
+    return new Promise((resolve) => scheduleExecFile('git', args, { cwd: root, maxBuffer: 16 << 20, timeout: 10000 },
+        (error, stdout) => resolve(error ? null : stdout)));
+}
+async function sourceFingerprint(root) {
+    const hash = scheduleHash('sha1');
+    const tree = await gitOutput(root, ['rev-parse', 'HEAD^{tree}']);
+    if (tree !== null) {
+        hash.update(tree);
+        const status = (await gitOutput(root, ['status', '--porcelain=v1', '-z'])) ?? '';
+        const fields = status.split('\0');
+        for (let i = 0; i < fields.length; i++) {
+            const entry = fields[i];
+            if (!entry) continue;
+            const file = entry.slice(3);
+            // A rename or copy is followed by its source path, with no status prefix.
+            const source = /[RC]/.test(entry.slice(0, 2)) ? fields[++i] ?? '' : '';
+            // The daemon's own state (logs, metrics, schedule.json, memory.db) is not an input.
+            if (SCHEDULE_STATE_DIRS.some((dir) => file.startsWith(dir))) continue;
+            hash.update(`${entry}\0${source}\0${statKey(join(root, file))}`);
+        }
+        return hash.digest('hex');
+    }
+    let seen = 0;
+    const walk = (dir) => {
+        let names;
+        try { names = scheduleReaddir(dir, { withFileTypes: true }); } catch { return; }
+        for (const d of names.sort((a, b) => (a.name < b.name ? -1 : 1))) {
+            if (seen >= SCHEDULE_WALK_LIMIT || d.name.startsWith('.') || d.name === 'node_modules') continue;
+            const p = join(dir, d.name);
+            if (d.isDirectory()) walk(p);
+            else { seen++; hash.update(p + statKey(p)); }
+        }
+    };
+    for (const rel of SCHEDULE_WATCH) {
+        const p = join(root, rel);
+        hash.update(rel + statKey(p));
+        walk(p);
+    }
+    return hash.digest('hex');
+}
+// The DM-006 watermark (newest active updated_at) plus the GV-002 tombstone
+// journal, which deletes grow and compaction removes. Consolidate's own
+// writes (index rebuilds, the memory.db save) leave the watermark unchanged.
+async function memoryFingerprint(root) {
+    const mi = await import('../memory/memory-initializer.js');
+    const watermark = (await mi.getMemoryWatermark()).updatedAt;
+    return `watermark:${watermark} tombstones:${statKey(join(root, '.swarm', 'hnsw.tombstones'))}`;
+}
+function scheduleState(daemon) {
+    if (!daemon.adaptiveSchedule) {
+        daemon.adaptiveSchedule = {};
+        try { daemon.adaptiveSchedule = JSON.parse(readFileSync(join(daemon.projectRoot, '.claude-flow', 'schedule.json'), 'utf-8')); } catch { /* first run */ }
+    }
+    return daemon.adaptiveSchedule;
+}
+function saveScheduleState(daemon) {
+    try {
+        mkdirSync(join(daemon.projectRoot, '.claude-flow'), { recursive: true });
+        writeFileSync(join(daemon.projectRoot, '.claude-flow', 'schedule.json'), JSON.stringify(daemon.adaptiveSchedule, null, 2));
+    } catch { /* best-effort */ }
+}
+// Decide whether WORKERCONFIG's run can be skipped, and set its next interval.
+// Returns { skip, commit }: commit() records the fingerprint once the run succeeded.
+async function planScheduledRun(daemon, workerConfig) {
+    const type = workerConfig.type;
+    workerConfig.baseIntervalMs ??= workerConfig.intervalMs;
+    const input = SCHEDULE_INPUTS[type];
+    const state = scheduleState(daemon);
+    const prev = state[type] || { idle: 0 };
+    let fingerprint = null;
+    if (input && workerConfig.baseIntervalMs > 0) {
+        try {
+            fingerprint = input === 'memory'
+                ? await memoryFingerprint(daemon.projectRoot)
+                : await sourceFingerprint(daemon.projectRoot);
+        } catch { /* run unconditionally */ }
+    }
+    const maxSkipAge = SCHEDULE_MAX_SKIP_AGE_MS[type];
+    const stale = maxSkipAge !== undefined && !(Date.now() - Date.parse(prev.ranAt) < maxSkipAge);
+    const skip = fingerprint !== null && fingerprint === prev.fingerprint && !stale;
+    const idle = skip ? Math.min((prev.idle || 0) + 1, SCHEDULE_MAX_BACKOFF) : 0;
+    if (workerConfig.baseIntervalMs > 0) workerConfig.intervalMs = scheduleJitter(workerConfig.baseIntervalMs * 2 ** idle);
+    const commit = () => {
+        if (fingerprint === null) return;
+        const now = new Date().toISOString();
+        state[type] = { fingerprint, idle, intervalMs: workerConfig.intervalMs, checkedAt: now, ranAt: skip ? prev.ranAt : now };
+        saveScheduleState(daemon);
+    };
+    if (skip) commit();
+    return { skip, commit };
+}
+try {
+    const scheduleWorkerFixed = WorkerDaemon.prototype.scheduleWorker;
+    if (typeof scheduleWorkerFixed === 'function') {
+        // Spread the first run of every worker so daemons started together don't fire together.
+        WorkerDaemon.prototype.scheduleWorker = function (workerConfig, ...rest) {
+            if (workerConfig && !workerConfig.scheduleJittered) {
+                workerConfig.scheduleJittered = true;
+                workerConfig.offsetMs = (workerConfig.offsetMs || 0) + Math.round(Math.random() * SCHEDULE_JITTER * (workerConfig.intervalMs || 0));
+            }
+            return scheduleWorkerFixed.call(this, workerConfig, ...rest);
+        };
+    }
+    const runWorkerLogicUnscheduled = WorkerDaemon.prototype.runWorkerLogic;
+    if (typeof runWorkerLogicUnscheduled === 'function') {
+        // Skip when the worker's inputs are unchanged since its last successful
+        // run; record the fingerprint only once this run succeeded (local or headless).
+        WorkerDaemon.prototype.runWorkerLogic = async function (workerConfig, ...rest) {
+            const scheduled = await planScheduledRun(this, workerConfig);
+            if (scheduled.skip) {
+                this.log('info', `Skipping ${workerConfig.type}: inputs unchanged (next in ${Math.round(workerConfig.intervalMs / 60000)}m)`, { worker: workerConfig.type, mode: 'skipped' });
+                return { mode: 'skipped', skipped: true, reason: 'inputs unchanged', nextIntervalMs: workerConfig.intervalMs };
+            }
+            const result = await runWorkerLogicUnscheduled.call(this, workerConfig, ...rest);
+            if (result?.success !== false) scheduled.commit();
+            return result;
+        };
+    }
+} catch { /* WorkerDaemon not declared in this build */ }
+""")
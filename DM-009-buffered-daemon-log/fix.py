@@ -0,0 +1,196 @@
+# DM-009: Buffered async JSON logger with rotation for daemon.log
+# WorkerDaemon.log() hands lines (plus structured fields from the call site) to
+# a per-file logger that buffers them, writes each batch with one async append on
+# a long-lived descriptor (64KB / 1s budget, synchronous only at exit) and rotates
+# by size/age with a retention cap, instead of DM-001's appendFileSync per line.
+# The launcher's stdout/stderr go to daemon.stdout.log instead of daemon.log.
+# 8 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("DM-009: log settings in project-config",
+    PROJECT_CONFIG,
+    """        headlessTimeoutMs: number(daemon.headlessTimeoutMs, null),
+    };""",
+    """        headlessTimeoutMs: number(daemon.headlessTimeoutMs, null),
+        logMaxMB: number(daemon.logMaxMB, null),
+        logMaxAgeHours: number(daemon.logMaxAgeHours, null),
+        logRetain: number(daemon.logRetain, null),
+    };""",
+    replaces="HW-004: pool settings in project-config")
+
+patch("DM-009: buffered log write",
+    WD,
+    "            appendFileSync(logFile, logMessage + '\\n');",
+    """            // DM-009: log(level, message, fields?) - fields are the call site's structured data
+            daemonLogger(logFile, this.projectRoot).write(logMessage, arguments[2]);""",
+    replaces="4B: remove require('fs')")
+
+append("DM-009: daemon logger",
+    WD,
+    """
+// DM-009: buffered JSON-lines logger. Lines are batched and written every
+// LOG_FLUSH_MS or once LOG_FLUSH_BYTES are buffered, as one async append on a
+// descriptor kept open, one batch in flight at a time. At exit the rest is
+// written synchronously. The file rotates to <name>.<timestamp> past logMaxMB
+// or logMaxAgeHours, keeping the newest logRetain rotations.
+import { openSync as logOpen, write as logWrite, writeSync as logWriteSync, fstatSync as logFstat, closeSync as logClose, statSync as logStat, renameSync as logRename, readdirSync as logReaddir, unlinkSync as logUnlink } from 'fs';
+import { basename as logBasename, dirname as logDirname } from 'path';
+import { getDaemonConfig as logDaemonConfig } from './project-config.js';
+const LOG_FLUSH_MS = 1000;
+const LOG_FLUSH_BYTES = 64 * 1024;
+const LOG_DEFAULTS = { maxMB: 10, maxAgeHours: 24, retain: 5 };
+const daemonLoggers = new Map();
+// "[ts] [LEVEL] message" + { worker, durationMs, ... } -> { ts, level, worker?, durationMs?, ..., msg }
+function logRecord(line, fields) {
+    const match = /^\\[([^\\]]+)\\] \\[(\\w+)\\] ([\\s\\S]*)$/.exec(line);
+    const record = match ? { ts: match[1], level: match[2].toLowerCase(), msg: match[3] } : { ts: new Date().toISOString(), level: 'info', msg: line };
+    return { ts: record.ts, level: record.level, ...(fields && typeof fields === 'object' ? fields : {}), msg: record.msg };
+}
+class DaemonLogger {
+    constructor(file, config) {
+        this.file = file;
+        this.maxBytes = (config.logMaxMB ?? LOG_DEFAULTS.maxMB) * 1024 * 1024;
+        this.maxAgeMs = (config.logMaxAgeHours ?? LOG_DEFAULTS.maxAgeHours) * 3600 * 1000;
+        this.retain = config.logRetain ?? LOG_DEFAULTS.retain;
+        this.buffer = [];
+        this.bytes = 0;
+        this.fd = null;
+        this.timer = null;
+        this.writing = null; // { chunk, offset } of the append in flight
+    }
+    write(line, fields) {
+        const text = JSON.stringify(logRecord(line, fields)) + '\\n';
+        this.buffer.push(text);
+        this.bytes += text.length;
+        if (this.bytes >= LOG_FLUSH_BYTES) this.flush();
+        else if (!this.timer) {
+            this.timer = setTimeout(() => this.flush(), LOG_FLUSH_MS);
+            this.timer.unref?.();
+        }
+    }
+    open() {
+        if (this.fd !== null) return;
+        let st = null;
+        try { st = logStat(this.file); } catch { /* new file */ }
+        this.size = st?.size ?? 0;
+        this.openedAt = st ? (st.birthtimeMs || st.mtimeMs) : Date.now();
+        try { this.fd = logOpen(this.file, 'a'); } catch { this.fd = null; }
+    }
+    close() {
+        if (this.fd === null) return;
+        try { logClose(this.fd); } catch { /* already closed */ }
+        this.fd = null;
+    }
+    flush() {
+        clearTimeout(this.timer);
+        this.timer = null;
+        // Lines logged meanwhile go out when the append in flight completes.
+        if (this.writing || !this.buffer.length) return;
+        const chunk = Buffer.from(this.buffer.join(''));
+        this.buffer = [];
+        this.bytes = 0;
+        this.open();
+        if (this.size > 0 && (this.size + chunk.length > this.maxBytes || Date.now() - this.openedAt > this.maxAgeMs)) {
+            this.rotate();
+            this.open();
+        }
+        if (this.fd === null) return;
+        this.writing = { chunk, offset: this.size };
+        this.size += chunk.length;
+        logWrite(this.fd, chunk, 0, chunk.length, null, (error) => {
+            this.writing = null;
+            if (error) this.close(); // reopened on the next flush
+            if (this.buffer.length) this.flush();
+        });
+    }
+    // At exit: the append in flight may not have run, so it is written again
+    // unless the file already reaches past it; buffered lines follow.
+    drain() {
+        clearTimeout(this.timer);
+        this.timer = null;
+        if (this.writing && this.fd !== null) {
+            let landed = false;
+            try { landed = logFstat(this.fd).size >= this.writing.offset + this.writing.chunk.length; } catch { /* write it */ }
+            try { if (!landed) logWriteSync(this.fd, this.writing.chunk); } catch { /* lost */ }
+        }
+        this.writing = null;
+        if (!this.buffer.length) return;
+        this.open();
+        try { if (this.fd !== null) logWriteSync(this.fd, this.buffer.join('')); } catch { /* lost */ }
+        this.buffer = [];
+        this.bytes = 0;
+    }
+    rotate() {
+        this.close();
+        const stamp = new Date().toISOString().replace(/[:.]/g, '-');
+        try { logRename(this.file, `${this.file}.${stamp}`); } catch { return; }
+        const dir = logDirname(this.file), prefix = logBasename(this.file) + '.';
+        try {
+            const rotated = logReaddir(dir).filter((name) => name.startsWith(prefix)).sort().reverse();
+            for (const name of rotated.slice(this.retain)) logUnlink(join(dir, name));
+        } catch { /* best-effort */ }
+    }
+}
+function daemonLogger(file, projectRoot) {
+    let logger = daemonLoggers.get(file);
+    if (!logger) {
+        let config = {};
+        try { config = logDaemonConfig(projectRoot); } catch { /* defaults */ }
+        logger = new DaemonLogger(file, config);
+        daemonLoggers.set(file, logger);
+        if (daemonLoggers.size === 1) process.once('exit', () => { for (const l of daemonLoggers.values()) l.drain(); });
+    }
+    return logger;
+}
+try {
+    // One structured record per run: worker, mode and duration for log tooling.
+    const executeWorkerUnlogged = WorkerDaemon.prototype.executeWorker;
+    if (typeof executeWorkerUnlogged === 'function') {
+        WorkerDaemon.prototype.executeWorker = async function (workerType, ...rest) {
+            const started = Date.now();
+            try {
+                const result = await executeWorkerUnlogged.call(this, workerType, ...rest);
+                const durationMs = result?.durationMs ?? Date.now() - started;
+                const mode = result?.output?.mode ?? 'local';
+                const failed = result?.success === false;
+                this.log(failed ? 'warn' : 'info', `Worker ${workerType} ${failed ? 'failed' : 'finished'} (${mode}) in ${durationMs}ms`, { worker: workerType, mode, durationMs });
+                return result;
+            } catch (error) {
+                const durationMs = Date.now() - started;
+                this.log('error', `Worker ${workerType} threw after ${durationMs}ms: ${error?.message || error}`, { worker: workerType, durationMs });
+                throw error;
+            }
+        };
+    }
+} catch { /* WorkerDaemon not declared in this build */ }
+""")
+
+# Structured fields at the headless call sites (HW-002).
+patch("DM-009: headless run log fields",
+    WD,
+    "                this.log('info', `Running ${workerConfig.type} in headless mode (Claude Code AI)`);",
+    "                this.log('info', `Running ${workerConfig.type} in headless mode (Claude Code AI)`, { worker: workerConfig.type, mode: 'headless' });",
+    replaces="2: honest failures")
+
+patch("DM-009: headless throw log fields",
+    WD,
+    "                this.log('warn', `Headless execution threw for ${workerConfig.type}: ${errorMsg}`);",
+    "                this.log('warn', `Headless execution threw for ${workerConfig.type}: ${errorMsg}`, { worker: workerConfig.type, mode: 'headless' });",
+    replaces="2: honest failures")
+
+patch("DM-009: headless failure log fields",
+    WD,
+    "            this.log('warn', `Headless failed for ${workerConfig.type}: ${errorMsg}`);",
+    "            this.log('warn', `Headless failed for ${workerConfig.type}: ${errorMsg}`, { worker: workerConfig.type, mode: 'headless' });",
+    replaces="2: honest failures")
+
+# The launcher's stdio would share daemon.log with the logger above, but not its
+# rotation: after a rename it keeps appending to the rotated file.
+patch("DM-009: launcher output to daemon.stdout.log",
+    DJ,
+    "    const logFile = join(logsDir, 'daemon.log');",
+    """    // DM-009: console output only; the daemon's own log (daemon.log) is rotated
+    // by its logger and must not share a descriptor with this stream.
+    const logFile = join(logsDir, 'daemon.stdout.log');""",
+    replaces="4C: daemon log path")
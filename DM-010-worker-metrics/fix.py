@@ -0,0 +1,281 @@
+# DM-010: Worker latency histograms, Prometheus export and `daemon status` view
+# Per worker type: run duration (by mode), queue wait, resource-gate wait,
+# run/failure/skip counters. Written to .claude-flow/metrics/daemon.prom and
+# daemon-metrics.json, optionally served on a Unix socket or 127.0.0.1 port.
+# 4 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("DM-010: metrics endpoint settings in project-config",
+    PROJECT_CONFIG,
+    """        logRetain: number(daemon.logRetain, null),
+    };""",
+    """        logRetain: number(daemon.logRetain, null),
+        metricsSocket: daemon.metricsSocket || null,
+        metricsPort: number(daemon.metricsPort, null),
+    };""",
+    replaces="DM-009: log settings in project-config")
+
+append("DM-010: worker metrics",
+    WD,
+    """
+// DM-010: worker metrics. Histograms keep cumulative bucket counts (Prometheus)
+// plus a ring of METRICS_WINDOWS windows of METRICS_WINDOW_MS each, from which
+// `daemon status` reads rolling p50/p95. serve() imports http/net only when an
+// endpoint is configured.
+import { renameSync as metricsRename, unlinkSync as metricsUnlink } from 'fs';
+import { getDaemonConfig as metricsDaemonConfig } from './project-config.js';
+const METRICS_BUCKETS_MS = [10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000, 300000, 600000];
+const METRICS_WINDOW_MS = 5 * 60 * 1000;
+const METRICS_WINDOWS = 12;
+const METRICS_WRITE_MS = 15000;
+class RollingHistogram {
+    constructor() {
+        this.counts = new Array(METRICS_BUCKETS_MS.length + 1).fill(0);
+        this.sum = 0;
+        this.count = 0;
+        this.windows = [];
+    }
+    observe(ms) {
+        const bucket = METRICS_BUCKETS_MS.findIndex((le) => ms <= le);
+        const i = bucket === -1 ? METRICS_BUCKETS_MS.length : bucket;
+        this.counts[i]++;
+        this.sum += ms;
+        this.count++;
+        const start = Math.floor(Date.now() / METRICS_WINDOW_MS) * METRICS_WINDOW_MS;
+        let window = this.windows[this.windows.length - 1];
+        if (!window || window.start !== start) {
+            window = { start, counts: new Array(this.counts.length).fill(0), n: 0, max: 0 };
+            this.windows.push(window);
+            if (this.windows.length > METRICS_WINDOWS) this.windows.shift();
+        }
+        window.counts[i]++;
+        window.n++;
+        window.max = Math.max(window.max, ms);
+    }
+    // p50/p95 (bucket upper bounds) and max over the last METRICS_WINDOWS windows.
+    rolling() {
+        const since = Date.now() - METRICS_WINDOW_MS * METRICS_WINDOWS;
+        const live = this.windows.filter((w) => w.start >= since);
+        const n = live.reduce((s, w) => s + w.n, 0);
+        if (!n) return { n: 0 };
+        const quantile = (q) => {
+            let seen = 0;
+            for (let i = 0; i < this.counts.length; i++) {
+                seen += live.reduce((s, w) => s + w.counts[i], 0);
+                if (seen >= q * n) return METRICS_BUCKETS_MS[i] ?? Math.max(...live.map((w) => w.max));
+            }
+            return null;
+        };
+        return { n, p50: quantile(0.5), p95: quantile(0.95), max: Math.max(...live.map((w) => w.max)) };
+    }
+}
+class WorkerMetrics {
+    constructor(projectRoot) {
+        this.projectRoot = projectRoot;
+        this.histograms = new Map(); // "name|label=value,..." -> RollingHistogram
+        this.counters = new Map();
+        this.dirty = false;
+        this.timer = setInterval(() => this.write(), METRICS_WRITE_MS);
+        this.timer.unref?.();
+        this.serve().catch(() => {});
+    }
+    key(name, labels) {
+        return name + '|' + Object.entries(labels).map(([k, v]) => `${k}=${v}`).join(',');
+    }
+    observe(name, labels, ms) {
+        const key = this.key(name, labels);
+        if (!this.histograms.has(key)) this.histograms.set(key, new RollingHistogram());
+        this.histograms.get(key).observe(ms);
+        this.dirty = true;
+    }
+    inc(name, labels) {
+        const key = this.key(name, labels);
+        this.counters.set(key, (this.counters.get(key) || 0) + 1);
+        this.dirty = true;
+    }
+    prometheus() {
+        const lines = [];
+        const labelText = (key, extra = '') => {
+            const pairs = key.split('|')[1].split(',').filter(Boolean).map((p) => p.replace('=', '="') + '"');
+            if (extra) pairs.push(extra);
+            return pairs.length ? `{${pairs.join(',')}}` : '';
+        };
+        const typed = new Set();
+        for (const [key, h] of this.histograms) {
+            const name = 'claude_flow_' + key.split('|')[0];
+            if (!typed.has(name)) { lines.push(`# TYPE ${name} histogram`); typed.add(name); }
+            let cumulative = 0;
+            METRICS_BUCKETS_MS.forEach((le, i) => {
+                cumulative += h.counts[i];
+                lines.push(`${name}_bucket${labelText(key, `le="${le}"`)} ${cumulative}`);
+            });
+            lines.push(`${name}_bucket${labelText(key, 'le="+Inf"')} ${h.count}`);
+            lines.push(`${name}_sum${labelText(key)} ${h.sum}`);
+            lines.push(`${name}_count${labelText(key)} ${h.count}`);
+        }
+        for (const [key, value] of this.counters) {
+            const name = 'claude_flow_' + key.split('|')[0];
+            if (!typed.has(name)) { lines.push(`# TYPE ${name} counter`); typed.add(name); }
+            lines.push(`${name}${labelText(key)} ${value}`);
+        }
+        return lines.join('\\n') + '\\n';
+    }
+    summary() {
+        const workers = {};
+        const entry = (labels) => (workers[labels.worker] ??= { runs: {}, latency: {} });
+        for (const [key, h] of this.histograms) {
+            const [name, labelPart] = key.split('|');
+            const labels = Object.fromEntries(labelPart.split(',').filter(Boolean).map((p) => p.split('=')));
+            entry(labels).latency[name + (labels.mode ? `:${labels.mode}` : '')] = h.rolling();
+        }
+        for (const [key, value] of this.counters) {
+            const [name, labelPart] = key.split('|');
+            const labels = Object.fromEntries(labelPart.split(',').filter(Boolean).map((p) => p.split('=')));
+            const e = entry(labels);
+            e.runs[labels.result ?? name] = (e.runs[labels.result ?? name] || 0) + value;
+        }
+        return { updatedAt: new Date().toISOString(), windowMs: METRICS_WINDOW_MS * METRICS_WINDOWS, workers };
+    }
+    write() {
+        if (!this.dirty) return;
+        this.dirty = false;
+        const dir = join(this.projectRoot, '.claude-flow', 'metrics');
+        try {
+            mkdirSync(dir, { recursive: true });
+            for (const [file, text] of [['daemon.prom', this.prometheus()], ['daemon-metrics.json', JSON.stringify(this.summary(), null, 2)]]) {
+                writeFileSync(join(dir, file + '.tmp'), text);
+                metricsRename(join(dir, file + '.tmp'), join(dir, file));
+            }
+        } catch { /* best-effort */ }
+    }
+    async serve() {
+        let config = {};
+        try { config = metricsDaemonConfig(this.projectRoot); } catch { /* no endpoint */ }
+        const respond = (path) => path.startsWith('/metrics.json')
+            ? ['application/json', JSON.stringify(this.summary())]
+            : ['text/plain; version=0.0.4', this.prometheus()];
+        if (config.metricsPort) {
+            const { createServer: metricsHttpServer } = await import('http');
+            this.http = metricsHttpServer((req, res) => {
+                const [type, body] = respond(req.url || '/metrics');
+                res.writeHead(200, { 'Content-Type': type });
+                res.end(body);
+            });
+            this.http.on('error', () => {});
+            this.http.listen(config.metricsPort, '127.0.0.1');
+            this.http.unref();
+        }
+        if (config.metricsSocket) {
+            // One request line ("/metrics" or "/metrics.json"), one response, close.
+            const path = config.metricsSocket === 'true' ? join(this.projectRoot, '.claude-flow', 'daemon-metrics.sock') : config.metricsSocket;
+            try { metricsUnlink(path); } catch { /* not stale */ }
+            const { createServer: metricsSocketServer } = await import('net');
+            this.socket = metricsSocketServer((conn) => {
+                conn.once('data', (data) => conn.end(respond(data.toString().trim())[1]));
+                conn.on('error', () => {});
+            });
+            this.socket.on('error', () => {});
+            this.socket.listen(path);
+            this.socket.unref();
+        }
+    }
+}
+function workerMetrics(daemon) {
+    return daemon.workerMetrics || (daemon.workerMetrics = new WorkerMetrics(daemon.projectRoot));
+}
+try {
+    const proto = WorkerDaemon.prototype;
+    // Stamped when the scheduler first asks for a run. A spell in
+    // pendingWorkers keeps the first stamp; a run the gate turns away (and
+    // does not queue) drops it, its wait being worker_gate_wait_ms.
+    const concurrencyControlled = proto.executeWorkerWithConcurrencyControl;
+    if (typeof concurrencyControlled === 'function') {
+        proto.executeWorkerWithConcurrencyControl = async function (workerType, ...rest) {
+            const queuedAt = (this.workerQueuedAt ??= {});
+            queuedAt[workerType] ??= Date.now();
+            const result = await concurrencyControlled.call(this, workerType, ...rest);
+            if (result === null && !this.pendingWorkers?.includes(workerType)) delete queuedAt[workerType];
+            return result;
+        };
+    }
+    const executeWorkerTimed = proto.executeWorker;
+    if (typeof executeWorkerTimed === 'function') {
+        proto.executeWorker = async function (workerType, ...rest) {
+            const metrics = workerMetrics(this);
+            const started = Date.now();
+            const queuedAt = this.workerQueuedAt?.[workerType];
+            if (queuedAt !== undefined) delete this.workerQueuedAt[workerType];
+            let result, error;
+            try { result = await executeWorkerTimed.call(this, workerType, ...rest); }
+            catch (e) { error = e; }
+            const output = result?.output;
+            const mode = output?.mode === 'headless' || output?.mode === 'skipped' ? output.mode : 'local';
+            const ok = !error && result?.success !== false;
+            metrics.inc('worker_runs_total', { worker: workerType, mode, result: mode === 'skipped' ? 'skipped' : ok ? 'success' : 'failure' });
+            if (mode !== 'skipped') metrics.observe('worker_duration_ms', { worker: workerType, mode }, result?.durationMs ?? Date.now() - started);
+            if (mode !== 'skipped') {
+                // The daemon's own queue, plus the HW-004 pool's for headless runs; 0 for a direct trigger.
+                const waited = (queuedAt !== undefined ? started - queuedAt : 0) + (output?.timing?.queueWaitMs ?? 0);
+                metrics.observe('worker_queue_wait_ms', { worker: workerType }, waited);
+            }
+            if (error) throw error;
+            return result;
+        };
+    }
+    // The gate call names its worker (patched below); DM-007's gate ignores it.
+    const canRunWorkerGated = proto.canRunWorker;
+    proto.canRunWorker = function (workerType, ...rest) {
+        const outcome = canRunWorkerGated.call(this, workerType, ...rest);
+        const record = (check) => {
+            const worker = workerType ?? 'unknown';
+            const denied = (this.gateDeniedSince ??= {});
+            if (!check?.allowed) {
+                denied[worker] ??= Date.now();
+                workerMetrics(this).inc('worker_gate_denied_total', { worker });
+            } else if (denied[worker] !== undefined) {
+                workerMetrics(this).observe('worker_gate_wait_ms', { worker }, Date.now() - denied[worker]);
+                delete denied[worker];
+            }
+            return check;
+        };
+        return outcome && typeof outcome.then === 'function' ? outcome.then(record) : record(outcome);
+    };
+} catch { /* WorkerDaemon not declared in this build */ }
+""")
+
+patch("DM-010: gate check passes its worker type",
+    WD,
+    "        const resourceCheck = await this.canRunWorker();",
+    "        const resourceCheck = await this.canRunWorker(workerType); // DM-010: gate-wait metrics per worker")
+
+append("DM-010: daemon status shows worker metrics",
+    DJ,
+    """
+// DM-010: `daemon status` appends the rolling worker metrics the daemon writes
+// to .claude-flow/metrics/daemon-metrics.json.
+import { readFileSync as metricsReadFile } from 'fs';
+import { join as metricsJoin } from 'path';
+function printWorkerMetrics() {
+    let summary;
+    try { summary = JSON.parse(metricsReadFile(metricsJoin(process.cwd(), '.claude-flow', 'metrics', 'daemon-metrics.json'), 'utf-8')); } catch { return; }
+    const fmt = (h) => (h?.n ? `${h.p50}/${h.p95}ms (n=${h.n})` : '-');
+    output.writeln();
+    output.writeln(output.bold(`Worker metrics (last ${Math.round(summary.windowMs / 60000)}m, p50/p95; updated ${summary.updatedAt})`));
+    output.writeln(['Worker'.padEnd(12), 'Runs ok/fail/skip'.padEnd(18), 'Local'.padEnd(22), 'Headless'.padEnd(22), 'Queue'.padEnd(20), 'Gated'].join(' '));
+    for (const [worker, m] of Object.entries(summary.workers).sort()) {
+        const runs = `${m.runs.success || 0}/${m.runs.failure || 0}/${m.runs.skipped || 0}`;
+        output.writeln([worker.padEnd(12), runs.padEnd(18), fmt(m.latency['worker_duration_ms:local']).padEnd(22),
+            fmt(m.latency['worker_duration_ms:headless']).padEnd(22), fmt(m.latency.worker_queue_wait_ms).padEnd(20),
+            fmt(m.latency.worker_gate_wait_ms)].join(' '));
+    }
+}
+try {
+    const statusAction = statusCommand.action;
+    statusCommand.action = async function (...args) {
+        const result = await statusAction.apply(this, args);
+        try { printWorkerMetrics(); } catch { /* status output stays as is */ }
+        return result;
+    };
+} catch { /* no statusCommand in this build */ }
+""")
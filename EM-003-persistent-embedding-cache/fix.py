@@ -0,0 +1,140 @@
+# EM-003: Persistent content-addressed embedding cache in .swarm
+# Wraps the ONNX pipeline EM-001 loads; hits skip inference entirely.
+# 2 ops
+
+patch("EM-003: cache the embedding pipeline",
+    MI,
+    """            embeddingModelState = {
+                loaded: true,
+                model: embedder,
+                tokenizer: null,
+                dimensions: modelDimensions""",
+    """            embeddingModelState = {
+                loaded: true,
+                model: withEmbeddingCache(embedder, modelName, modelDimensions),
+                tokenizer: null,
+                dimensions: modelDimensions""",
+    replaces="8: config-driven model")
+
+append("EM-003: embedding cache",
+    MI,
+    """
+// EM-003: content-addressed embedding cache. One float32 file per
+// sha256(model, dimension, options, text) under .swarm/embedding-cache/<shard>/,
+// with an in-memory LRU in front and mtime-based LRU eviction down to 90% of
+// cache.maxMB (embeddings.json). Disk usage is tracked without listing the
+// cache: every process appends one byte to the `writes` ledger per file it
+// adds, and usage.json holds the bytes and ledger length seen by the last sweep.
+import { createHash as embeddingCacheHash } from 'crypto';
+const EMBEDDING_CACHE_DEFAULT_MB = 256;
+const EMBEDDING_CACHE_MEMORY_ENTRIES = 2048;
+const embeddingCache = { memory: new Map(), hits: 0, misses: 0, usage: 0, evicting: false };
+function embeddingCacheTensor(data) {
+    return { data, dims: [1, data.length], size: data.length, type: 'float32', tolist: () => [Array.from(data)] };
+}
+function rememberEmbedding(key, data) {
+    embeddingCache.memory.delete(key);
+    embeddingCache.memory.set(key, data);
+    if (embeddingCache.memory.size > EMBEDDING_CACHE_MEMORY_ENTRIES) {
+        embeddingCache.memory.delete(embeddingCache.memory.keys().next().value);
+    }
+}
+// Estimated bytes on disk, or null when no sweep has measured the cache yet.
+function embeddingCacheUsage(dir, entryBytes) {
+    let swept;
+    try { swept = JSON.parse(fs.readFileSync(path.join(dir, 'usage.json'), 'utf-8')); } catch { return null; }
+    let writes = 0;
+    try { writes = fs.statSync(path.join(dir, 'writes')).size; } catch { /* no writes yet */ }
+    return (swept.bytes || 0) + Math.max(0, writes - (swept.ledger || 0)) * entryBytes;
+}
+async function evictEmbeddingCache(dir, maxBytes, entryBytes) {
+    if (embeddingCache.evicting) return;
+    embeddingCache.evicting = true;
+    try {
+        // Files added while the sweep runs stay counted through the ledger.
+        const ledger = await fs.promises.stat(path.join(dir, 'writes')).then((st) => st.size, () => 0);
+        const files = [];
+        let total = 0;
+        for (const shard of await fs.promises.readdir(dir)) {
+            const shardDir = path.join(dir, shard);
+            for (const name of await fs.promises.readdir(shardDir).catch(() => [])) {
+                const file = path.join(shardDir, name);
+                const st = await fs.promises.stat(file).catch(() => null);
+                if (!st) continue;
+                files.push([st.mtimeMs, st.size, file]);
+                total += st.size;
+            }
+        }
+        if (total > maxBytes) {
+            files.sort((a, b) => a[0] - b[0]);
+            for (const [, size, file] of files) {
+                if (total <= maxBytes * 0.9) break;
+                await fs.promises.unlink(file).then(() => { total -= size; }, () => {});
+            }
+        }
+        await fs.promises.writeFile(path.join(dir, 'usage.json'), JSON.stringify({ bytes: total, ledger, sweptAt: new Date().toISOString() }));
+        embeddingCache.usage = embeddingCacheUsage(dir, entryBytes) ?? total;
+    } catch { /* best-effort */ }
+    finally { embeddingCache.evicting = false; }
+}
+function withEmbeddingCache(embedder, modelName, dimensions) {
+    let maxBytes = EMBEDDING_CACHE_DEFAULT_MB * 1024 * 1024;
+    try {
+        const embConfig = JSON.parse(fs.readFileSync(path.join(process.cwd(), '.claude-flow', 'embeddings.json'), 'utf-8'));
+        if (embConfig.cache?.maxMB > 0) maxBytes = embConfig.cache.maxMB * 1024 * 1024;
+    } catch { /* defaults */ }
+    const dir = path.join(process.cwd(), '.swarm', 'embedding-cache');
+    // Checked on open, so short-lived processes enforce the cap too; a cache
+    // that was never measured is swept once.
+    const usage = embeddingCacheUsage(dir, dimensions * 4);
+    embeddingCache.usage = usage ?? 0;
+    if (usage === null ? fs.existsSync(dir) : usage > maxBytes) evictEmbeddingCache(dir, maxBytes, dimensions * 4);
+    const cached = async function (text, options) {
+        if (typeof text !== 'string') return embedder(text, options);
+        // Keyed on exactly the text the model embeds.
+        const key = embeddingCacheHash('sha256')
+            .update(JSON.stringify([modelName, dimensions, options ?? null, text])).digest('hex');
+        const file = path.join(dir, key.slice(0, 2), `${key}.f32`);
+        let data = embeddingCache.memory.get(key);
+        if (!data) {
+            try {
+                const buf = await fs.promises.readFile(file);
+                data = new Float32Array(buf.buffer.slice(buf.byteOffset, buf.byteOffset + buf.byteLength));
+                const now = new Date();
+                fs.promises.utimes(file, now, now).catch(() => {});
+            } catch { /* miss */ }
+        }
+        if (data) {
+            embeddingCache.hits++;
+            rememberEmbedding(key, data);
+            return embeddingCacheTensor(data);
+        }
+        embeddingCache.misses++;
+        const output = await embedder(text, options);
+        data = Float32Array.from(output.data);
+        rememberEmbedding(key, data);
+        const tmp = `${file}.${process.pid}.tmp`;
+        fs.promises.mkdir(path.dirname(file), { recursive: true })
+            .then(() => fs.promises.writeFile(tmp, Buffer.from(data.buffer, data.byteOffset, data.byteLength)))
+            .then(() => fs.promises.rename(tmp, file))
+            .then(() => fs.promises.appendFile(path.join(dir, 'writes'), '.'))
+            .then(() => {
+                embeddingCache.usage += data.byteLength;
+                if (embeddingCache.usage > maxBytes) return evictEmbeddingCache(dir, maxBytes, dimensions * 4);
+            })
+            .catch(() => fs.promises.unlink(tmp).catch(() => {}));
+        return output;
+    };
+    // Pipeline properties (tokenizer, model, dispose) stay reachable through the wrapper.
+    return Object.setPrototypeOf(cached, embedder);
+}
+export function getEmbeddingCacheStats() {
+    const lookups = embeddingCache.hits + embeddingCache.misses;
+    return {
+        hits: embeddingCache.hits,
+        misses: embeddingCache.misses,
+        hitRate: lookups ? embeddingCache.hits / lookups : 0,
+        memoryEntries: embeddingCache.memory.size,
+    };
+}
+""")
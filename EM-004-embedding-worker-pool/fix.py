@@ -0,0 +1,317 @@
+# EM-004: Off-main-thread embedding worker pool with batched inference
+# worker_threads pool (1-2 workers by default, each holding its own model copy,
+# fewer when free memory is short); concurrent calls are batched
+# into one ONNX call per worker. Optional quantized model via embeddings.json.
+# Rebuilds embed rows without a usable stored vector through embedBatch().
+# 8 ops
+
+EMBEDDING_POOL = memory + "/embedding-pool.js"
+
+create("EM-004: embedding-pool module",
+    EMBEDDING_POOL,
+    """// embedding-pool.js — added by claude-flow patch EM-004.
+// Runs the @xenova/transformers feature-extraction pipeline in worker threads.
+// Calls made in the same tick with the same options are sent to an idle worker
+// as one padded batch. This file is also the worker entry point.
+import { Worker, isMainThread, parentPort, workerData } from 'worker_threads';
+import * as os from 'os';
+import { readEmbeddingsConfig } from '../services/project-config.js';
+
+const DEFAULT_BATCH_SIZE = 32;
+// Every worker loads its own copy of the model. "auto" starts at most this
+// many, and only as many as fit in a quarter of the free memory.
+const AUTO_MAX_WORKERS = 2;
+const AUTO_MEMORY_SHARE = 0.25;
+
+if (!isMainThread && workerData?.embeddingPool) {
+    try {
+        const { pipeline } = await import('@xenova/transformers');
+        const extractor = await pipeline('feature-extraction', workerData.model, workerData.pipelineOptions);
+        parentPort.on('message', async ({ id, texts, options }) => {
+            try {
+                const output = await extractor(texts, options);
+                const data = Float32Array.from(output.data);
+                parentPort.postMessage({ id, data, dims: output.dims }, [data.buffer]);
+            } catch (e) {
+                parentPort.postMessage({ id, error: e?.message || String(e) });
+            }
+        });
+        parentPort.postMessage({ ready: true });
+    } catch (e) {
+        parentPort.postMessage({ ready: false, error: e?.message || String(e) });
+    }
+}
+
+function tensor(data, dims) {
+    return { data, dims, size: data.length, type: 'float32', tolist: () => [Array.from(data)] };
+}
+
+export class EmbeddingPool {
+    constructor(model, { size, batchSize = DEFAULT_BATCH_SIZE, pipelineOptions = {} } = {}) {
+        this.model = model;
+        this.size = Math.max(1, size || 1);
+        this.batchSize = batchSize;
+        this.pipelineOptions = pipelineOptions;
+        this.workers = [];
+        this.queue = [];
+        this.jobs = new Map();
+        this.nextId = 0;
+        this.scheduled = false;
+        this.stats = { batches: 0, texts: 0, queueWaitMs: 0, runMs: 0 };
+    }
+    // Resolves once one worker has loaded the model; rejects if it cannot.
+    start() {
+        if (!this.workers.length) this.spawn();
+        return this.workers[0].ready;
+    }
+    embed(text, options) {
+        if (Array.isArray(text)) {
+            return this.embedBatch(text, options).then((outs) => {
+                const per = outs[0]?.data.length ?? 0;
+                const data = new Float32Array(per * outs.length);
+                outs.forEach((out, i) => data.set(out.data, i * per));
+                return tensor(data, [outs.length, ...(outs[0]?.dims.slice(1) ?? [0])]);
+            });
+        }
+        return new Promise((resolve, reject) => {
+            this.queue.push({ text, options, key: JSON.stringify(options ?? null), queued: Date.now(), resolve, reject });
+            if (!this.scheduled) {
+                this.scheduled = true;
+                setImmediate(() => { this.scheduled = false; this.dispatch(); });
+            }
+        });
+    }
+    embedBatch(texts, options) {
+        return Promise.all(texts.map((text) => this.embed(text, options)));
+    }
+    spawn() {
+        const worker = { thread: null, ready: null, idle: false, starting: true };
+        worker.thread = new Worker(new URL(import.meta.url), {
+            workerData: { embeddingPool: true, model: this.model, pipelineOptions: this.pipelineOptions },
+        });
+        worker.ready = new Promise((resolve, reject) => {
+            worker.thread.on('message', (msg) => {
+                if ('ready' in msg) {
+                    worker.starting = false;
+                    if (!msg.ready) return reject(new Error(msg.error));
+                    worker.idle = true;
+                    worker.thread.unref();
+                    resolve();
+                    return this.dispatch();
+                }
+                this.finish(worker, msg);
+            });
+            worker.thread.on('error', (e) => { worker.starting = false; reject(e); this.drop(worker, e); });
+            worker.thread.on('exit', () => this.drop(worker, new Error('embedding worker exited')));
+        });
+        worker.ready.catch(() => {});
+        this.workers.push(worker);
+        return worker;
+    }
+    dispatch() {
+        while (this.queue.length) {
+            const worker = this.workers.find((w) => w.idle);
+            if (!worker) {
+                // Grow one worker at a time, only while every running one is busy.
+                if (this.workers.length < this.size && !this.workers.some((w) => w.starting)) this.spawn();
+                return;
+            }
+            const key = this.queue[0].key;
+            const batch = [];
+            this.queue = this.queue.filter((item) => {
+                if (batch.length < this.batchSize && item.key === key) { batch.push(item); return false; }
+                return true;
+            });
+            const id = ++this.nextId;
+            const now = Date.now();
+            for (const item of batch) this.stats.queueWaitMs += now - item.queued;
+            this.jobs.set(id, { batch, worker, started: now });
+            worker.idle = false;
+            worker.thread.ref();
+            worker.thread.postMessage({ id, texts: batch.map((item) => item.text), options: batch[0].options });
+        }
+    }
+    finish(worker, msg) {
+        const job = this.jobs.get(msg.id);
+        if (!job) return;
+        this.jobs.delete(msg.id);
+        worker.idle = true;
+        worker.thread.unref();
+        this.stats.batches++;
+        this.stats.texts += job.batch.length;
+        this.stats.runMs += Date.now() - job.started;
+        if (msg.error) {
+            for (const item of job.batch) item.reject(new Error(msg.error));
+        } else {
+            const per = msg.data.length / job.batch.length;
+            job.batch.forEach((item, i) => item.resolve(tensor(msg.data.slice(i * per, (i + 1) * per), [1, ...msg.dims.slice(1)])));
+        }
+        this.dispatch();
+    }
+    drop(worker, error) {
+        const i = this.workers.indexOf(worker);
+        if (i === -1) return;
+        this.workers.splice(i, 1);
+        for (const [id, job] of this.jobs) {
+            if (job.worker !== worker) continue;
+            this.jobs.delete(id);
+            for (const item of job.batch) item.reject(error);
+        }
+        if (!this.workers.length) {
+            for (const item of this.queue.splice(0)) item.reject(error);
+        }
+    }
+    async terminate() {
+        await Promise.all(this.workers.map((w) => w.thread.terminate()));
+        this.workers = [];
+    }
+}
+
+// Rough resident MB per worker: thread runtime plus an ONNX session of about
+// twice the weight file (int8 unless quantized: false).
+export function embeddingWorkerMemoryMB(model = '', quantized) {
+    const fp32WeightsMB = /large/i.test(model) ? 1300 : /mpnet|base/i.test(model) ? 420 : 90;
+    return 60 + 2 * (quantized === false ? fp32WeightsMB : fp32WeightsMB / 4);
+}
+
+export function embeddingPoolSize(config = readEmbeddingsConfig(), model = config.model) {
+    if (config.workers !== undefined && config.workers !== 'auto') return Math.max(0, parseInt(config.workers, 10) || 0);
+    const byMemory = Math.floor((os.freemem() / 1048576) * AUTO_MEMORY_SHARE / embeddingWorkerMemoryMB(model, config.quantized));
+    return Math.max(1, Math.min(AUTO_MAX_WORKERS, os.cpus().length - 1, byMemory));
+}
+
+// A pipeline-compatible embedder: the worker pool, or the inline pipeline when workers is 0.
+export async function createEmbedder(pipeline, model) {
+    const config = readEmbeddingsConfig();
+    const pipelineOptions = typeof config.quantized === 'boolean' ? { quantized: config.quantized } : {};
+    const size = embeddingPoolSize(config, model);
+    if (!size) return pipeline('feature-extraction', model, pipelineOptions);
+    const pool = new EmbeddingPool(model, { size, batchSize: parseInt(config.batchSize, 10) || DEFAULT_BATCH_SIZE, pipelineOptions });
+    await pool.start();
+    const embed = (text, options) => pool.embed(text, options);
+    embed.embedBatch = (texts, options) => pool.embedBatch(texts, options);
+    embed.dispose = () => pool.terminate();
+    embed.pool = pool;
+    return embed;
+}
+""")
+
+patch("EM-004: embed through the worker pool",
+    MI,
+    "            const embedder = await pipeline('feature-extraction', xenovaModel);",
+    """            // EM-004: worker_threads pool (batched ONNX calls); inline when workers: 0
+            const { createEmbedder } = await import('./embedding-pool.js');
+            const embedder = await createEmbedder(pipeline, xenovaModel);""",
+    replaces="8: config-driven model")
+
+append("EM-004: embedBatch",
+    MI,
+    """
+// EM-004: batched embedding. Concurrent calls are grouped into one ONNX call
+// per pool worker; EM-003 cache hits never reach the pool.
+import { readEmbeddingsConfig as projectEmbeddingsConfig } from '../services/project-config.js';
+export async function embedBatch(texts, options = { pooling: 'mean', normalize: true }) {
+    if (!embeddingModelState?.loaded) await loadEmbeddingModel({ verbose: false });
+    const model = embeddingModelState?.model;
+    if (typeof model !== 'function') throw new Error('ONNX embedding model not available');
+    const outputs = await Promise.all(texts.map((text) => model(text, options)));
+    return outputs.map((output) => Array.from(output.data));
+}
+// The HNSW rebuilds only read stored vectors, so rows stored while the model
+// was unavailable, or embedded by another model/dimension, stay unsearchable.
+// Such rows are embedded EMBED_REFILL_CHUNK at a time, added to the index and
+// written back to memory.db. `rows` defaults to every active row.
+const EMBED_REFILL_CHUNK = 256;
+function storedEmbeddingFits(json, dimensions) {
+    try {
+        const embedding = JSON.parse(json);
+        return Array.isArray(embedding) && embedding.length === dimensions;
+    } catch { return false; }
+}
+export async function embedMissingHNSWEntries(index, rows) {
+    if (!index?.entries || typeof addToHNSWIndex !== 'function') return { embedded: 0 };
+    if (!rows) {
+        [rows] = await readMemoryRows([[`SELECT id, key, namespace, content, embedding FROM memory_entries
+            WHERE status = 'active'`, []]]);
+    }
+    const missing = rows.filter((row) => row.content && !index.entries.has(String(row.id))
+        && !storedEmbeddingFits(row.embedding, index.dimensions));
+    const stored = [];
+    for (let i = 0; i < missing.length; i += EMBED_REFILL_CHUNK) {
+        const chunk = missing.slice(i, i + EMBED_REFILL_CHUNK);
+        let vectors;
+        try { vectors = await embedBatch(chunk.map((row) => String(row.content))); } catch { break; }
+        for (const [j, row] of chunk.entries()) {
+            if (vectors[j]?.length !== index.dimensions) continue;
+            const id = String(row.id);
+            await addToHNSWIndex(id, vectors[j], { id, key: row.key, namespace: row.namespace, content: row.content });
+            stored.push([JSON.stringify(vectors[j]), id]);
+        }
+    }
+    if (!stored.length) return { embedded: 0 };
+    // Not bumping updated_at: the rows' content is unchanged.
+    const dbPath = path.join(process.cwd(), '.swarm', 'memory.db');
+    try {
+        const initSqlJs = (await import('sql.js')).default;
+        const db = await openMemoryDb(await initSqlJs(), dbPath);
+        db.exec('BEGIN');
+        try {
+            for (const params of stored) db.run('UPDATE memory_entries SET embedding = ? WHERE id = ?', params);
+            db.exec('COMMIT');
+        } catch (error) {
+            try { db.exec('ROLLBACK'); } catch { /* no transaction open */ }
+            throw error;
+        }
+        persistMemoryDb(dbPath, db);
+    } catch { /* indexed now; embedded again on the next rebuild */ }
+    return { embedded: stored.length };
+}
+""")
+
+patch("EM-004: cache key includes quantized",
+    MI,
+    """        // Keyed on exactly the text the model embeds.
+        const key = embeddingCacheHash('sha256')
+            .update(JSON.stringify([modelName, dimensions, options ?? null, text])).digest('hex');""",
+    """        // Keyed on exactly the text the model embeds, and on EM-004 `quantized`
+        // (int8 and fp32 weights give different vectors).
+        const key = embeddingCacheHash('sha256')
+            .update(JSON.stringify([modelName, dimensions, quantized, options ?? null, text])).digest('hex');""",
+    replaces="EM-003: embedding cache")
+
+patch("EM-004: cache reads quantized",
+    MI,
+    """    const dir = path.join(process.cwd(), '.swarm', 'embedding-cache');
+    // Checked on open""",
+    """    const dir = path.join(process.cwd(), '.swarm', 'embedding-cache');
+    const quantized = projectEmbeddingsConfig().quantized ?? null;
+    // Checked on open""",
+    replaces="EM-003: embedding cache")
+
+patch("EM-004: compaction embeds missing rows",
+    MI,
+    """    const index = await getHNSWIndex({ forceRebuild: true });
+    return { compacted: true, tombstones: stats.tombstones, ratio: stats.ratio, entries: index?.entries?.size ?? 0 };""",
+    """    const index = await getHNSWIndex({ forceRebuild: true });
+    const { embedded } = await embedMissingHNSWEntries(index);
+    return { compacted: true, tombstones: stats.tombstones, ratio: stats.ratio, entries: index?.entries?.size ?? 0, embedded };""",
+    replaces="GV-002: tombstone journal")
+
+patch("EM-004: incremental update reads unembedded rows",
+    MI,
+    """          WHERE status = 'active' AND embedding IS NOT NULL AND updated_at > ?`, [since]],""",
+    """          WHERE status = 'active' AND updated_at > ?`, [since]],""",
+    replaces="DM-006: incremental HNSW update")
+
+patch("EM-004: incremental update embeds missing rows",
+    MI,
+    """        await addToHNSWIndex(id, embedding, entry);
+        indexed++;
+    }
+    return { indexed, refreshed, watermark: Math.max(since, mark?.updatedAt ?? 0) };""",
+    """        await addToHNSWIndex(id, embedding, entry);
+        indexed++;
+    }
+    indexed += (await embedMissingHNSWEntries(index, rows)).embedded;
+    return { indexed, refreshed, watermark: Math.max(since, mark?.updatedAt ?? 0) };""",
+    replaces="DM-006: incremental HNSW update")
@@ -0,0 +1,150 @@
+# GV-002: Tombstone journal for HNSW deletes
+# deleteEntry() appends to .swarm/hnsw.tombstones instead of rewriting
+# hnsw.metadata.json; loads and searches apply the journal, consolidation compacts.
+# 3 ops
+
+patch("GV-002: journal HNSW delete",
+    MI,
+    """        // Remove ghost vector from HNSW metadata file
+        const entryId = String(checkResult[0].values[0][0]);
+        try {
+            const swarmDir = path.join(process.cwd(), '.swarm');
+            const metadataPath = path.join(swarmDir, 'hnsw.metadata.json');
+            if (fs.existsSync(metadataPath)) {
+                const metadata = JSON.parse(fs.readFileSync(metadataPath, 'utf-8'));
+                const filtered = metadata.filter(([id]) => id !== entryId);
+                if (filtered.length < metadata.length) {
+                    fs.writeFileSync(metadataPath, JSON.stringify(filtered));
+                }
+            }
+        } catch { /* best-effort */ }""",
+    """        // GV-002: journal the ghost vector instead of rewriting hnsw.metadata.json
+        const entryId = String(checkResult[0].values[0][0]);
+        appendHNSWTombstone(entryId);""",
+    replaces="GV-001: remove HNSW entry on delete")
+
+append("GV-002: tombstone journal",
+    MI,
+    """
+// GV-002: HNSW tombstone journal. Deleted ids are appended to
+// .swarm/hnsw.tombstones; loaded indexes drop them, searches over-fetch past
+// the ghost vectors still in the graph (at most HNSW_TOMBSTONE_MAX_OVERFETCH
+// times the limit), and compactHNSWIndex() rebuilds once they pass
+// HNSW_TOMBSTONE_COMPACT_RATIO of it.
+const HNSW_TOMBSTONE_COMPACT_RATIO = 0.2;
+const HNSW_TOMBSTONE_MAX_OVERFETCH = 4;
+const hnswTombstones = { index: null, offset: 0, ids: new Set() };
+// Distinct ids in the journal while no index is loaded, keyed on its size and mtime.
+const hnswTombstoneJournal = { key: null, count: 0 };
+function hnswTombstonePath() {
+    return path.join(process.cwd(), '.swarm', 'hnsw.tombstones');
+}
+function appendHNSWTombstone(entryId) {
+    try {
+        const file = hnswTombstonePath();
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.appendFileSync(file, `${entryId}\\n`);
+    } catch { /* best-effort: the entries Map removal still hides it in this process */ }
+}
+function syncHNSWTombstones(index) {
+    // Apply journal lines appended since the last sync (a stat when there are none).
+    if (!index?.entries) return;
+    if (hnswTombstones.index !== index) {
+        hnswTombstones.index = index;
+        hnswTombstones.offset = 0;
+        hnswTombstones.ids = new Set();
+    }
+    const file = hnswTombstonePath();
+    let size;
+    try { size = fs.statSync(file).size; } catch { return; }
+    if (size < hnswTombstones.offset) hnswTombstones.offset = 0; // rebuilt elsewhere
+    if (size === hnswTombstones.offset) return;
+    const fd = fs.openSync(file, 'r');
+    try {
+        const buf = Buffer.alloc(size - hnswTombstones.offset);
+        fs.readSync(fd, buf, 0, buf.length, hnswTombstones.offset);
+        const end = buf.lastIndexOf(10) + 1; // complete lines only
+        for (const id of buf.toString('utf-8', 0, end).split('\\n')) {
+            if (!id) continue;
+            hnswTombstones.ids.add(id);
+            index.entries.delete(id);
+        }
+        hnswTombstones.offset += end;
+    } catch { /* journal unreadable: keep what was applied */ }
+    finally { fs.closeSync(fd); }
+}
+function countHNSWTombstoneJournal() {
+    const file = hnswTombstonePath();
+    let stat;
+    try { stat = fs.statSync(file); } catch { return 0; }
+    const key = `${stat.size}:${stat.mtimeMs}`;
+    if (hnswTombstoneJournal.key !== key) {
+        try {
+            hnswTombstoneJournal.count = new Set(fs.readFileSync(file, 'utf-8').split('\\n').filter(Boolean)).size;
+            hnswTombstoneJournal.key = key;
+        } catch { return hnswTombstoneJournal.count; }
+    }
+    return hnswTombstoneJournal.count;
+}
+export function getHNSWTombstoneStats() {
+    // With no index loaded there is no graph to weigh the journal against:
+    // the count is reported and the ratio left unknown.
+    if (!hnswIndex?.entries) return { tombstones: countHNSWTombstoneJournal(), entries: null, ratio: null };
+    syncHNSWTombstones(hnswIndex);
+    const tombstones = hnswTombstones.ids.size;
+    const total = hnswIndex.entries.size + tombstones;
+    return { tombstones, entries: hnswIndex.entries.size, ratio: total ? tombstones / total : 0 };
+}
+export async function compactHNSWIndex(options = {}) {
+    const threshold = options.threshold ?? HNSW_TOMBSTONE_COMPACT_RATIO;
+    if (!options.force) await getHNSWIndex();
+    const stats = getHNSWTombstoneStats();
+    if (!options.force && (!stats.tombstones || stats.ratio < threshold)) {
+        return { compacted: false, ...stats };
+    }
+    clearHNSWIndex();
+    const index = await getHNSWIndex({ forceRebuild: true });
+    return { compacted: true, tombstones: stats.tombstones, ratio: stats.ratio, entries: index?.entries?.size ?? 0 };
+}
+try {
+    const getHNSWIndexBase = getHNSWIndex;
+    getHNSWIndex = async function (options) {
+        if (options?.forceRebuild) {
+            try { fs.unlinkSync(hnswTombstonePath()); } catch { /* no journal */ }
+        }
+        const index = await getHNSWIndexBase(options);
+        if (index) syncHNSWTombstones(index);
+        return index;
+    };
+    const searchEntriesBase = searchEntries;
+    searchEntries = async function (options) {
+        // Ghosts only exist in a loaded graph, and the search loads it anyway.
+        if (!hnswIndex) await getHNSWIndex().catch(() => null);
+        const { tombstones, ratio } = getHNSWTombstoneStats();
+        if (!tombstones || ratio === null) return searchEntriesBase(options);
+        // At most `tombstones` ghosts can outrank real hits: fetch past all of
+        // them while that is cheap, else twice the expected ghost share, never
+        // more than the cap (past it the graph is due for compaction).
+        const limit = options?.limit ?? 10;
+        const extra = Math.min(tombstones, HNSW_TOMBSTONE_MAX_OVERFETCH * limit,
+            Math.max(limit, 2 * Math.ceil(limit * ratio / Math.max(1 - ratio, 0.05))));
+        const result = await searchEntriesBase({ ...options, limit: limit + extra });
+        if (Array.isArray(result?.results) && result.results.length > limit) {
+            result.results = result.results.slice(0, limit);
+        }
+        return result;
+    };
+} catch { /* const bindings in this build: deletes are still journaled */ }
+""")
+
+patch("GV-002: consolidate compacts tombstones",
+    WD,
+    """            // 2. Rebuild HNSW index with current data
+            mi.clearHNSWIndex();
+            const hnsw = await mi.getHNSWIndex({ forceRebuild: true });
+            if (hnsw) result.hnswRebuilt = hnsw.entries?.size ?? 0;""",
+    """            // 2. Rebuild HNSW index with current data (drops the GV-002 tombstone journal)
+            const hnsw = await mi.compactHNSWIndex({ force: true });
+            result.hnswRebuilt = hnsw.entries;
+            result.tombstonesCompacted = hnsw.tombstones;""",
+    replaces="12: real consolidate worker")
@@ -0,0 +1,223 @@
+# GV-003: Namespace-partitioned vector search + SQL indexes by migration
+# Namespaced searches probe a per-namespace partition instead of the global
+# graph; memory-store creates composite indexes for namespace/status scans.
+# 2 ops
+
+MEMORY_STORE = memory + "/memory-store.js"
+
+append("GV-003: namespace partitions",
+    MI,
+    """
+// GV-003: namespace-partitioned vector search. A namespaced searchHNSWIndex()
+// probes that namespace's partition (flat up to HNSW_PARTITION_FLAT_MAX
+// vectors, else its own VectorDb), presented to the existing search code as a
+// view of the loaded index. 'all' keeps the global graph. Each process builds
+// a partition on first use; from HNSW_PARTITION_PERSIST_MIN vectors it is also
+// written to .swarm/hnsw-partitions/, so later processes load it instead.
+import { AsyncLocalStorage as HNSWPartitionScope } from 'async_hooks';
+const HNSW_PARTITION_FLAT_MAX = 2000;
+const HNSW_PARTITION_PERSIST_MIN = 500;
+const HNSW_PARTITION_MAGIC = 'CFP1';
+const hnswPartitions = { index: null, byNamespace: new Map(), scope: new HNSWPartitionScope() };
+function unitVector(values) {
+    const v = Float32Array.from(values);
+    let norm = 0;
+    for (let i = 0; i < v.length; i++) norm += v[i] * v[i];
+    norm = Math.sqrt(norm) || 1;
+    for (let i = 0; i < v.length; i++) v[i] /= norm;
+    return v;
+}
+async function addToHNSWPartition(part, id, vector) {
+    if (part.db) await part.db.insert({ id, vector: new Float32Array(vector) });
+    else { part.ids.push(id); part.vectors.push(unitVector(vector)); }
+}
+// Rows through MS-001's shared memory.db handle, which a search has open anyway.
+async function readSharedMemoryRows(sql, params) {
+    const dbPath = path.join(process.cwd(), '.swarm', 'memory.db');
+    if (!fs.existsSync(dbPath)) return [];
+    const initSqlJs = (await import('sql.js')).default;
+    const db = await openMemoryDb(await initSqlJs(), dbPath);
+    try {
+        const stmt = db.prepare(sql);
+        const rows = [];
+        try {
+            stmt.bind(params);
+            while (stmt.step()) rows.push(stmt.getAsObject());
+        } finally { stmt.free(); }
+        return rows;
+    } finally { db.close(); }
+}
+function hnswPartitionPath(namespace) {
+    return path.join(process.cwd(), '.swarm', 'hnsw-partitions', `${encodeURIComponent(namespace)}.f32`);
+}
+// File: magic, uint32 header length, JSON header (dimensions, the row count and
+// MAX(updated_at) it was built from, ids), unit float32 vectors. Any insert,
+// update or delete in the namespace changes the stamp and the file is rebuilt.
+function readHNSWPartition(namespace, dimensions, stamp) {
+    let buf;
+    try { buf = fs.readFileSync(hnswPartitionPath(namespace)); } catch { return null; }
+    try {
+        if (buf.toString('latin1', 0, 4) !== HNSW_PARTITION_MAGIC) return null;
+        const headerEnd = 8 + buf.readUInt32LE(4);
+        const header = JSON.parse(buf.toString('utf-8', 8, headerEnd));
+        if (header.dimensions !== dimensions || header.count !== stamp.count || header.updatedAt !== stamp.updatedAt) return null;
+        const data = new Float32Array(header.ids.length * dimensions);
+        new Uint8Array(data.buffer).set(buf.subarray(headerEnd, headerEnd + data.byteLength));
+        return { ids: header.ids, vectors: header.ids.map((_, i) => data.subarray(i * dimensions, (i + 1) * dimensions)) };
+    } catch { return null; }
+}
+function writeHNSWPartition(namespace, dimensions, stamp, ids, vectors) {
+    const header = Buffer.from(JSON.stringify({ dimensions, count: stamp.count, updatedAt: stamp.updatedAt, ids }));
+    const prefix = Buffer.alloc(8);
+    prefix.write(HNSW_PARTITION_MAGIC, 0, 'latin1');
+    prefix.writeUInt32LE(header.length, 4);
+    const data = new Float32Array(ids.length * dimensions);
+    vectors.forEach((v, i) => data.set(v, i * dimensions));
+    const file = hnswPartitionPath(namespace);
+    const tmp = `${file}.${process.pid}.tmp`;
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.writeFileSync(tmp, Buffer.concat([prefix, header, Buffer.from(data.buffer)]));
+        fs.renameSync(tmp, file);
+    } catch {
+        try { fs.unlinkSync(tmp); } catch { /* never written */ }
+    }
+}
+async function loadHNSWPartition(index, namespace) {
+    if (hnswPartitions.index !== index) {
+        hnswPartitions.index = index;
+        hnswPartitions.byNamespace = new Map();
+    }
+    let part = hnswPartitions.byNamespace.get(namespace);
+    if (part) return part;
+    const [stamp] = await readSharedMemoryRows(`SELECT COUNT(*) AS count, MAX(updated_at) AS updatedAt FROM memory_entries
+        WHERE namespace = ? AND status = 'active' AND embedding IS NOT NULL`, [namespace]);
+    let stored = stamp && readHNSWPartition(namespace, index.dimensions, stamp);
+    if (!stored) {
+        // Every valid row goes to the file, whether the index has it yet or not.
+        stored = { ids: [], vectors: [] };
+        const rows = await readSharedMemoryRows(`SELECT id, embedding FROM memory_entries
+            WHERE namespace = ? AND status = 'active' AND embedding IS NOT NULL`, [namespace]);
+        for (const row of rows) {
+            let vector;
+            try { vector = JSON.parse(row.embedding); } catch { continue; }
+            if (!Array.isArray(vector) || vector.length !== index.dimensions) continue;
+            stored.ids.push(String(row.id));
+            stored.vectors.push(unitVector(vector));
+        }
+        if (stamp && stored.ids.length >= HNSW_PARTITION_PERSIST_MIN) {
+            writeHNSWPartition(namespace, index.dimensions, stamp, stored.ids, stored.vectors);
+        }
+    }
+    const ids = [], vectors = [];
+    stored.ids.forEach((id, i) => {
+        if (!index.entries.has(id)) return;
+        ids.push(id);
+        vectors.push(stored.vectors[i]);
+    });
+    part = { ids: [], vectors: [], db: null };
+    if (ids.length > HNSW_PARTITION_FLAT_MAX) {
+        try {
+            const { VectorDb } = await import('@ruvector/core');
+            part.db = new VectorDb({ dimensions: index.dimensions, distanceMetric: 'Cosine' });
+        } catch { /* flat */ }
+    }
+    for (let i = 0; i < ids.length; i++) await addToHNSWPartition(part, ids[i], vectors[i]);
+    hnswPartitions.byNamespace.set(namespace, part);
+    return part;
+}
+function searchFlatPartition(part, query, k) {
+    const q = unitVector(query);
+    const hits = [];
+    for (let n = 0; n < part.vectors.length; n++) {
+        const v = part.vectors[n];
+        let dot = 0;
+        for (let i = 0; i < v.length; i++) dot += v[i] * q[i];
+        hits.push({ id: part.ids[n], score: 1 - dot }); // cosine distance, like VectorDb
+    }
+    return hits.sort((a, b) => a.score - b.score).slice(0, k);
+}
+// NAMESPACE's partition as a db for the dist's search code.
+async function hnswPartitionView(index, namespace) {
+    const part = await loadHNSWPartition(index, namespace);
+    return part.db ?? {
+        search: async ({ vector, k }) => searchFlatPartition(part, vector, k),
+        len: async () => part.ids.length,
+    };
+}
+try {
+    const getIndexForPartition = getHNSWIndex;
+    getHNSWIndex = async function (options) {
+        const view = hnswPartitions.scope.getStore();
+        return view && !options ? view : getIndexForPartition(options);
+    };
+    const searchHNSWIndexGlobal = searchHNSWIndex;
+    searchHNSWIndex = async function (queryEmbedding, options) {
+        const namespace = options?.namespace;
+        if (!namespace || namespace === 'all') return searchHNSWIndexGlobal(queryEmbedding, options);
+        const index = await getIndexForPartition();
+        if (!index?.db || !index.entries) return searchHNSWIndexGlobal(queryEmbedding, options);
+        let db = null;
+        try { db = await hnswPartitionView(index, namespace); }
+        catch { /* global graph */ }
+        if (!db) return searchHNSWIndexGlobal(queryEmbedding, options);
+        return hnswPartitions.scope.run({ ...index, db }, () => searchHNSWIndexGlobal(queryEmbedding, options));
+    };
+    const addToHNSWIndexGlobal = addToHNSWIndex;
+    addToHNSWIndex = async function (id, embedding, entry, ...rest) {
+        const added = await addToHNSWIndexGlobal(id, embedding, entry, ...rest);
+        const part = hnswPartitions.index === hnswIndex && entry?.namespace && hnswPartitions.byNamespace.get(entry.namespace);
+        if (part) await addToHNSWPartition(part, String(id), embedding).catch(() => {});
+        return added;
+    };
+} catch { /* const bindings or no searchHNSWIndex in this build: unpartitioned search */ }
+""")
+
+patch("GV-003: memory.db index migration",
+    MEMORY_STORE,
+    """// The shared handle for DBPATH, as a sql.js-compatible Database.
+export async function openMemoryDb(SQL, dbPath) {
+    const key = path.resolve(dbPath);
+    let handle = handles.get(key);
+    if (!handle) {
+        const config = storeConfig();
+        const Database = fs.existsSync(key) ? await loadNative(config.backend) : null;
+        handle = Database ? new NativeHandle(Database, key, config) : new SqlJsHandle(SQL, key, config);
+        handles.set(key, handle);
+        installExitHook();
+    }
+    return handle.open();
+}""",
+    """// GV-003: composite indexes for namespace-filtered list/search and status scans.
+const MIGRATIONS = [
+    ['idx_memory_ns_status_key', 'CREATE INDEX IF NOT EXISTS idx_memory_ns_status_key ON memory_entries(namespace, status, key)'],
+    ['idx_memory_status_created', 'CREATE INDEX IF NOT EXISTS idx_memory_status_created ON memory_entries(status, created_at)'],
+];
+
+function migrate(handle, db) {
+    if (handle.migrated === db) return;
+    try {
+        const have = new Set((db.exec(`SELECT name FROM sqlite_master WHERE type = 'index'`)[0]?.values || []).map((row) => row[0]));
+        const todo = MIGRATIONS.filter(([name]) => !have.has(name));
+        for (const [, sql] of todo) db.exec(sql);
+        if (todo.length) handle.persist();
+        handle.migrated = db;
+    } catch { /* no memory_entries yet, or read-only: retried on the next open */ }
+}
+
+// The shared handle for DBPATH, as a sql.js-compatible Database.
+export async function openMemoryDb(SQL, dbPath) {
+    const key = path.resolve(dbPath);
+    let handle = handles.get(key);
+    if (!handle) {
+        const config = storeConfig();
+        const Database = fs.existsSync(key) ? await loadNative(config.backend) : null;
+        handle = Database ? new NativeHandle(Database, key, config) : new SqlJsHandle(SQL, key, config);
+        handles.set(key, handle);
+        installExitHook();
+    }
+    const db = handle.open();
+    migrate(handle, db);
+    return db;
+}""",
+    replaces="MS-001: memory-store module")
@@ -0,0 +1,525 @@
+# GV-004: int8 / float16 storage for the HNSW index and its persisted form
+# embeddings.json "hnsw.storage" replaces the native float32 graph with an HNSW
+# graph over quantized vectors, persisted as .swarm/hnsw.<storage>.index; its top
+# candidates are optionally rescored against the float32 embeddings in memory.db,
+# and getHNSWStatus() reports the recall measured against float32 sample queries.
+# 4 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("GV-004: storage settings in project-config",
+    PROJECT_CONFIG,
+    """        tombstoneCompactRatio: number(hnsw.tombstoneCompactRatio, null),
+    };""",
+    """        tombstoneCompactRatio: number(hnsw.tombstoneCompactRatio, null),
+        storage: ['int8', 'float16'].includes(hnsw.storage) ? hnsw.storage : 'float32',
+        rescore: hnsw.rescore !== false,
+    };""",
+    replaces="CF-003: project-config module")
+
+append("GV-004: quantized vector store",
+    MI,
+    """
+// GV-004: quantized HNSW vectors. With hnsw.storage int8 or float16 the index is
+// an HNSWQuantizedStore instead of the native float32 graph: unit-normalized
+// vectors in one typed array (int8 with one scale per vector, or float16) with
+// an HNSW graph over them, persisted as .swarm/hnsw.<storage>.index. It answers
+// the db.insert/search/len calls the dist's index code makes.
+const HNSW_RECALL_SAMPLE = { queries: 8, k: 10 };
+const HNSW_RESCORE_FACTOR = 4;
+const HNSW_QUANTIZED_SAVE_MS = 1000;
+const HNSW_QUANTIZED_MAGIC = 'CFQ2';
+const HNSW_QUANTIZED_DEFAULTS = { m: 16, efConstruction: 100, efSearch: 64 };
+// Up to this many rows an exact scan beats the graph walk (768-dim int8,
+// efSearch 64; see issue.md), so small indexes and namespaces are scanned.
+const HNSW_QUANTIZED_SCAN_MAX = 1000;
+const float16Table = (() => {
+    const table = new Float32Array(65536);
+    for (let h = 0; h < 65536; h++) {
+        const exp = (h >> 10) & 0x1f, frac = h & 0x3ff, sign = h & 0x8000 ? -1 : 1;
+        table[h] = exp === 0 ? sign * frac * 2 ** -24
+            : exp === 31 ? (frac ? NaN : sign * Infinity)
+            : sign * (1 + frac / 1024) * 2 ** (exp - 15);
+    }
+    return table;
+})();
+function toFloat16(x) {
+    const f = new Float32Array([x]), u = new Uint32Array(f.buffer)[0];
+    const sign = (u >> 16) & 0x8000, exp = ((u >> 23) & 0xff) - 112, frac = u & 0x7fffff;
+    if (exp <= 0) return sign | Math.round((frac | 0x800000) / 2 ** (14 - exp));
+    if (exp >= 31) return sign | 0x7c00;
+    return (sign | (exp << 10)) + Math.round(frac / 8192);
+}
+function hnswStorage() {
+    const { storage, rescore } = projectHNSWConfig();
+    return { type: storage, rescore: storage !== 'float32' && rescore };
+}
+function hnswQuantizedPath(type) {
+    return path.join(process.cwd(), '.swarm', `hnsw.${type}.index`);
+}
+// Keeps LIST ({ p, score }) sorted by ascending score.
+function insertByScore(list, item) {
+    let lo = 0, hi = list.length;
+    while (lo < hi) {
+        const mid = (lo + hi) >> 1;
+        if (list[mid].score <= item.score) lo = mid + 1;
+        else hi = mid;
+    }
+    list.splice(lo, 0, item);
+}
+class HNSWQuantizedStore {
+    constructor(type, dimensions, capacity = 0) {
+        this.type = type;
+        this.dimensions = dimensions;
+        this.rescore = hnswStorage().rescore;
+        const config = projectHNSWConfig();
+        this.m = config.m || HNSW_QUANTIZED_DEFAULTS.m;
+        this.efConstruction = config.efConstruction || HNSW_QUANTIZED_DEFAULTS.efConstruction;
+        this.efSearch = config.efSearch || HNSW_QUANTIZED_DEFAULTS.efSearch;
+        this.ids = [];
+        this.positions = new Map();
+        this.scales = new Float32Array(Math.max(capacity, 64));
+        this.codes = this.allocate(this.scales.length * dimensions);
+        // links[p][level] = neighbour positions; entry = top-level entry point.
+        this.links = [];
+        this.entry = -1;
+        this.maxLevel = -1;
+        this.recall = null;
+        this.recallSample = 0;
+        this.loaded = false;
+        this.dirty = false;
+        this.saveTimer = null;
+        this.namespaces = null;
+    }
+    allocate(length) {
+        return this.type === 'float16' ? new Uint16Array(length) : new Int8Array(length);
+    }
+    put(id, values) {
+        if (values.length !== this.dimensions) throw new Error(`expected ${this.dimensions} dimensions, got ${values.length}`);
+        let p = this.positions.get(id);
+        const added = p === undefined;
+        if (added) {
+            p = this.ids.length;
+            if (p === this.scales.length) {
+                const scales = new Float32Array(p * 2), codes = this.allocate(p * 2 * this.dimensions);
+                scales.set(this.scales);
+                codes.set(this.codes);
+                this.scales = scales;
+                this.codes = codes;
+            }
+            this.ids.push(id);
+            this.positions.set(id, p);
+        }
+        const v = unitVector(values), d = this.dimensions, offset = p * d;
+        if (this.type === 'float16') {
+            for (let i = 0; i < d; i++) this.codes[offset + i] = toFloat16(v[i]);
+            this.scales[p] = 1;
+        } else {
+            let max = 0;
+            for (let i = 0; i < d; i++) max = Math.max(max, Math.abs(v[i]));
+            const scale = max / 127 || 1;
+            for (let i = 0; i < d; i++) this.codes[offset + i] = Math.round(v[i] / scale);
+            this.scales[p] = scale;
+        }
+        // An updated vector keeps its links, like the native graph.
+        if (added) this.link(p, v);
+        this.dirty = true;
+        return p;
+    }
+    dot(p, q) {
+        const codes = this.codes, d = this.dimensions, offset = p * d;
+        let dot = 0;
+        if (this.type === 'float16') for (let i = 0; i < d; i++) dot += float16Table[codes[offset + i]] * q[i];
+        else for (let i = 0; i < d; i++) dot += codes[offset + i] * q[i];
+        return dot * this.scales[p];
+    }
+    decode(p) {
+        const codes = this.codes, d = this.dimensions, offset = p * d, v = new Float32Array(d);
+        for (let i = 0; i < d; i++) v[i] = (this.type === 'float16' ? float16Table[codes[offset + i]] : codes[offset + i]) * this.scales[p];
+        return v;
+    }
+    // The EF rows closest to Q reachable from ENTRY on LEVEL, by ascending distance.
+    searchLayer(q, entry, ef, level) {
+        const visited = new Set([entry]);
+        const start = { p: entry, score: 1 - this.dot(entry, q) };
+        const candidates = [start], found = [start];
+        while (candidates.length) {
+            const c = candidates.shift();
+            if (found.length >= ef && c.score > found[found.length - 1].score) break;
+            for (const n of this.links[c.p][level] || []) {
+                if (visited.has(n)) continue;
+                visited.add(n);
+                const score = 1 - this.dot(n, q);
+                if (found.length < ef || score < found[found.length - 1].score) {
+                    insertByScore(found, { p: n, score });
+                    insertByScore(candidates, { p: n, score });
+                    if (found.length > ef) found.pop();
+                }
+            }
+        }
+        return found;
+    }
+    descend(q, level) {
+        let entry = this.entry;
+        for (let l = this.maxLevel; l > level; l--) entry = this.searchLayer(q, entry, 1, l)[0].p;
+        return entry;
+    }
+    link(p, v) {
+        const level = Math.floor(-Math.log(1 - Math.random()) / Math.log(this.m));
+        this.links[p] = Array.from({ length: level + 1 }, () => []);
+        if (this.entry < 0) {
+            this.entry = p;
+            this.maxLevel = level;
+            return;
+        }
+        let entry = this.descend(v, level);
+        for (let l = Math.min(level, this.maxLevel); l >= 0; l--) {
+            const found = this.searchLayer(v, entry, this.efConstruction, l);
+            const max = l === 0 ? 2 * this.m : this.m;
+            this.links[p][l] = this.select(found, this.m);
+            for (const n of this.links[p][l]) {
+                const list = this.links[n][l];
+                list.push(p);
+                if (list.length > max) this.prune(n, l, max);
+            }
+            entry = found[0].p;
+        }
+        if (level > this.maxLevel) {
+            this.entry = p;
+            this.maxLevel = level;
+        }
+    }
+    // HNSW's neighbour heuristic over FOUND (by ascending distance): a row closer
+    // to an already chosen neighbour than to the new one is skipped, so links
+    // keep reaching neighbouring clusters.
+    select(found, max) {
+        const chosen = [], vectors = [];
+        for (const h of found) {
+            if (chosen.length === max) break;
+            if (vectors.some((v) => 1 - this.dot(h.p, v) < h.score)) continue;
+            chosen.push(h.p);
+            vectors.push(this.decode(h.p));
+        }
+        return chosen;
+    }
+    prune(p, level, max) {
+        const v = this.decode(p);
+        const found = this.links[p][level].map((n) => ({ p: n, score: 1 - this.dot(n, v) })).sort((a, b) => a.score - b.score);
+        this.links[p][level] = this.select(found, max);
+    }
+    scan(q, k, positions) {
+        const best = [];
+        const n = positions ? positions.length : this.ids.length;
+        for (let j = 0; j < n; j++) {
+            const p = positions ? positions[j] : j;
+            const score = 1 - this.dot(p, q);
+            if (best.length === k && score >= best[k - 1].score) continue;
+            insertByScore(best, { p, score });
+            if (best.length > k) best.pop();
+        }
+        return best;
+    }
+    // [{ id, score }] by ascending cosine distance, like VectorDb. VIEW limits
+    // the search to a namespace's rows ({ positions, members }).
+    nearest(q, k, view) {
+        const n = view ? view.positions.length : this.ids.length;
+        // A namespace holding a share of the rows needs a walk that much wider.
+        const ef = Math.ceil(Math.max(this.efSearch, k) * this.ids.length / Math.max(n, 1));
+        const hits = n <= HNSW_QUANTIZED_SCAN_MAX || ef >= n || this.entry < 0
+            ? this.scan(q, k, view?.positions)
+            : this.searchLayer(q, this.descend(q, 0), ef, 0).filter((h) => !view || view.members.has(h.p)).slice(0, k);
+        return hits.map(({ p, score }) => ({ id: this.ids[p], score }));
+    }
+    async insert({ id, vector }) {
+        this.put(String(id), vector);
+    }
+    async search({ vector, k, view }) {
+        const hits = this.nearest(unitVector(vector), this.rescore ? k * HNSW_RESCORE_FACTOR : k, view);
+        if (!this.rescore || !hits.length) return hits;
+        return rescoreHNSWCandidates(hits, vector, k).catch(() => hits.slice(0, k));
+    }
+    async len() {
+        return this.ids.length;
+    }
+    // NAMESPACE's rows as a db for the dist's search code (GV-003 partitions).
+    namespaceView(namespace, entries) {
+        if (this.namespaces?.count !== this.ids.length) {
+            const byNamespace = new Map();
+            for (let p = 0; p < this.ids.length; p++) {
+                const ns = entries.get(this.ids[p])?.namespace;
+                if (!byNamespace.has(ns)) byNamespace.set(ns, { positions: [], members: new Set() });
+                const view = byNamespace.get(ns);
+                view.positions.push(p);
+                view.members.add(p);
+            }
+            this.namespaces = { count: this.ids.length, byNamespace };
+        }
+        const view = this.namespaces.byNamespace.get(namespace) || { positions: [], members: new Set() };
+        return {
+            search: ({ vector, k }) => this.search({ vector, k, view }),
+            len: async () => view.positions.length,
+        };
+    }
+}
+// Exact float32 top-k of a few sample queries, accumulated while the index is
+// built, for recall@k of the quantized search (before rescoring).
+class HNSWRecallSample {
+    constructor(rows, dimensions) {
+        const step = Math.max(1, Math.floor(rows.length / HNSW_RECALL_SAMPLE.queries));
+        this.queries = [];
+        for (let i = 0; i < rows.length && this.queries.length < HNSW_RECALL_SAMPLE.queries; i += step) {
+            try {
+                const v = JSON.parse(rows[i].embedding);
+                if (Array.isArray(v) && v.length === dimensions) this.queries.push({ q: unitVector(v), top: [] });
+            } catch { /* not a sample */ }
+        }
+        this.corpus = 0;
+    }
+    add(id, v) {
+        this.corpus++;
+        for (const query of this.queries) {
+            let score = 0;
+            for (let i = 0; i < v.length; i++) score -= v[i] * query.q[i];
+            if (query.top.length === HNSW_RECALL_SAMPLE.k && score >= query.top[query.top.length - 1].score) continue;
+            insertByScore(query.top, { p: id, score });
+            if (query.top.length > HNSW_RECALL_SAMPLE.k) query.top.pop();
+        }
+    }
+    measure(store) {
+        let hits = 0, total = 0;
+        for (const { q, top } of this.queries) {
+            const truth = new Set(top.map((h) => h.p));
+            for (const { id } of store.nearest(q, top.length)) if (truth.has(id)) hits++;
+            total += top.length;
+        }
+        return total ? Math.round((hits / total) * 1000) / 1000 : null;
+    }
+}
+// Float32 distances from memory.db through MS-001's shared handle, which is
+// only reloaded when the file changes.
+async function rescoreHNSWCandidates(hits, query, k) {
+    const dbPath = path.join(process.cwd(), '.swarm', 'memory.db');
+    const initSqlJs = (await import('sql.js')).default;
+    const db = await openMemoryDb(await initSqlJs(), dbPath);
+    const q = unitVector(query);
+    const exact = new Map();
+    try {
+        const stmt = db.prepare(`SELECT id, embedding FROM memory_entries WHERE id IN (${hits.map(() => '?').join(', ')})`);
+        try {
+            stmt.bind(hits.map((h) => h.id));
+            while (stmt.step()) {
+                const row = stmt.getAsObject();
+                try {
+                    const v = unitVector(JSON.parse(row.embedding));
+                    exact.set(String(row.id), 1 - v.reduce((s, x, i) => s + x * q[i], 0));
+                } catch { /* keep the quantized score */ }
+            }
+        } finally { stmt.free(); }
+    } finally { db.close(); }
+    return hits.map((h) => ({ id: h.id, score: exact.get(h.id) ?? h.score }))
+        .sort((a, b) => a.score - b.score).slice(0, k);
+}
+// File: magic, uint32 header length, JSON header (type, dimensions, recall,
+// graph entry point, entries in row order), float32 scales, codes, int32 links
+// (per row: level count, then per level a neighbour count and positions).
+// Rows whose entry was deleted are dropped on write, with their links.
+function writeQuantizedHNSWIndex(index) {
+    const store = index.db, d = store.dimensions;
+    const rows = [], renumber = new Map();
+    for (let p = 0; p < store.ids.length; p++) {
+        if (!index.entries.has(store.ids[p])) continue;
+        renumber.set(p, rows.length);
+        rows.push(p);
+    }
+    const links = [];
+    for (const p of rows) {
+        const levels = store.links[p] || [[]];
+        links.push(levels.length);
+        for (const level of levels) {
+            const kept = level.filter((n) => renumber.has(n));
+            links.push(kept.length, ...kept.map((n) => renumber.get(n)));
+        }
+    }
+    // A deleted entry point hands over to the highest remaining row.
+    let entry = renumber.get(store.entry) ?? -1, maxLevel = entry < 0 ? -1 : store.maxLevel;
+    if (entry < 0) {
+        for (const [i, p] of rows.entries()) {
+            if ((store.links[p]?.length ?? 1) - 1 > maxLevel) { entry = i; maxLevel = store.links[p].length - 1; }
+        }
+    }
+    const header = Buffer.from(JSON.stringify({
+        type: store.type, dimensions: d, recall: store.recall, recallSample: store.recallSample,
+        m: store.m, entry, maxLevel, links: links.length,
+        entries: rows.map((p) => index.entries.get(store.ids[p])),
+    }));
+    const prefix = Buffer.alloc(8);
+    prefix.write(HNSW_QUANTIZED_MAGIC, 0, 'latin1');
+    prefix.writeUInt32LE(header.length, 4);
+    const scales = new Float32Array(rows.length), codes = store.allocate(rows.length * d);
+    rows.forEach((p, i) => {
+        scales[i] = store.scales[p];
+        codes.set(store.codes.subarray(p * d, (p + 1) * d), i * d);
+    });
+    const file = hnswQuantizedPath(store.type);
+    const tmp = `${file}.${process.pid}.tmp`;
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.writeFileSync(tmp, Buffer.concat([prefix, header, Buffer.from(scales.buffer), Buffer.from(codes.buffer),
+            Buffer.from(Int32Array.from(links).buffer)]));
+        fs.renameSync(tmp, file);
+        store.dirty = false;
+    } catch {
+        try { fs.unlinkSync(tmp); } catch { /* never written */ }
+    }
+}
+function readQuantizedHNSWIndex(type, dimensions) {
+    let buf;
+    try { buf = fs.readFileSync(hnswQuantizedPath(type)); } catch { return null; }
+    try {
+        // Earlier files (CFQ1) have no graph: rebuilt.
+        if (buf.toString('latin1', 0, 4) !== HNSW_QUANTIZED_MAGIC) return null;
+        const headerEnd = 8 + buf.readUInt32LE(4);
+        const header = JSON.parse(buf.toString('utf-8', 8, headerEnd));
+        if (header.type !== type || header.dimensions !== dimensions) return null;
+        const n = header.entries.length;
+        const store = new HNSWQuantizedStore(type, dimensions, n);
+        if (header.m) store.m = header.m;
+        const codesStart = headerEnd + n * 4;
+        const linksStart = codesStart + n * dimensions * store.codes.BYTES_PER_ELEMENT;
+        new Uint8Array(store.scales.buffer).set(buf.subarray(headerEnd, codesStart));
+        new Uint8Array(store.codes.buffer).set(buf.subarray(codesStart, linksStart));
+        const links = new Int32Array(header.links);
+        new Uint8Array(links.buffer).set(buf.subarray(linksStart, linksStart + header.links * 4));
+        let at = 0;
+        for (let p = 0; p < n; p++) {
+            const levels = [];
+            for (let l = links[at++]; l > 0; l--) {
+                const count = links[at++];
+                levels.push(Array.from(links.subarray(at, at + count)));
+                at += count;
+            }
+            store.links.push(levels);
+        }
+        store.entry = header.entry;
+        store.maxLevel = header.maxLevel;
+        const entries = new Map();
+        header.entries.forEach((entry, p) => {
+            const id = String(entry.id);
+            store.ids.push(id);
+            store.positions.set(id, p);
+            entries.set(id, entry);
+        });
+        store.recall = header.recall ?? null;
+        store.recallSample = header.recallSample ?? 0;
+        store.loaded = true;
+        return { db: store, entries, dimensions };
+    } catch { return null; }
+}
+async function buildQuantizedHNSWIndex(type, dimensions) {
+    const [rows] = await readMemoryRows([[`SELECT id, key, namespace, content, embedding FROM memory_entries
+        WHERE status = 'active' AND embedding IS NOT NULL`, []]]);
+    const store = new HNSWQuantizedStore(type, dimensions, rows.length);
+    const entries = new Map();
+    const sample = new HNSWRecallSample(rows, dimensions);
+    for (const row of rows) {
+        let embedding;
+        try { embedding = JSON.parse(row.embedding); } catch { continue; }
+        if (!Array.isArray(embedding) || embedding.length !== dimensions) continue;
+        const id = String(row.id);
+        store.put(id, embedding);
+        entries.set(id, { id, key: row.key, namespace: row.namespace, content: row.content });
+        sample.add(id, unitVector(embedding));
+    }
+    store.recall = sample.measure(store);
+    store.recallSample = sample.corpus;
+    const index = { db: store, entries, dimensions };
+    writeQuantizedHNSWIndex(index);
+    return index;
+}
+// Inserts are written back after HNSW_QUANTIZED_SAVE_MS, and on exit.
+function scheduleQuantizedHNSWSave(index) {
+    const store = index.db;
+    if (store.saveTimer) return;
+    store.saveTimer = setTimeout(() => {
+        store.saveTimer = null;
+        if (store.dirty) writeQuantizedHNSWIndex(index);
+    }, HNSW_QUANTIZED_SAVE_MS);
+    store.saveTimer.unref?.();
+}
+let hnswQuantizedExitHook = false;
+function watchQuantizedHNSWIndex(index) {
+    const insert = index.db.insert;
+    index.db.insert = async function (...args) {
+        await insert.apply(this, args);
+        scheduleQuantizedHNSWSave(index);
+    };
+    if (hnswQuantizedExitHook) return;
+    hnswQuantizedExitHook = true;
+    process.on('exit', () => {
+        if (hnswIndex?.db instanceof HNSWQuantizedStore && hnswIndex.db.dirty) writeQuantizedHNSWIndex(hnswIndex);
+    });
+}
+export function getHNSWStorageStats() {
+    const store = hnswIndex?.db instanceof HNSWQuantizedStore ? hnswIndex.db : null;
+    if (!store) {
+        // The native float32 graph: its approximate search recall is not measured.
+        const vectors = hnswIndex?.entries?.size ?? 0;
+        const bytes = vectors * (hnswIndex?.dimensions ?? 0) * 4;
+        return { storage: 'float32', rescore: false, vectors, bytes, float32Bytes: bytes, recall: null, recallSample: 0 };
+    }
+    const vectors = store.ids.length;
+    const float32Bytes = vectors * store.dimensions * 4;
+    return {
+        storage: store.type, rescore: store.rescore, vectors,
+        bytes: vectors * (store.dimensions * store.codes.BYTES_PER_ELEMENT + 4), float32Bytes,
+        recall: store.recall, recallSample: store.recallSample,
+    };
+}
+try {
+    const getHNSWStatusFloat32 = getHNSWStatus;
+    getHNSWStatus = function (...args) {
+        const status = getHNSWStatusFloat32(...args);
+        return status && typeof status === 'object' ? { ...status, vectorStorage: getHNSWStorageStats() } : status;
+    };
+} catch { /* no getHNSWStatus in this build */ }
+""")
+
+# Ahead of GV-002's wrapper, so tombstone sync, GV-003 partitions and the index
+# stats see the quantized index exactly like the native one.
+patch("GV-004: quantized primary index",
+    MI,
+    """try {
+    const getHNSWIndexBase = getHNSWIndex;""",
+    """// GV-004: hnsw.storage int8/float16 loads .swarm/hnsw.<storage>.index, or builds
+// it from memory.db, instead of the native float32 graph.
+try {
+    const getHNSWIndexNative = getHNSWIndex;
+    let hnswQuantizedLoad = null;
+    getHNSWIndex = async function (options) {
+        const { type } = hnswStorage();
+        if (type === 'float32' || options?.dbPath) return getHNSWIndexNative(options);
+        if (!options?.forceRebuild && hnswIndex?.db instanceof HNSWQuantizedStore && hnswIndex.db.type === type) return hnswIndex;
+        if (!hnswQuantizedLoad) {
+            const dimensions = projectHNSWConfig().dimensions;
+            hnswQuantizedLoad = (async () => {
+                const index = (!options?.forceRebuild && readQuantizedHNSWIndex(type, dimensions))
+                    || await buildQuantizedHNSWIndex(type, dimensions);
+                watchQuantizedHNSWIndex(index);
+                hnswIndex = index;
+                return index;
+            })().finally(() => { hnswQuantizedLoad = null; });
+        }
+        return hnswQuantizedLoad;
+    };
+} catch { /* const bindings in this build: float32 only */ }
+try {
+    const getHNSWIndexBase = getHNSWIndex;""",
+    replaces="GV-002: tombstone journal")
+
+patch("GV-004: partitions as views of the quantized index",
+    MI,
+    """async function hnswPartitionView(index, namespace) {""",
+    """async function hnswPartitionView(index, namespace) {
+    // GV-004: over the quantized index a partition is the list of its rows, no copy.
+    if (index.db instanceof HNSWQuantizedStore) return index.db.namespaceView(namespace, index.entries);""",
+    replaces="GV-003: namespace partitions")
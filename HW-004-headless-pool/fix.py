@@ -0,0 +1,259 @@
+# HW-004: Bounded priority pool + streaming output for HeadlessWorkerExecutor
+# execute() goes through a pool (daemon.headlessConcurrency, default 2) ordered
+# by the DEFAULT_WORKERS priority; claude runs with stream-json output parsed
+# line by line from the child captured at spawn, the dist's timeout widened to
+# SIGTERM -> SIGKILL on the process group, and queue/run timing on every result.
+# The dist's executeClaudeCode() keeps building the env, flags and model; only
+# its spawn and parsing change.
+# 5 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("HW-004: pool settings in project-config",
+    PROJECT_CONFIG,
+    """        maxMemoryPressure: number(daemon.maxMemoryPressure, null),
+    };""",
+    """        maxMemoryPressure: number(daemon.maxMemoryPressure, null),
+        headlessConcurrency: number(daemon.headlessConcurrency, null),
+        headlessTimeoutMs: number(daemon.headlessTimeoutMs, null),
+    };""",
+    replaces="DM-007: gate settings in project-config")
+
+patch("HW-004: pass worker priority",
+    WD,
+    "                result = await this.headlessExecutor.execute(workerConfig.type);\n            }\n            catch (error) {\n                const errorMsg",
+    "                result = await this.headlessExecutor.execute(workerConfig.type, { priority: workerConfig.priority });\n            }\n            catch (error) {\n                const errorMsg",
+    replaces="2: honest failures")
+
+append("HW-004: headless pool",
+    HWE,
+    """
+// HW-004: bounded priority pool and streaming runs. execute() waits for a pool
+// slot (critical > high > normal > low, FIFO within a priority); the claude
+// child streams JSONL events that are parsed as they arrive and re-emitted as
+// 'stream' events, and the final `result` event becomes the output.
+import { StringDecoder as PoolDecoder } from 'string_decoder';
+import { AsyncLocalStorage as HeadlessSpawnScope } from 'async_hooks';
+import headlessChildProcess from 'child_process';
+import { syncBuiltinESMExports as syncHeadlessSpawn } from 'module';
+import { getDaemonConfig as headlessDaemonConfig } from './project-config.js';
+const HEADLESS_PRIORITY = { critical: 0, high: 1, normal: 2, low: 3 };
+const HEADLESS_POOL_DEFAULT = 2;
+const HEADLESS_TIMEOUT_DEFAULT_MS = 5 * 60 * 1000;
+const HEADLESS_KILL_GRACE_MS = 10000;
+const HEADLESS_MAX_OUTPUT = 4 * 1024 * 1024;
+const headlessChildren = new Set();
+class HeadlessPool {
+    constructor(size) {
+        this.size = Math.max(1, size);
+        this.active = 0;
+        this.queue = [];
+        this.seq = 0;
+        this.stats = { started: 0, completed: 0, timedOut: 0, queueWaitMs: 0, runMs: 0, maxQueued: 0 };
+    }
+    run(priority, task) {
+        return new Promise((resolve, reject) => {
+            this.queue.push({ rank: HEADLESS_PRIORITY[priority] ?? HEADLESS_PRIORITY.normal, seq: this.seq++, queuedAt: Date.now(), task, resolve, reject });
+            this.queue.sort((a, b) => a.rank - b.rank || a.seq - b.seq);
+            this.stats.maxQueued = Math.max(this.stats.maxQueued, this.queue.length);
+            this.drain();
+        });
+    }
+    drain() {
+        while (this.active < this.size && this.queue.length) {
+            const job = this.queue.shift();
+            const started = Date.now();
+            const queueWaitMs = started - job.queuedAt;
+            this.active++;
+            this.stats.started++;
+            this.stats.queueWaitMs += queueWaitMs;
+            Promise.resolve().then(job.task).then(
+                (result) => job.resolve({ result, queueWaitMs, runMs: Date.now() - started }),
+                job.reject,
+            ).finally(() => {
+                this.active--;
+                this.stats.completed++;
+                this.stats.runMs += Date.now() - started;
+                this.drain();
+            });
+        }
+    }
+}
+function killHeadlessChild(child, signal, kill = (s) => child.kill(s)) {
+    try { process.kill(process.platform === 'win32' ? child.pid : -child.pid, signal); }
+    catch { try { kill(signal); } catch { /* already gone */ } }
+}
+// The claude child, handed to the executeClaudeCode() call that spawned it:
+// spawn() is wrapped once (the dist's named import follows through
+// syncBuiltinESMExports), and only `--print` spawns inside a run's scope are
+// taken; every other spawn passes straight through.
+const headlessSpawnScope = new HeadlessSpawnScope();
+let headlessSpawnHooked = false;
+try {
+    const spawnUnhooked = headlessChildProcess.spawn;
+    headlessChildProcess.spawn = function (command, args, ...rest) {
+        const child = spawnUnhooked.call(this, command, args, ...rest);
+        const run = headlessSpawnScope.getStore();
+        if (run && !run.child && Array.isArray(args) && args.includes('--print')) {
+            run.child = child;
+            run.spawned(child);
+        }
+        return child;
+    };
+    syncHeadlessSpawn();
+    headlessSpawnHooked = true;
+} catch { /* buffered parsing */ }
+process.once('exit', () => { for (const child of headlessChildren) killHeadlessChild(child, 'SIGKILL'); });
+const HEADLESS_STREAM_ARGS = ['--output-format', 'stream-json', '--verbose'];
+const HEADLESS_RETRY_PLAIN = Symbol('retry without stream-json');
+// Flags added to the dist's `claude --print` arguments.
+function headlessStreamArgs(executor) {
+    return executor?.streamJsonUnsupported ? [] : HEADLESS_STREAM_ARGS;
+}
+// stream-json events of one run: re-emitted as 'stream' as they arrive; the
+// final `result` event (else the assistant text) becomes the output.
+class HeadlessOutput {
+    constructor(executor, options) {
+        this.executor = executor;
+        this.options = options;
+        this.text = [];
+        this.errors = [];
+        this.size = 0;
+        this.events = 0;
+        this.resultEvent = null;
+        this.timedOut = false;
+    }
+    keep(chunks, s) {
+        if (this.size < HEADLESS_MAX_OUTPUT) { chunks.push(s); this.size += s.length; }
+    }
+    line(line) {
+        let event = null;
+        if (line.startsWith('{')) { try { event = JSON.parse(line); } catch { /* plain line */ } }
+        if (!event) { this.keep(this.text, line + '\\n'); return; }
+        this.events++;
+        this.executor.emit?.('stream', { executionId: this.options.executionId, workerType: this.options.workerType, event });
+        if (event.type === 'result') this.resultEvent = event;
+        else if (event.type === 'assistant') {
+            for (const part of event.message?.content || []) if (part.type === 'text') this.keep(this.text, part.text);
+        }
+    }
+    // The dist's RESULT with output, success and error taken from the events.
+    finish(result, errorText = '') {
+        if (!this.events) {
+            if (!this.executor.streamJsonUnsupported && !result?.success && !this.timedOut
+                && /(unknown|unrecognized) option[^\\n]*(output-format|verbose)/i.test(errorText + (result?.error || ''))) {
+                this.executor.streamJsonUnsupported = true; // older CLI: plain --print
+                return HEADLESS_RETRY_PLAIN;
+            }
+            return this.text.length ? { ...result, output: this.text.join('') } : result;
+        }
+        const r = this.resultEvent;
+        const success = !!result?.success && !r?.is_error;
+        return {
+            ...result,
+            success,
+            output: r?.result ?? (this.text.join('') || result?.output),
+            error: success ? undefined : r?.is_error ? String(r.result || r.subtype || 'error') : result?.error,
+            ...(r && { costUsd: r.total_cost_usd, numTurns: r.num_turns }),
+        };
+    }
+}
+// Reads CHILD's stdout with a UTF-8 decoder as it arrives. The dist's own
+// timeout ends the run through child.kill(), which is widened to the whole
+// process group, with SIGKILL after HEADLESS_KILL_GRACE_MS.
+function watchHeadlessChild(executor, child, options) {
+    const parsed = new HeadlessOutput(executor, options);
+    const stdout = new PoolDecoder('utf8'), stderr = new PoolDecoder('utf8');
+    let pending = '', killTimer = null;
+    headlessChildren.add(child);
+    child.stdout?.on('data', (chunk) => {
+        pending += stdout.write(chunk);
+        let nl;
+        while ((nl = pending.indexOf('\\n')) !== -1) {
+            parsed.line(pending.slice(0, nl));
+            pending = pending.slice(nl + 1);
+        }
+    });
+    child.stderr?.on('data', (chunk) => parsed.keep(parsed.errors, stderr.write(chunk)));
+    const kill = child.kill.bind(child);
+    child.kill = (signal = 'SIGTERM') => {
+        if (!parsed.timedOut) {
+            parsed.timedOut = true;
+            if (executor.headlessPool) executor.headlessPool.stats.timedOut++;
+            killTimer = setTimeout(() => killHeadlessChild(child, 'SIGKILL', kill), HEADLESS_KILL_GRACE_MS);
+            killTimer.unref?.();
+        }
+        killHeadlessChild(child, signal, kill);
+        return true;
+    };
+    child.once('close', () => {
+        clearTimeout(killTimer);
+        headlessChildren.delete(child);
+    });
+    return {
+        finish(result) {
+            const tail = pending + stdout.end();
+            pending = '';
+            if (tail) parsed.line(tail);
+            return parsed.finish(result, parsed.errors.join('') + stderr.end());
+        },
+    };
+}
+try {
+    const proto = HeadlessWorkerExecutor.prototype;
+    const executeUnpooled = proto.execute;
+    proto.execute = async function (workerType, overrides) {
+        const { priority, ...rest } = overrides || {};
+        if (!this.headlessPool) {
+            this.headlessPool = new HeadlessPool(headlessDaemonConfig(this.projectRoot).headlessConcurrency ?? HEADLESS_POOL_DEFAULT);
+        }
+        const { result, queueWaitMs, runMs } = await this.headlessPool.run(priority,
+            () => executeUnpooled.call(this, workerType, Object.keys(rest).length ? rest : undefined));
+        return result && typeof result === 'object' ? { ...result, timing: { queueWaitMs, runMs } } : result;
+    };
+    proto.getPoolStats = function () {
+        const pool = this.headlessPool;
+        if (!pool) return { size: 0, active: 0, queued: 0 };
+        return { size: pool.size, active: pool.active, queued: pool.queue.length, ...pool.stats };
+    };
+    const executeClaudeCodeBuffered = proto.executeClaudeCode;
+    if (typeof executeClaudeCodeBuffered === 'function') {
+        // The dist still builds the environment, flags and model, spawns claude
+        // (with the stream flags and a process group, patched below) and times
+        // it out; its child is read here as it streams.
+        proto.executeClaudeCode = async function (prompt, options = {}) {
+            const timeoutMs = options.timeoutMs ?? headlessDaemonConfig(this.projectRoot).headlessTimeoutMs ?? HEADLESS_TIMEOUT_DEFAULT_MS;
+            const run = { ...options, timeoutMs };
+            const scope = { child: null, stream: null, spawned: (child) => { if (child?.stdout) scope.stream = watchHeadlessChild(this, child, run); } };
+            const result = await headlessSpawnScope.run(scope, () => executeClaudeCodeBuffered.call(this, prompt, run));
+            let finished;
+            if (scope.stream) finished = scope.stream.finish(result);
+            else {
+                // No handle on the child: parse the buffered output instead.
+                const reason = !headlessSpawnHooked ? 'spawn() could not be hooked' : scope.child ? 'the child has no stdout pipe' : 'no claude --print spawn was seen';
+                this.emit?.('stream:fallback', { executionId: run.executionId, workerType: run.workerType, reason });
+                if (!this.streamFallbackLogged) {
+                    this.streamFallbackLogged = true;
+                    console.warn(`[headless] streaming unavailable (${reason}); parsing buffered output instead`);
+                }
+                const parsed = new HeadlessOutput(this, run);
+                for (const line of String(result?.output ?? '').split('\\n')) if (line) parsed.line(line);
+                finished = parsed.finish(result, result?.error || '');
+            }
+            return finished === HEADLESS_RETRY_PLAIN ? this.executeClaudeCode(prompt, options) : finished;
+        };
+    }
+} catch { /* HeadlessWorkerExecutor not declared in this build */ }
+""")
+
+# Only the spawn changes: stream-json output and a process group to signal.
+patch("HW-004: stream-json output flags",
+    HWE,
+    "['--print', prompt]",
+    "['--print', ...headlessStreamArgs(this), prompt]")
+
+patch("HW-004: headless process group",
+    HWE,
+    "stdio: ['ignore', 'pipe', 'pipe']",
+    "stdio: ['ignore', 'pipe', 'pipe'], detached: process.platform !== 'win32'",
+    replaces="1: stdin pipe")
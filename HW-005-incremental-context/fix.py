@@ -0,0 +1,153 @@
+# HW-005: Diff-scoped incremental context for headless workers
+# audit/optimize/testgaps/document remember the commit they last analyzed and
+# build the next prompt from the files changed since then; findings are merged
+# under the `headless` key of the metrics JSON the worker's local mode writes.
+# 1 op
+
+append("HW-005: incremental headless context",
+    HWE,
+    """
+// HW-005: diff-scoped runs. The `headless` key of the worker's metrics JSON
+// holds the commit it last analyzed, the content hashes of the uncommitted
+// files it saw on top of that commit, and its merged findings. A later run only
+// gets the files changed since then (narrowed to the worker's contextPatterns)
+// as context; findings for other files are carried over.
+import { execFile as incrementalExecFile } from 'child_process';
+import { readFileSync as incrementalRead, writeFileSync as incrementalWrite, mkdirSync as incrementalMkdir, existsSync as incrementalExists } from 'fs';
+import { join as incrementalJoin } from 'path';
+// The metrics file each worker's local mode already writes under
+// .claude-flow/metrics; document has no local mode, so it gets its own.
+const INCREMENTAL_WORKERS = {
+    audit: 'security-audit.json', optimize: 'performance.json', testgaps: 'test-gaps.json', document: 'documentation.json',
+};
+const INCREMENTAL_MAX_FILES = 200;
+function incrementalGit(root, args) {
+    return new Promise((resolve) => incrementalExecFile('git', args, { cwd: root, maxBuffer: 16 << 20, timeout: 15000 },
+        (error, stdout) => resolve(error ? null : stdout.trim())));
+}
+function globToRegExp(glob) {
+    let re = '';
+    for (let i = 0; i < glob.length; i++) {
+        const c = glob[i];
+        if (c === '*' && glob[i + 1] === '*') { re += glob[i + 2] === '/' ? '(?:.*/)?' : '.*'; i += glob[i + 2] === '/' ? 2 : 1; }
+        else if (c === '*') re += '[^/]*';
+        else if (c === '?') re += '[^/]';
+        else if (c === '{') re += '(?:';
+        else if (c === '}') re += ')';
+        else if (c === ',' && re.lastIndexOf('(?:') > re.lastIndexOf(')')) re += '|';
+        else re += c.replace(/[.+^$()|[\\]\\\\]/g, '\\\\$&');
+    }
+    return new RegExp('^' + re + '$');
+}
+function metricsPath(root, workerType) {
+    return incrementalJoin(root, '.claude-flow', 'metrics', INCREMENTAL_WORKERS[workerType]);
+}
+function readMetrics(root, workerType) {
+    try { return JSON.parse(incrementalRead(metricsPath(root, workerType), 'utf-8')); } catch { return null; }
+}
+function writeIncrementalState(root, workerType, state) {
+    const metrics = readMetrics(root, workerType);
+    incrementalMkdir(incrementalJoin(root, '.claude-flow', 'metrics'), { recursive: true });
+    incrementalWrite(metricsPath(root, workerType), JSON.stringify({
+        ...(metrics && typeof metrics === 'object' && !Array.isArray(metrics) ? metrics : {}), headless: state,
+    }, null, 2));
+}
+const warnedNoWorkerConfig = new Set();
+// Without the worker's contextPatterns and promptTemplate a run cannot be
+// scoped, so it is a full one; say so once rather than degrade silently.
+function incrementalWorkerConfig(workerType) {
+    const config = typeof HEADLESS_WORKER_CONFIGS !== 'undefined' ? HEADLESS_WORKER_CONFIGS[workerType] : null;
+    if (!config?.promptTemplate && !warnedNoWorkerConfig.has(workerType)) {
+        warnedNoWorkerConfig.add(workerType);
+        console.warn(`[HW-005] no HEADLESS_WORKER_CONFIGS entry for ${workerType} in this build: incremental ${workerType} runs are disabled, every run is a full one`);
+    }
+    return config?.promptTemplate ? config : null;
+}
+// Content hashes of FILES as they are in the working tree ('-' when deleted).
+async function worktreeHashes(root, files) {
+    const hashes = Object.fromEntries(files.map((file) => [file, '-']));
+    const present = files.filter((file) => incrementalExists(incrementalJoin(root, file)));
+    for (let i = 0; i < present.length; i += 100) {
+        const chunk = present.slice(i, i + 100);
+        const out = await incrementalGit(root, ['hash-object', '--', ...chunk]);
+        if (out === null) return null;
+        out.split('\n').forEach((hash, j) => { hashes[chunk[j]] = hash; });
+    }
+    return hashes;
+}
+const gitLines = (out) => (out ?? '').split('\n').filter(Boolean);
+function findingsOf(result) {
+    if (result?.parsedOutput && typeof result.parsedOutput === 'object') return result.parsedOutput;
+    const fenced = /```json\\s*([\\s\\S]*?)```/.exec(result?.output || '');
+    try { return JSON.parse(fenced ? fenced[1] : result?.output); } catch { return null; }
+}
+// Array items that name a changed (or deleted) file are replaced by the new
+// run's items; everything else from the previous findings is kept.
+function mergeFindings(prev, next, changed) {
+    if (!prev || typeof prev !== 'object' || !next || typeof next !== 'object') return next ?? prev;
+    const merged = { ...prev, ...next };
+    for (const [key, items] of Object.entries(prev)) {
+        if (!Array.isArray(items)) continue;
+        const kept = items.filter((item) => !changed.has(item?.file ?? item?.path ?? item?.filePath));
+        merged[key] = kept.concat(Array.isArray(next[key]) ? next[key] : []);
+    }
+    return merged;
+}
+async function planIncrementalRun(executor, workerType) {
+    const root = executor.projectRoot;
+    const config = incrementalWorkerConfig(workerType);
+    if (!config) return { full: true, head: null };
+    const patterns = (config.contextPatterns || []).map(globToRegExp);
+    const relevant = (file) => !file.startsWith('.claude-flow/') && (!patterns.length || patterns.some((re) => re.test(file)));
+    const head = await incrementalGit(root, ['rev-parse', 'HEAD']);
+    const untracked = gitLines(await incrementalGit(root, ['ls-files', '--others', '--exclude-standard']));
+    // What this run sees on top of HEAD; recorded so the next run can tell
+    // which uncommitted edits were already analyzed.
+    const dirty = [...new Set([...gitLines(await incrementalGit(root, ['diff', '--name-only', 'HEAD'])), ...untracked])].filter(relevant);
+    const worktree = dirty.length <= INCREMENTAL_MAX_FILES ? await worktreeHashes(root, dirty) : null;
+    const prev = readMetrics(root, workerType)?.headless;
+    const base = prev?.commit;
+    if (!head || !base || (await incrementalGit(root, ['merge-base', '--is-ancestor', base, head])) === null) return { head, worktree, prev, full: true };
+    const sinceBase = [...new Set([...gitLines(await incrementalGit(root, ['diff', '--name-only', base])), ...untracked])].filter(relevant);
+    const seen = prev.worktree || {};
+    const current = (await worktreeHashes(root, sinceBase.filter((file) => file in seen))) ?? {};
+    // A file the last run saw uncommitted is only new if its content moved
+    // since; one that dropped out of the diff was reverted, and the findings
+    // for its edited state no longer hold.
+    const changed = sinceBase.filter((file) => !(file in seen) || seen[file] !== current[file])
+        .concat(Object.keys(seen).filter((file) => !sinceBase.includes(file) && relevant(file)));
+    if (changed.length > INCREMENTAL_MAX_FILES) return { head, worktree, prev, full: true };
+    const present = changed.filter((file) => incrementalExists(incrementalJoin(root, file)));
+    const scope = `\\n\\nINCREMENTAL RUN: the previous ${workerType} analysis covered commit ${base.slice(0, 12)}` +
+        `${Object.keys(seen).length ? ' plus uncommitted changes' : ''}. ` +
+        `Only these files changed since then; analyze only them and report findings with their file paths. ` +
+        `Findings for other files are kept from the previous run.\\n` +
+        changed.map((file) => `- ${file}${present.includes(file) ? '' : ' (deleted)'}`).join('\\n');
+    return {
+        head, worktree, prev, full: false, changed,
+        overrides: { contextPatterns: present, promptTemplate: config.promptTemplate + scope },
+    };
+}
+try {
+    const executeFull = HeadlessWorkerExecutor.prototype.execute;
+    HeadlessWorkerExecutor.prototype.execute = async function (workerType, overrides) {
+        if (!Object.hasOwn(INCREMENTAL_WORKERS, workerType) || overrides?.contextPatterns) return executeFull.call(this, workerType, overrides);
+        let plan;
+        try { plan = await planIncrementalRun(this, workerType); } catch { return executeFull.call(this, workerType, overrides); }
+        if (!plan.full && !plan.changed.length) {
+            // Nothing this worker looks at changed: the previous findings still hold.
+            return { success: true, output: plan.prev.output ?? '', parsedOutput: plan.prev.findings, incremental: { base: plan.prev.commit, files: 0, reused: true } };
+        }
+        const result = await executeFull.call(this, workerType, plan.full ? overrides : { ...overrides, ...plan.overrides });
+        if (!result?.success || !plan.head) return result;
+        const findings = plan.full ? findingsOf(result) : mergeFindings(plan.prev.findings, findingsOf(result), new Set(plan.changed));
+        try {
+            writeIncrementalState(this.projectRoot, workerType, {
+                commit: plan.head, worktree: plan.worktree, analyzedAt: new Date().toISOString(), mode: plan.full ? 'full' : 'incremental',
+                files: plan.full ? null : plan.changed, output: result.output, findings,
+            });
+        } catch { /* next run is a full one */ }
+        return { ...result, ...(findings && { parsedOutput: findings }), incremental: plan.full ? null : { base: plan.prev.commit, files: plan.changed.length } };
+    };
+} catch { /* HeadlessWorkerExecutor not declared in this build */ }
+""")
@@ -0,0 +1,391 @@
+# MS-001: Write-coalescing persistence for the sql.js memory database
+# One long-lived handle per dbPath: better-sqlite3 in WAL mode when available,
+# else sql.js with coalesced atomic flushes (time/size budget, fsync policy) that
+# replay pending writes onto a file another process changed instead of overwriting it.
+# 5 ops
+
+MEMORY_STORE = memory + "/memory-store.js"
+
+create("MS-001: memory-store module",
+    MEMORY_STORE,
+    """// memory-store.js — added by claude-flow patch MS-001.
+// One long-lived database handle per memory.db path instead of a load/export/
+// rewrite per operation:
+//   better-sqlite3 (if importable): WAL mode, behind a sql.js-compatible adapter;
+//     checkpointed back to a plain rollback-journal file once writes go quiet.
+//   sql.js: one in-memory copy per process; writes are flushed by temp file +
+//     fsync + rename on a time/size budget and synchronously on exit or
+//     SIGINT/SIGTERM. If another process rewrote the file meanwhile, the pending
+//     statements are replayed onto its copy first.
+import * as fs from 'fs';
+import * as path from 'path';
+import { readProjectConfig } from '../services/project-config.js';
+
+const handles = new Map();
+let exitHookInstalled = false;
+
+function storeConfig() {
+    const memory = readProjectConfig().memory || {};
+    return {
+        backend: memory.sqlite || 'auto',
+        flushMs: parseInt(memory.flushMs, 10) || 200,
+        maxPendingWrites: parseInt(memory.maxPendingWrites, 10) || 64,
+        fsync: memory.fsync !== 'never',
+    };
+}
+
+function stampOf(file) {
+    try {
+        const st = fs.statSync(file);
+        return `${st.size}:${st.mtimeMs}`;
+    } catch { return null; }
+}
+
+function flushAll(final) {
+    for (const handle of handles.values()) {
+        try { final ? handle.shutdown() : handle.flush(); } catch { /* best-effort */ }
+    }
+}
+
+function installExitHook() {
+    if (exitHookInstalled) return;
+    exitHookInstalled = true;
+    process.on('exit', () => flushAll(true));
+    // A signal's default action skips 'exit' handlers: flush first, then
+    // re-raise it unless the process handles the signal itself.
+    for (const signal of ['SIGINT', 'SIGTERM']) {
+        const onSignal = () => {
+            flushAll(false);
+            if (process.listenerCount(signal) > 1) return;
+            process.removeListener(signal, onSignal);
+            process.kill(process.pid, signal);
+        };
+        process.on(signal, onSignal);
+    }
+}
+
+// ── sql.js ──
+// Statements that change the database; pending ones are kept so they can be
+// replayed onto a copy another process wrote in the meantime.
+const MUTATING_SQL = /^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER|BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b/i;
+
+class SqlJsHandle {
+    constructor(SQL, dbPath, config) {
+        this.SQL = SQL;
+        this.dbPath = dbPath;
+        this.config = config;
+        this.db = null;
+        this.stamp = null;
+        this.pending = 0;
+        this.journal = [];
+        this.conflicts = 0;
+        this.timer = null;
+        this.readOnly = false;
+        this.holders = new Map(); // db -> callers that opened it and have not closed it
+        this.retired = new Set(); // replaced copies still held by a caller
+    }
+    open() {
+        if (!this.db || stampOf(this.dbPath) !== this.stamp) {
+            if (this.db && this.pending) this.merge();
+            else this.load();
+        }
+        this.holders.set(this.db, (this.holders.get(this.db) || 0) + 1);
+        return this.db;
+    }
+    load() {
+        this.retire(this.db);
+        const buf = fs.readFileSync(this.dbPath);
+        // A WAL-mode file is held by a better-sqlite3 process: read it, never overwrite it.
+        this.readOnly = buf.length > 19 && buf[18] === 2;
+        if (this.readOnly) { buf[18] = 1; buf[19] = 1; }
+        this.stamp = stampOf(this.dbPath);
+        const db = new this.SQL.Database(buf);
+        db.close = () => this.closed(db); // shared: callers' close() only releases their hold
+        this.db = db;
+        this.journal = [];
+        this.recordWrites(db);
+    }
+    // A reload swaps in a new copy; the old one stays open until its last
+    // holder closes it, since callers keep it across awaits.
+    retire(db) {
+        if (!db) return;
+        if (this.holders.get(db) > 0) this.retired.add(db);
+        else this.destroy(db);
+    }
+    closed(db) {
+        const left = Math.max(0, (this.holders.get(db) || 0) - 1);
+        this.holders.set(db, left);
+        if (!left && this.retired.delete(db)) this.destroy(db);
+    }
+    destroy(db) {
+        this.holders.delete(db);
+        try { Object.getPrototypeOf(db).close.call(db); } catch { /* already closed */ }
+    }
+    holds(db) {
+        return db === this.db || this.retired.has(db);
+    }
+    // Journals each mutating statement once: run()/exec() record themselves, so
+    // the prepare()/step() they make internally must not. Writes a caller makes
+    // on a retired copy are applied to the current one as well.
+    recordWrites(db) {
+        let depth = 0;
+        const record = (method, sql, params) => {
+            if (!MUTATING_SQL.test(sql)) return;
+            params = Array.isArray(params) ? [...params] : params;
+            if (db === this.db) this.journal.push([method, sql, params]);
+            else try { this.db[method](sql, params); } catch { this.conflicts++; }
+        };
+        for (const method of ['run', 'exec']) {
+            const inner = db[method];
+            db[method] = function (sql, params) {
+                depth++;
+                let out;
+                try { out = inner.call(this, sql, params); } finally { depth--; }
+                if (!depth) record(method, sql, params);
+                return out;
+            };
+        }
+        const prepare = db.prepare;
+        db.prepare = function (sql, params) {
+            const stmt = prepare.call(this, sql, params);
+            if (depth || !MUTATING_SQL.test(sql)) return stmt;
+            // Statement.run() is bind() + step(), so these two cover it.
+            let bound = params;
+            const { bind, step } = stmt;
+            stmt.bind = function (values) { bound = values; return bind.call(this, values); };
+            stmt.step = function () { const more = step.call(this); record('run', sql, bound); return more; };
+            return stmt;
+        };
+    }
+    // The file changed on disk while writes were pending: reload it and replay
+    // this process's pending statements on top instead of overwriting the other
+    // process's writes. A statement that no longer applies is dropped (conflicts).
+    merge() {
+        const journal = this.journal;
+        this.load();
+        for (const [method, sql, params] of journal) {
+            try { this.db[method](sql, params); } catch { this.conflicts++; }
+        }
+    }
+    persist() {
+        this.pending++;
+        if (this.pending >= this.config.maxPendingWrites && !this.readOnly) return this.flush();
+        this.schedule();
+    }
+    schedule() {
+        if (this.timer) return;
+        this.timer = setTimeout(() => this.flush(), this.config.flushMs);
+        this.timer.unref();
+    }
+    flush() {
+        if (this.timer) { clearTimeout(this.timer); this.timer = null; }
+        if (!this.pending || !this.db) return;
+        if (stampOf(this.dbPath) !== this.stamp) this.merge();
+        // Held in WAL mode: keep the writes pending and replay them once the
+        // file is back in rollback-journal mode.
+        if (this.readOnly) return this.schedule();
+        writeAtomic(this.dbPath, Buffer.from(this.db.export()), this.config.fsync);
+        this.pending = 0;
+        this.journal = [];
+        this.stamp = stampOf(this.dbPath);
+    }
+    shutdown() {
+        this.flush();
+        if (this.pending && this.readOnly) {
+            process.stderr.write(`[memory-store] ${this.pending} pending write(s) to ${this.dbPath} not saved: the file is held in WAL mode by better-sqlite3\n`);
+        }
+    }
+}
+
+function writeAtomic(file, data, sync) {
+    const tmp = `${file}.${process.pid}.tmp`;
+    const fd = fs.openSync(tmp, 'w');
+    try {
+        fs.writeSync(fd, data);
+        if (sync) fs.fsyncSync(fd);
+    } finally { fs.closeSync(fd); }
+    fs.renameSync(tmp, file);
+}
+
+// ── better-sqlite3 behind the sql.js API the dist uses ──
+function nativeParams(params) {
+    if (params === undefined || params === null) return [];
+    if (Array.isArray(params)) return params.map((v) => (typeof v === 'boolean' ? Number(v) : v));
+    const named = {};
+    for (const [k, v] of Object.entries(params)) named[k.replace(/^[:$@]/, '')] = typeof v === 'boolean' ? Number(v) : v;
+    return [named];
+}
+
+class NativeStatement {
+    constructor(db, sql) {
+        this.stmt = db.prepare(sql);
+        this.params = [];
+        this.rows = null;
+        this.i = 0;
+    }
+    bind(params) { this.params = nativeParams(params); this.rows = null; return true; }
+    step() {
+        if (!this.rows) {
+            this.rows = this.stmt.reader ? this.stmt.all(...this.params) : (this.stmt.run(...this.params), []);
+            this.i = 0;
+        }
+        return this.i++ < this.rows.length;
+    }
+    getAsObject(params) {
+        if (params !== undefined) { this.bind(params); this.step(); }
+        return this.rows?.[this.i - 1] ?? {};
+    }
+    get(params) { return Object.values(this.getAsObject(params)); }
+    getColumnNames() { return this.stmt.reader ? this.stmt.columns().map((c) => c.name) : []; }
+    run(params) { this.stmt.run(...nativeParams(params)); this.rows = null; }
+    reset() { this.rows = null; return true; }
+    free() { return true; }
+}
+
+class NativeDatabase {
+    constructor(db, handle) { this.db = db; this.handle = handle; this.changes = 0; }
+    exec(sql, params) {
+        let stmt;
+        try { stmt = this.db.prepare(sql); }
+        catch (e) {
+            if (!/more than one statement/.test(e?.message)) throw e;
+            this.db.exec(sql); // multi-statement DDL
+            this.handle.touched();
+            return [];
+        }
+        if (!stmt.reader) {
+            this.changes = stmt.run(...nativeParams(params)).changes;
+            this.handle.touched();
+            return [];
+        }
+        const values = stmt.raw(true).all(...nativeParams(params));
+        return values.length ? [{ columns: stmt.columns().map((c) => c.name), values }] : [];
+    }
+    run(sql, params) {
+        this.changes = this.db.prepare(sql).run(...nativeParams(params)).changes;
+        this.handle.touched();
+        return this;
+    }
+    prepare(sql) { return new NativeStatement(this.db, sql); }
+    getRowsModified() { return this.changes; }
+    export() { this.handle.checkpoint(); return fs.readFileSync(this.handle.dbPath); }
+    close() { /* shared handle */ }
+}
+
+class NativeHandle {
+    constructor(Database, dbPath, config) {
+        this.dbPath = dbPath;
+        this.config = config;
+        this.raw = new Database(dbPath);
+        this.raw.pragma(`synchronous = ${config.fsync ? 'FULL' : 'NORMAL'}`);
+        this.wal = false;
+        this.timer = null;
+        this.db = new NativeDatabase(this.raw, this);
+    }
+    open() {
+        if (!this.wal) {
+            try { this.raw.pragma('journal_mode = WAL'); this.wal = true; } catch { /* another connection */ }
+        }
+        return this.db;
+    }
+    touched() {
+        if (this.timer) clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.checkpoint(), this.config.flushMs);
+        this.timer.unref();
+    }
+    persist() { /* already durable */ }
+    flush() { this.checkpoint(); }
+    // Quiet: fold the WAL back so sql.js readers of memory.db see a plain file.
+    checkpoint() {
+        if (this.timer) { clearTimeout(this.timer); this.timer = null; }
+        if (!this.wal) return;
+        try {
+            this.raw.pragma('wal_checkpoint(TRUNCATE)');
+            this.raw.pragma('journal_mode = DELETE');
+            this.wal = false;
+        } catch { /* readers active: next quiet period */ }
+    }
+    shutdown() {
+        this.checkpoint();
+        try { this.raw.close(); } catch { /* ignore */ }
+    }
+}
+
+async function loadNative(backend) {
+    if (backend === 'sql.js') return null;
+    try {
+        return (await import('better-sqlite3')).default;
+    } catch (e) {
+        if (backend === 'better-sqlite3') throw e;
+        return null;
+    }
+}
+
+// The shared handle for DBPATH, as a sql.js-compatible Database.
+export async function openMemoryDb(SQL, dbPath) {
+    const key = path.resolve(dbPath);
+    let handle = handles.get(key);
+    if (!handle) {
+        const config = storeConfig();
+        const Database = fs.existsSync(key) ? await loadNative(config.backend) : null;
+        handle = Database ? new NativeHandle(Database, key, config) : new SqlJsHandle(SQL, key, config);
+        handles.set(key, handle);
+        installExitHook();
+    }
+    return handle.open();
+}
+
+// "Save updated database": coalesced for shared handles, immediate otherwise.
+export function persistMemoryDb(dbPath, db) {
+    const handle = handles.get(path.resolve(dbPath));
+    if (handle && (handle.db === db || handle.holds?.(db))) return handle.persist();
+    writeAtomic(dbPath, Buffer.from(db.export()), storeConfig().fsync);
+}
+
+export function flushMemoryDb(dbPath) {
+    for (const [key, handle] of handles) {
+        if (!dbPath || key === path.resolve(dbPath)) handle.flush();
+    }
+}
+
+export function getMemoryStoreStatus() {
+    return [...handles.entries()].map(([file, h]) => ({
+        file,
+        backend: h instanceof NativeHandle ? 'better-sqlite3' : 'sql.js',
+        pendingWrites: h.pending ?? 0,
+        wal: h.wal ?? false,
+        readOnly: h.readOnly ?? false,
+        mergeConflicts: h.conflicts ?? 0,
+    }));
+}
+""")
+
+append("MS-001: memory-initializer imports memory-store",
+    MI,
+    """
+// MS-001: shared, write-coalescing memory.db handle
+import { openMemoryDb, persistMemoryDb, flushMemoryDb, getMemoryStoreStatus } from './memory-store.js';
+export { flushMemoryDb, getMemoryStoreStatus };
+""")
+
+patch_all("MS-001: load memory.db through memory-store",
+    MI,
+    """        const fileBuffer = fs.readFileSync(dbPath);
+        const db = new SQL.Database(fileBuffer);""",
+    """        const db = await openMemoryDb(SQL, dbPath);""")
+
+patch_all("MS-001: coalesce memory.db saves",
+    MI,
+    """        const data = db.export();
+        fs.writeFileSync(dbPath, Buffer.from(data));""",
+    """        persistMemoryDb(dbPath, db);""")
+
+patch("MS-001: DM-006 reads through memory-store",
+    MI,
+    """    const initSqlJs = (await import('sql.js')).default;
+    const SQL = await initSqlJs();
+    const db = new SQL.Database(fs.readFileSync(dbPath));""",
+    """    const initSqlJs = (await import('sql.js')).default;
+    const SQL = await initSqlJs();
+    const db = await openMemoryDb(SQL, dbPath);""",
+    replaces="DM-006: incremental HNSW update")
@@ -0,0 +1,252 @@
+# MS-002: Resident memory service in the worker daemon
+# The daemon serves storeEntry/getEntry/searchEntries/listEntries/deleteEntry/
+# generateEmbedding over a Unix socket; memory-initializer routes those calls
+# there from every other process (CLI, MCP, hooks) and falls back in-process.
+# 3 ops
+
+MEMORY_SERVICE = memory + "/memory-service.js"
+
+create("MS-002: memory-service module",
+    MEMORY_SERVICE,
+    """// memory-service.js — added by claude-flow patch MS-002.
+// The worker daemon serves memory-initializer operations over a Unix socket,
+// so CLI, MCP and hook processes reuse its warm sql.js handle, embedding model
+// and HNSW index instead of cold-loading them per invocation. Newline-delimited
+// JSON: { id, method, args } -> { id, result } | { id, error }.
+import net from 'net';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import { createHash } from 'crypto';
+import { readProjectConfig } from '../services/project-config.js';
+
+const METHODS = new Set(['storeEntry', 'getEntry', 'searchEntries', 'listEntries', 'deleteEntry', 'generateEmbedding']);
+const CONNECT_TIMEOUT_MS = 200;
+const CALL_TIMEOUT_MS = 30000;
+const RETRY_AFTER_MS = 5000;
+
+let server = null;
+let serverFile = null;
+let hosting = false;
+let client = null;
+let unavailableUntil = 0;
+
+// <root>/.claude-flow/memory.sock, or, when that exceeds the platform's socket
+// path limit, a socket in a per-user 0700 directory under tmpdir. Null when
+// that directory exists but is not ours alone.
+export function memoryServicePath(root = process.cwd()) {
+    const id = createHash('sha1').update(path.resolve(root)).digest('hex').slice(0, 16);
+    if (process.platform === 'win32') return `\\\\\\\\.\\\\pipe\\\\claude-flow-memory-${id}`;
+    const local = path.join(root, '.claude-flow', 'memory.sock');
+    if (Buffer.byteLength(local) < 100) return local;
+    const dir = path.join(os.tmpdir(), `claude-flow-${process.getuid()}`);
+    try { fs.mkdirSync(dir, { mode: 0o700 }); } catch (error) { if (error.code !== 'EEXIST') return null; }
+    return ownedPrivately(dir) ? path.join(dir, `memory-${id}.sock`) : null;
+}
+
+// Owned by this user and closed to group and others; lstat, so a planted
+// symlink does not pass.
+function ownedPrivately(file) {
+    try {
+        const stat = fs.lstatSync(file);
+        return !stat.isSymbolicLink() && stat.uid === process.getuid() && (stat.mode & 0o077) === 0;
+    } catch {
+        return false;
+    }
+}
+
+// config.yaml `memory: service: false` turns the service off on both sides.
+function enabled(root) {
+    return String((readProjectConfig(root).memory || {}).service ?? 'true') !== 'false';
+}
+
+// True in the daemon once it serves: its memory calls run in-process.
+export function isMemoryServiceHost() {
+    return hosting;
+}
+
+function encode(message) {
+    return JSON.stringify(message, (key, value) => (ArrayBuffer.isView(value) ? Array.from(value) : value)) + '\\n';
+}
+
+function readLines(socket, onMessage) {
+    let buffer = '';
+    socket.setEncoding('utf8');
+    socket.on('data', (chunk) => {
+        buffer += chunk;
+        let nl;
+        while ((nl = buffer.indexOf('\\n')) !== -1) {
+            const line = buffer.slice(0, nl);
+            buffer = buffer.slice(nl + 1);
+            if (!line) continue;
+            let message;
+            try { message = JSON.parse(line); } catch { continue; }
+            onMessage(message);
+        }
+    });
+}
+
+export async function startMemoryService(root) {
+    if (server || !enabled(root) || path.resolve(root) !== process.cwd()) return null;
+    const file = memoryServicePath(root);
+    if (!file) return null;
+    const mi = await import('./memory-initializer.js');
+    hosting = true;
+    if (process.platform !== 'win32') {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        try { fs.unlinkSync(file); } catch { /* no stale socket */ }
+    }
+    server = net.createServer((socket) => {
+        socket.on('error', () => {});
+        readLines(socket, async ({ id, method, args }) => {
+            let reply;
+            try {
+                if (!METHODS.has(method)) throw new Error(`memory service: unknown method ${method}`);
+                reply = { id, result: await mi[method](...(args || [])) };
+            } catch (error) {
+                reply = { id, error: error instanceof Error ? error.message : String(error) };
+            }
+            if (!socket.destroyed) socket.write(encode(reply));
+        });
+    });
+    const listening = await new Promise((resolve) => {
+        server.once('error', () => resolve(false));
+        server.listen(file, () => resolve(true));
+    });
+    if (!listening) {
+        server = null;
+        hosting = false;
+        return null;
+    }
+    if (process.platform !== 'win32') {
+        try { fs.chmodSync(file, 0o600); } catch { /* clients refuse it until it is 0600 */ }
+    }
+    server.unref();
+    serverFile = file;
+    return file;
+}
+
+export async function stopMemoryService() {
+    if (!server) return;
+    const file = serverFile;
+    await new Promise((resolve) => server.close(() => resolve()));
+    server = null;
+    serverFile = null;
+    hosting = false;
+    if (file && process.platform !== 'win32') {
+        try { fs.unlinkSync(file); } catch { /* already gone */ }
+    }
+}
+
+function connect(file) {
+    return new Promise((resolve) => {
+        const socket = net.connect(file);
+        const timer = setTimeout(() => { socket.destroy(); resolve(null); }, CONNECT_TIMEOUT_MS);
+        socket.once('connect', () => { clearTimeout(timer); resolve(socket); });
+        socket.once('error', () => { clearTimeout(timer); resolve(null); });
+    });
+}
+
+async function connection() {
+    if (client && !client.socket.destroyed) return client;
+    if (Date.now() < unavailableUntil) return null;
+    const root = process.cwd();
+    const file = memoryServicePath(root);
+    // Only a socket this user's daemon created: anyone else's could answer
+    // memory calls with whatever it likes.
+    const socket = file && enabled(root) && (process.platform === 'win32' || ownedPrivately(file)) ? await connect(file) : null;
+    if (!socket) {
+        unavailableUntil = Date.now() + RETRY_AFTER_MS;
+        return null;
+    }
+    const c = { socket, pending: new Map(), nextId: 1 };
+    readLines(socket, ({ id, result, error }) => {
+        const call = c.pending.get(id);
+        if (!call) return;
+        c.pending.delete(id);
+        clearTimeout(call.timer);
+        if (!c.pending.size) socket.unref();
+        if (error !== undefined) call.reject(new Error(error));
+        else call.resolve({ routed: true, result });
+    });
+    socket.on('error', () => {});
+    socket.on('close', () => {
+        for (const call of c.pending.values()) { clearTimeout(call.timer); call.lost(); }
+        c.pending.clear();
+        if (client === c) client = null;
+    });
+    socket.unref();
+    client = c;
+    return c;
+}
+
+// { routed: true, result } from the daemon, or { routed: false } when no daemon
+// is listening (or, for reads, it did not answer in time): the caller then runs
+// the operation in-process. Errors raised by the operation itself are rethrown;
+// a write whose outcome is unknown (timeout, lost connection) rejects.
+export async function callMemoryService(method, args, { write = false } = {}) {
+    const c = await connection();
+    if (!c) return { routed: false };
+    return new Promise((resolve, reject) => {
+        const id = c.nextId++;
+        const unknown = (why) => (write ? reject(new Error(`memory service: ${method} ${why}`)) : resolve({ routed: false }));
+        const timer = setTimeout(() => { c.pending.delete(id); unknown(`timed out after ${CALL_TIMEOUT_MS}ms`); }, CALL_TIMEOUT_MS);
+        c.pending.set(id, { timer, resolve, reject, lost: () => unknown('lost its connection') });
+        c.socket.ref();
+        c.socket.write(encode({ id, method, args }));
+    });
+}
+""")
+
+append("MS-002: route memory calls through the daemon",
+    MI,
+    """
+// MS-002: outside the daemon, memory operations go to its memory service when
+// one is listening (commands/memory.js, mcp-tools/memory-tools.js and hooks all
+// call these exports). Calls with an explicit dbPath stay in-process.
+// memory-service.js (and net) is imported on the first call, not with this module.
+async function viaMemoryService(method, args, local, write) {
+    if (args[0]?.dbPath) return local(...args);
+    const { callMemoryService, isMemoryServiceHost } = await import('./memory-service.js');
+    if (isMemoryServiceHost()) return local(...args);
+    const reply = await callMemoryService(method, args, { write });
+    return reply.routed ? reply.result : local(...args);
+}
+try {
+    const storeEntryLocal = storeEntry;
+    storeEntry = async function (...args) { return viaMemoryService('storeEntry', args, storeEntryLocal, true); };
+    const deleteEntryLocal = deleteEntry;
+    deleteEntry = async function (...args) { return viaMemoryService('deleteEntry', args, deleteEntryLocal, true); };
+    const getEntryLocal = getEntry;
+    getEntry = async function (...args) { return viaMemoryService('getEntry', args, getEntryLocal, false); };
+    const searchEntriesLocal = searchEntries;
+    searchEntries = async function (...args) { return viaMemoryService('searchEntries', args, searchEntriesLocal, false); };
+    const listEntriesLocal = listEntries;
+    listEntries = async function (...args) { return viaMemoryService('listEntries', args, listEntriesLocal, false); };
+    const generateEmbeddingLocal = generateEmbedding;
+    generateEmbedding = async function (...args) { return viaMemoryService('generateEmbedding', args, generateEmbeddingLocal, false); };
+} catch { /* const bindings in this build: in-process only */ }
+""")
+
+append("MS-002: daemon hosts the memory service",
+    WD,
+    """
+// MS-002: the daemon serves memory operations while it runs. memory-service.js
+// is imported in start()/stop(): `daemon status` and other importers never need it.
+const loadMemoryService = () => import('../memory/memory-service.js');
+try {
+    const startWithoutMemoryService = WorkerDaemon.prototype.start;
+    WorkerDaemon.prototype.start = async function (...args) {
+        const started = await startWithoutMemoryService.apply(this, args);
+        loadMemoryService().then(({ startMemoryService }) => startMemoryService(this.projectRoot))
+            .then((file) => file && this.log('info', `Memory service listening on ${file}`))
+            .catch((error) => this.log('warn', `Memory service not started: ${error?.message || error}`));
+        return started;
+    };
+    const stopWithMemoryService = WorkerDaemon.prototype.stop;
+    WorkerDaemon.prototype.stop = async function (...args) {
+        await loadMemoryService().then(({ stopMemoryService }) => stopMemoryService()).catch(() => {});
+        return stopWithMemoryService.apply(this, args);
+    };
+} catch { /* WorkerDaemon not declared in this build */ }
+""")
@@ -0,0 +1,199 @@
+# MS-003: Temporal decay computed on read instead of batch row rewrites
+# searchEntries/listEntries derive effective confidence from each entry's
+# timestamp and half-life; consolidation only deletes entries that decayed below
+# the prune threshold, in one transaction, instead of applyTemporalDecay().
+# 3 ops
+
+PROJECT_CONFIG = services + "/project-config.js"
+
+patch("MS-003: decay settings in project-config",
+    PROJECT_CONFIG,
+    """    return { maxMB: number(cacheConfig.maxMB, null) };
+}
+""",
+    """    return { maxMB: number(cacheConfig.maxMB, null) };
+}
+
+// memory: section of config.yaml, temporal decay (MS-003). halfLifeDays 0 = off.
+export function getMemoryDecayConfig(root) {
+    const memory = readProjectConfig(root).memory || {};
+    return {
+        halfLifeDays: number(memory.decayHalfLifeDays, 30),
+        pruneBelow: number(memory.decayPruneBelow, 0.05),
+        namespaces: String(memory.decayNamespaces ?? 'patterns').split(',').map((ns) => ns.trim()).filter(Boolean),
+    };
+}
+""",
+    replaces="CF-003: project-config module")
+
+# Inside MS-002's routing, so the daemon's memory service computes decay where
+# the database is already open and routed callers receive decayed results.
+patch("MS-003: decay on read",
+    MI,
+    """try {
+    const storeEntryLocal = storeEntry;""",
+    """// MS-003: temporal decay computed on read. An entry in a decaying namespace
+// (memory: decayNamespaces, default patterns) has an effective confidence of
+// confidence * 0.5^(age / halfLife). confidence and halfLifeDays come from its
+// metadata when set (else 1 and memory: decayHalfLifeDays); age runs from
+// metadata.decayFrom, else updated_at. searchEntries() scales scores by it and
+// re-ranks, listEntries() reports it, and both hide entries below
+// memory: decayPruneBelow. Only pruneDecayedEntries() rewrites rows.
+import { getMemoryDecayConfig } from '../services/project-config.js';
+const DECAY_DAY_MS = 24 * 60 * 60 * 1000;
+const DECAY_ID_CHUNK = 500;
+function decayNumber(value) {
+    return value === null || value === undefined || value === '' ? NaN : Number(value);
+}
+function decayTimestamp(value) {
+    const n = decayNumber(value);
+    if (Number.isFinite(n)) return n < 1e12 ? n * 1000 : n; // seconds or ms
+    return typeof value === 'string' ? Date.parse(value) : NaN;
+}
+function effectiveConfidence(row, config, now) {
+    let meta = {};
+    try { meta = (typeof row.metadata === 'string' ? JSON.parse(row.metadata) : row.metadata) || {}; } catch { /* not JSON */ }
+    const base = decayNumber(meta.confidence);
+    const confidence = Number.isFinite(base) ? base : 1;
+    const own = decayNumber(meta.halfLifeDays);
+    const halfLifeDays = own > 0 ? own : config.halfLifeDays;
+    const from = decayTimestamp(meta.decayFrom ?? row.updated_at ?? row.created_at);
+    if (!(halfLifeDays > 0) || !Number.isFinite(from)) return confidence;
+    return confidence * Math.pow(0.5, Math.max(0, now - from) / (halfLifeDays * DECAY_DAY_MS));
+}
+function decaysNamespace(config, namespace) {
+    return config.halfLifeDays > 0 && config.namespaces.length > 0
+        && (!namespace || namespace === 'all' || config.namespaces.includes(namespace));
+}
+// id -> effective confidence, for the ids that are in a decaying namespace.
+async function decayedConfidences(ids, config) {
+    const out = new Map();
+    const now = Date.now();
+    const unique = [...new Set(ids.map(String))];
+    for (let i = 0; i < unique.length; i += DECAY_ID_CHUNK) {
+        const chunk = unique.slice(i, i + DECAY_ID_CHUNK);
+        const [rows] = await readMemoryRows([[`SELECT id, namespace, metadata, created_at, updated_at FROM memory_entries
+            WHERE id IN (${chunk.map(() => '?').join(',')})`, chunk]]);
+        for (const row of rows) {
+            if (config.namespaces.includes(row.namespace)) out.set(String(row.id), effectiveConfidence(row, config, now));
+        }
+    }
+    return out;
+}
+function withConfidence(item, confidence) {
+    const c = confidence.get(String(item.id));
+    if (c === undefined) return item;
+    const decayed = { ...item, confidence: Math.round(c * 1000) / 1000 };
+    if (typeof item.score === 'number') decayed.score = item.score * c;
+    if (typeof item.similarity === 'number') decayed.similarity = item.similarity * c;
+    return decayed;
+}
+export async function pruneDecayedEntries(options = {}) {
+    const config = { ...getMemoryDecayConfig() };
+    for (const key of ['halfLifeDays', 'pruneBelow', 'namespaces']) if (options[key] !== undefined) config[key] = options[key];
+    const dbPath = path.join(process.cwd(), '.swarm', 'memory.db');
+    if (!decaysNamespace(config) || !fs.existsSync(dbPath)) return { success: true, scanned: 0, pruned: 0 };
+    const initSqlJs = (await import('sql.js')).default;
+    const db = await openMemoryDb(await initSqlJs(), dbPath);
+    const now = Date.now();
+    const ids = [], namespaces = new Set();
+    let scanned = 0;
+    const stmt = db.prepare(`SELECT id, namespace, metadata, created_at, updated_at FROM memory_entries
+        WHERE status = 'active' AND namespace IN (${config.namespaces.map(() => '?').join(',')})`);
+    try {
+        stmt.bind(config.namespaces);
+        while (stmt.step()) {
+            const row = stmt.getAsObject();
+            scanned++;
+            if (effectiveConfidence(row, config, now) < config.pruneBelow) {
+                ids.push(String(row.id));
+                namespaces.add(row.namespace);
+            }
+        }
+    } finally { stmt.free(); }
+    if (!ids.length) return { success: true, scanned, pruned: 0 };
+    try {
+        db.exec('BEGIN');
+        try {
+            for (let i = 0; i < ids.length; i += DECAY_ID_CHUNK) {
+                const chunk = ids.slice(i, i + DECAY_ID_CHUNK);
+                db.run(`DELETE FROM memory_entries WHERE id IN (${chunk.map(() => '?').join(',')})`, chunk);
+            }
+            db.exec('COMMIT');
+        } catch (error) {
+            try { db.exec('ROLLBACK'); } catch { /* no transaction open */ }
+            throw error;
+        }
+        persistMemoryDb(dbPath, db);
+    } catch (error) {
+        return { success: false, scanned, pruned: 0, error: error?.message || String(error) };
+    }
+    // One GV-002 journal append for the batch; GV-003 partitions reload lazily.
+    try { fs.appendFileSync(hnswTombstonePath(), ids.map((id) => `${id}\\n`).join('')); } catch { /* next rebuild drops them */ }
+    if (hnswIndex) syncHNSWTombstones(hnswIndex);
+    for (const namespace of namespaces) hnswPartitions.byNamespace.delete(namespace);
+    return { success: true, scanned, pruned: ids.length };
+}
+try {
+    const searchEntriesUndecayed = searchEntries;
+    searchEntries = async function (options = {}) {
+        const config = getMemoryDecayConfig();
+        if (!decaysNamespace(config, options?.namespace)) return searchEntriesUndecayed(options);
+        // Over-fetch so decayed entries can be outranked by fresher ones.
+        const limit = options?.limit ?? 10;
+        const result = await searchEntriesUndecayed({ ...options, limit: limit * 2 });
+        if (!Array.isArray(result?.results) || !result.results.length) return result;
+        let confidence;
+        try { confidence = await decayedConfidences(result.results.map((r) => r.id), config); }
+        catch { confidence = new Map(); }
+        if (!confidence.size) {
+            result.results = result.results.slice(0, limit);
+            return result;
+        }
+        const rank = (r) => r.score ?? r.similarity ?? 0;
+        result.results = result.results
+            .filter((r) => !(confidence.get(String(r.id)) < config.pruneBelow))
+            .map((r) => withConfidence(r, confidence))
+            .sort((a, b) => rank(b) - rank(a))
+            .slice(0, limit);
+        return result;
+    };
+    const listEntriesUndecayed = listEntries;
+    listEntries = async function (options = {}) {
+        const config = getMemoryDecayConfig();
+        const result = await listEntriesUndecayed(options);
+        if (!decaysNamespace(config, options?.namespace) || !Array.isArray(result?.entries) || !result.entries.length) return result;
+        let confidence;
+        try { confidence = await decayedConfidences(result.entries.map((e) => e.id), config); }
+        catch { return result; }
+        const before = result.entries.length;
+        result.entries = result.entries
+            .filter((e) => !(confidence.get(String(e.id)) < config.pruneBelow))
+            .map((e) => withConfidence(e, confidence));
+        // Hidden entries on this page only; the next prune removes them for good.
+        if (typeof result.total === 'number') result.total -= before - result.entries.length;
+        return result;
+    };
+} catch { /* const bindings in this build: entries are still pruned at consolidation */ }
+try {
+    // Other callers no longer rewrite every row either.
+    applyTemporalDecay = async function (options = {}) {
+        const pruned = await pruneDecayedEntries(options);
+        return { ...pruned, patternsDecayed: 0, patternsPruned: pruned.pruned, decayOnRead: true };
+    };
+} catch { /* no applyTemporalDecay in this build */ }
+try {
+    const storeEntryLocal = storeEntry;""",
+    replaces="MS-002: route memory calls through the daemon")
+
+patch("MS-003: consolidate prunes decayed entries",
+    WD,
+    """            // 1. Apply temporal decay (reduce confidence of stale patterns)
+            const decayResult = await mi.applyTemporalDecay();
+            if (decayResult?.success) result.patternsConsolidated = decayResult.patternsDecayed || 0;""",
+    """            // 1. Decay is computed on read (MS-003): only entries that decayed below
+            //    the prune threshold are deleted, in one transaction.
+            const pruneResult = await mi.pruneDecayedEntries().catch((e) => ({ success: false, error: e?.message || String(e) }));
+            if (pruneResult.success) result.patternsConsolidated = pruneResult.pruned;
+            else result.decayError = pruneResult.error;""",
+    replaces="12: real consolidate worker")
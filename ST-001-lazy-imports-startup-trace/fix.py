@@ -0,0 +1,196 @@
+# ST-001: Lazy MCP tool loading for `hooks`, and an opt-in CLI startup trace
+# `hooks` subcommands load hooks-tools.js alone instead of mcp-client.js and every
+# MCP tool module. CLAUDE_FLOW_STARTUP_TRACE registers the tracer from bin/cli.js,
+# before the CLI's modules load, and records load times and time to first output.
+# 15 ops
+
+STARTUP_TRACE = services + "/startup-trace.js"
+STARTUP_TRACE_LOADER = services + "/startup-trace-loader.js"
+CONF = commands + "/config.js"
+HOOKS = commands + "/hooks.js"
+NEURAL = commands + "/neural.js"
+BIN = base + "/../../bin/cli.js"
+
+create("ST-001: startup-trace module",
+    STARTUP_TRACE,
+    """// startup-trace.js — added by claude-flow patch ST-001.
+// Opt-in startup profile of one CLI invocation. With CLAUDE_FLOW_STARTUP_TRACE
+// set, each patched module reports when it finished evaluating, a loader hook
+// (Node >= 20.6) reports every module loaded after this one, and the first
+// write to stdout is timed. All times are ms since process start. At exit one
+// JSON line goes to .claude-flow/metrics/startup-trace.jsonl (=1), to stderr
+// (=stderr) or to the given file. Unset, nothing is registered.
+import fs from 'fs';
+import path from 'path';
+import * as nodeModule from 'module';
+import { MessageChannel } from 'worker_threads';
+import { performance } from 'perf_hooks';
+
+const MODE = process.env.CLAUDE_FLOW_STARTUP_TRACE || '';
+const MAX_LOADS = 500;
+const DIST = new URL('../', import.meta.url).href;
+
+function elapsed(at = performance.now()) {
+    return Math.round(at * 10) / 10;
+}
+
+// dist-relative for the CLI's own modules, package path for dependencies.
+function moduleName(url) {
+    if (url.startsWith(DIST)) return url.slice(DIST.length);
+    const i = url.lastIndexOf('/node_modules/');
+    return i === -1 ? url : url.slice(i + '/node_modules/'.length);
+}
+
+const trace = MODE && MODE !== '0' && MODE !== 'false' ? {
+    command: process.argv.slice(2).filter((arg) => !arg.startsWith('-')).slice(0, 2).join(' '),
+    traceStartMs: elapsed(),
+    firstOutputMs: null,
+    modules: [],
+    loads: [],
+} : null;
+
+// AT: performance.now() when the module finished evaluating (the mark sites
+// import this module asynchronously, after that point).
+export function markStartupModule(url, at = performance.now()) {
+    if (trace) trace.modules.push({ module: moduleName(url), readyMs: elapsed(at) });
+}
+
+function watchFirstOutput() {
+    const write = process.stdout.write;
+    process.stdout.write = function (...args) {
+        if (trace.firstOutputMs === null) trace.firstOutputMs = elapsed();
+        return write.apply(this, args);
+    };
+}
+
+function watchLoads() {
+    if (typeof nodeModule.register !== 'function') return;
+    const { port1, port2 } = new MessageChannel();
+    port1.on('message', ({ url, startedAt, loadMs }) => {
+        if (trace.loads.length < MAX_LOADS) {
+            trace.loads.push({ module: moduleName(url), atMs: elapsed(startedAt - performance.timeOrigin), loadMs });
+        }
+    });
+    port1.unref();
+    try {
+        nodeModule.register('./startup-trace-loader.js', import.meta.url, { data: { port: port2 }, transferList: [port2] });
+    } catch { /* hooks unavailable: module ready times only */ }
+}
+
+function report(code) {
+    const line = JSON.stringify({
+        ts: new Date().toISOString(),
+        pid: process.pid,
+        node: process.version,
+        command: trace.command,
+        exitCode: code,
+        traceStartMs: trace.traceStartMs,
+        firstOutputMs: trace.firstOutputMs,
+        exitMs: elapsed(),
+        modules: trace.modules,
+        loads: trace.loads,
+    }) + '\\n';
+    try {
+        if (MODE === 'stderr') {
+            fs.writeSync(2, line);
+            return;
+        }
+        const file = MODE === '1' || MODE === 'true'
+            ? path.join(process.cwd(), '.claude-flow', 'metrics', 'startup-trace.jsonl')
+            : path.resolve(MODE);
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.appendFileSync(file, line);
+    } catch { /* tracing never fails the command */ }
+}
+
+if (trace) {
+    watchFirstOutput();
+    watchLoads();
+    process.once('exit', report);
+}
+""")
+
+create("ST-001: startup-trace loader hooks",
+    STARTUP_TRACE_LOADER,
+    """// startup-trace-loader.js — added by claude-flow patch ST-001.
+// Module customization hooks registered by startup-trace.js. They run on the
+// loader thread and post { url, startedAt (epoch ms), loadMs } per module.
+import { performance } from 'perf_hooks';
+
+let port = null;
+
+export async function initialize(data) {
+    port = data?.port ?? null;
+}
+
+export async function load(url, context, nextLoad) {
+    if (!port || url.startsWith('node:')) return nextLoad(url, context);
+    const started = performance.now();
+    const result = await nextLoad(url, context);
+    port.postMessage({ url, startedAt: performance.timeOrigin + started, loadMs: Math.round((performance.now() - started) * 10) / 10 });
+    return result;
+}
+""")
+
+# bin/cli.js imports dist/src/index.js dynamically, so a loader hook registered
+# here sees the whole command graph load.
+patch("ST-001: tracer before the CLI entry",
+    BIN,
+    "#!/usr/bin/env node\n",
+    """#!/usr/bin/env node
+// ST-001: CLAUDE_FLOW_STARTUP_TRACE registers the tracer (and its module loader
+// hook) before the CLI's own modules are imported.
+if (process.env.CLAUDE_FLOW_STARTUP_TRACE) await import('../dist/src/services/startup-trace.js').catch(() => {});
+""")
+
+# Hooks run the CLI several times per agent turn, and nearly every subcommand
+# is one MCP tool call. mcp-client.js statically imports every tool module.
+patch("ST-001: hooks loads only hooks-tools",
+    HOOKS,
+    "import { callMCPTool, MCPClientError } from '../mcp-client.js';",
+    """// ST-001: hooks/* tools are called from hooks-tools.js directly; mcp-client.js,
+// which statically imports every MCP tool module, loads only for other tools
+// and to wrap handler errors.
+let hooksMCPClient = null;
+async function loadHooksMCPClient() {
+    return (hooksMCPClient ??= await import('../mcp-client.js'));
+}
+async function callMCPTool(name, input = {}, context) {
+    const hooksTools = await import('../mcp-tools/hooks-tools.js');
+    const tool = Object.values(hooksTools).flat().find((t) => t?.name === name && typeof t.handler === 'function');
+    if (!tool) return (await loadHooksMCPClient()).callMCPTool(name, input, context);
+    try {
+        return await tool.handler(input, context);
+    } catch (error) {
+        const { MCPClientError: ClientError } = await loadHooksMCPClient();
+        throw new ClientError(`Failed to execute tool '${name}': ${error?.message || error}`, name, error);
+    }
+}
+// instanceof checks in the catch blocks: only a loaded client can have thrown one.
+const MCPClientError = { [Symbol.hasInstance]: (error) => !!hooksMCPClient && error instanceof hooksMCPClient.MCPClientError };""")
+
+# Ready marks: each module reports when its body (and every patch appended
+# before this one) has finished evaluating.
+for name, target, trace_module in (
+    ("memory-initializer", MI, "../services/startup-trace.js"),
+    ("worker-daemon", WD, "./startup-trace.js"),
+    ("headless-worker-executor", HWE, "./startup-trace.js"),
+    ("commands/daemon", DJ, "../services/startup-trace.js"),
+    ("commands/doctor", DOC, "../services/startup-trace.js"),
+    ("commands/config", CONF, "../services/startup-trace.js"),
+    ("commands/memory", CLI_MEMORY, "../services/startup-trace.js"),
+    ("commands/hooks", HOOKS, "../services/startup-trace.js"),
+    ("commands/neural", NEURAL, "../services/startup-trace.js"),
+    ("mcp memory-tools", MCP_MEMORY, "../services/startup-trace.js"),
+    ("mcp hooks-tools", MCP_HOOKS, "../services/startup-trace.js"),
+):
+    append(f"ST-001: startup trace mark in {name}",
+        target,
+        f"""
+// ST-001: startup trace mark. The tracer is imported only when
+// CLAUDE_FLOW_STARTUP_TRACE is set; the ready time is taken here.
+if (process.env.CLAUDE_FLOW_STARTUP_TRACE) {{
+    const startupReadyAt = performance.now();
+    import('{trace_module}').then((trace) => trace.markStartupModule(import.meta.url, startupReadyAt)).catch(() => {{}});
+}}
+""")
@@ -0,0 +1,312 @@
+# UI-003: Status commands read an index-stats sidecar instead of loading the index
+# Preload, consolidate, every index build/update and (debounced) every single
+# add or delete write .swarm/index-stats.json;
+# `neural status` and the intelligence stats tool read it unless --live is given
+# (or, for the tool, the snapshot predates the last index write or is too old).
+# 8 ops
+
+INDEX_STATS = memory + "/index-stats.js"
+NEURAL = commands + "/neural.js"
+
+create("UI-003: index-stats module",
+    INDEX_STATS,
+    """// index-stats.js — added by claude-flow patch UI-003.
+// .swarm/index-stats.json: a few hundred bytes describing the HNSW index
+// (entries, dimension, model, tombstones, last rebuild, file sizes) plus the
+// last live status snapshots. memory-initializer writes it whenever it builds
+// or updates the index; status commands read it instead of loading the index.
+import fs from 'fs';
+import path from 'path';
+
+const INDEX_FILES = {
+    memoryDb: 'memory.db',
+    hnswIndex: 'hnsw.index',
+    hnswMetadata: 'hnsw.metadata.json',
+    tombstones: 'hnsw.tombstones',
+    hnswInt8: 'hnsw.int8.index',
+    hnswFloat16: 'hnsw.float16.index',
+};
+
+export function indexStatsPath(root = process.cwd()) {
+    return path.join(root, '.swarm', 'index-stats.json');
+}
+
+function fileSizes(root) {
+    const sizes = {};
+    for (const [key, name] of Object.entries(INDEX_FILES)) {
+        try { sizes[key] = fs.statSync(path.join(root, '.swarm', name)).size; } catch { sizes[key] = 0; }
+    }
+    return sizes;
+}
+
+// The sidecar with current file sizes, or null before the first write.
+export function readIndexStats(root = process.cwd()) {
+    let stats;
+    try { stats = JSON.parse(fs.readFileSync(indexStatsPath(root), 'utf-8')); } catch { return null; }
+    return stats && typeof stats === 'object' ? { ...stats, files: fileSizes(root) } : null;
+}
+
+// Merges FIELDS into the sidecar; `rebuilt: true` stamps lastRebuild.
+export function writeIndexStats(fields = {}, root = process.cwd()) {
+    const { rebuilt, ...rest } = fields;
+    const now = new Date().toISOString();
+    const stats = { ...readIndexStats(root), ...rest, updatedAt: now, files: fileSizes(root) };
+    if (rebuilt) stats.lastRebuild = now;
+    const file = indexStatsPath(root);
+    const tmp = `${file}.${process.pid}.tmp`;
+    try {
+        fs.mkdirSync(path.dirname(file), { recursive: true });
+        fs.writeFileSync(tmp, JSON.stringify(stats, null, 2));
+        fs.renameSync(tmp, file);
+    } catch {
+        try { fs.unlinkSync(tmp); } catch { /* never written */ }
+    }
+    return stats;
+}
+
+// No sidecar yet: the count of active rows with an embedding (what a build
+// indexes) from one read of memory.db, without loading the index.
+export async function indexStatsFromMemoryDb(root = process.cwd()) {
+    const dbPath = path.join(root, '.swarm', 'memory.db');
+    if (!fs.existsSync(dbPath)) return null;
+    try {
+        const initSqlJs = (await import('sql.js')).default;
+        const SQL = await initSqlJs();
+        const db = new SQL.Database(fs.readFileSync(dbPath));
+        try {
+            const [count] = db.exec(`SELECT COUNT(*) FROM memory_entries WHERE status = 'active' AND embedding IS NOT NULL`)[0]?.values?.[0] || [];
+            return { entries: count ?? 0, files: fileSizes(root), source: 'memory.db' };
+        } finally { db.close(); }
+    } catch { return null; }
+}
+
+// Index fields only, without the status snapshots.
+export function indexStatsSummary(stats) {
+    if (!stats) return null;
+    const { training, intelligence, ...index } = stats;
+    return index;
+}
+
+// `--live` on the CLI, `live: true` for MCP callers.
+export function wantsLiveStatus(params) {
+    return params?.live === true || process.argv.includes('--live');
+}
+
+// getHNSWStatus() of a process that has not loaded the index, completed from
+// the sidecar (the index exists on disk with these counts) or from
+// indexStatsFromMemoryDb() (initialized only if an index file exists).
+export function hnswStatusFromIndexStats(status, stats) {
+    if (!stats || status?.initialized || typeof stats.entries !== 'number') return status;
+    const files = stats.files || {};
+    return {
+        ...status,
+        available: true,
+        initialized: stats.source !== 'memory.db' || files.hnswIndex > 0 || files.hnswInt8 > 0 || files.hnswFloat16 > 0,
+        entryCount: stats.entries,
+        dimensions: stats.dimension ?? status?.dimensions,
+        source: stats.source ?? 'index-stats',
+        updatedAt: stats.updatedAt,
+    };
+}
+""")
+
+append("UI-003: index stats on build and update",
+    MI,
+    """
+// UI-003: every index build, load from disk or incremental update refreshes
+// .swarm/index-stats.json; the daemon workers also call recordIndexStats().
+// Single adds (storeEntry) and deletes (GV-002 tombstones, MS-003 prunes)
+// refresh it at most once per INDEX_STATS_DEBOUNCE_MS, and at exit.
+import { writeIndexStats as writeIndexStatsFile } from './index-stats.js';
+const INDEX_STATS_DEBOUNCE_MS = 1000;
+let indexStatsTimer = null;
+let indexStatsExitHook = false;
+export function recordIndexStats(fields = {}) {
+    if (indexStatsTimer) { clearTimeout(indexStatsTimer); indexStatsTimer = null; }
+    // indexUpdatedAt: status snapshots taken before it are stale.
+    const stats = { ...fields, indexUpdatedAt: new Date().toISOString() };
+    const configured = projectEmbeddingModel();
+    stats.model = fields.model || configured.model;
+    stats.dimension = hnswIndex?.dimensions ?? configured.dimension;
+    if (hnswIndex?.entries) {
+        stats.entries = hnswIndex.entries.size;
+        stats.tombstones = getHNSWTombstoneStats().tombstones;
+        try { stats.vectorStorage = getHNSWStorageStats(); } catch { /* float32 only */ }
+    }
+    return writeIndexStatsFile(stats);
+}
+function scheduleIndexStats() {
+    if (indexStatsTimer) return;
+    indexStatsTimer = setTimeout(() => {
+        indexStatsTimer = null;
+        try { recordIndexStats(); } catch { /* next write retries */ }
+    }, INDEX_STATS_DEBOUNCE_MS);
+    indexStatsTimer.unref();
+    if (!indexStatsExitHook) {
+        indexStatsExitHook = true;
+        process.on('exit', () => {
+            if (indexStatsTimer) try { recordIndexStats(); } catch { /* best-effort */ }
+        });
+    }
+}
+// A persisted index: hnsw.metadata.json, or GV-004's quantized file.
+function hnswIndexPersisted() {
+    if (fs.existsSync(path.join(process.cwd(), '.swarm', 'hnsw.metadata.json'))) return true;
+    try {
+        const { type } = hnswStorage();
+        return type !== 'float32' && fs.existsSync(hnswQuantizedPath(type));
+    } catch { return false; }
+}
+try {
+    const getHNSWIndexUnrecorded = getHNSWIndex;
+    getHNSWIndex = async function (options) {
+        const before = hnswIndex;
+        const persisted = hnswIndexPersisted();
+        const index = await getHNSWIndexUnrecorded(options);
+        if (hnswIndex && hnswIndex !== before) recordIndexStats({ rebuilt: !!options?.forceRebuild || !persisted });
+        return index;
+    };
+    const updateHNSWIndexUnrecorded = updateHNSWIndex;
+    updateHNSWIndex = async function (...args) {
+        const result = await updateHNSWIndexUnrecorded(...args);
+        if (result?.indexed || result?.refreshed) recordIndexStats();
+        return result;
+    };
+} catch { /* const bindings in this build: the workers still record */ }
+try {
+    const addToHNSWIndexUnrecorded = addToHNSWIndex;
+    addToHNSWIndex = async function (...args) {
+        const added = await addToHNSWIndexUnrecorded(...args);
+        if (hnswIndex) scheduleIndexStats();
+        return added;
+    };
+} catch { /* const bindings in this build */ }
+try {
+    const appendHNSWTombstoneUnrecorded = appendHNSWTombstone;
+    appendHNSWTombstone = function (...args) {
+        const appended = appendHNSWTombstoneUnrecorded(...args);
+        scheduleIndexStats();
+        return appended;
+    };
+} catch { /* no tombstone journal in this build */ }
+try {
+    if (typeof pruneDecayedEntries === 'function') {
+        const pruneDecayedEntriesUnrecorded = pruneDecayedEntries;
+        pruneDecayedEntries = async function (...args) {
+            const result = await pruneDecayedEntriesUnrecorded(...args);
+            if (result?.pruned) scheduleIndexStats();
+            return result;
+        };
+    }
+} catch { /* MS-003 not applied */ }
+""")
+
+patch("UI-003: preload records index stats",
+    WD,
+    "            if (hnswResult) { result.resourcesPreloaded++; result.hnswEntries = hnswResult.entries?.size ?? 0; }",
+    """            if (hnswResult) { result.resourcesPreloaded++; result.hnswEntries = hnswResult.entries?.size ?? 0; }
+            mi.recordIndexStats?.({ model: result.embeddingModel, preloadedAt: result.timestamp });""",
+    replaces="11: real preload worker")
+
+patch("UI-003: consolidate records index stats",
+    WD,
+    "            result.watermark = { updatedAt: watermark, model, dimension, refreshed };",
+    """            result.watermark = { updatedAt: watermark, model, dimension, refreshed };
+            mi.recordIndexStats?.({ model, consolidatedAt: result.timestamp, rebuilt: result.hnswRebuilt !== undefined });""",
+    replaces="DM-006: consolidate from watermark")
+
+patch("UI-003: neural status reads index stats",
+    NEURAL,
+    "const { getHNSWIndex, getHNSWStatus, loadEmbeddingModel } = await import('../memory/memory-initializer.js');",
+    """// UI-003: without --live, HNSW and RuVector status come from .swarm/index-stats.json
+            // (or, before its first write, a count from memory.db), and memory-initializer,
+            // with sql.js, ONNX and the HNSW graph behind it, is not imported at all.
+            const { readIndexStats, indexStatsFromMemoryDb, writeIndexStats, hnswStatusFromIndexStats, wantsLiveStatus } = await import('../memory/index-stats.js');
+            const liveStatus = wantsLiveStatus();
+            const memoryInitializer = liveStatus ? await import('../memory/memory-initializer.js') : null;
+            const indexStats = liveStatus ? null : readIndexStats() ?? await indexStatsFromMemoryDb();
+            const getHNSWIndex = memoryInitializer?.getHNSWIndex;
+            const getHNSWStatus = (...args) => hnswStatusFromIndexStats(memoryInitializer
+                ? memoryInitializer.getHNSWStatus(...args)
+                : { available: false, initialized: false, entryCount: 0, dimensions: indexStats?.dimension ?? 0 }, indexStats);
+            const loadEmbeddingModel = memoryInitializer?.loadEmbeddingModel ?? (async () => indexStats?.model
+                ? { success: true, modelName: indexStats.model, dimensions: indexStats.dimension, source: 'index-stats' }
+                : { success: false, error: 'not recorded yet (--live to load the model)' });""",
+    replaces="18a: neural.js import getHNSWIndex")
+
+patch("UI-003: neural status loads only with --live",
+    NEURAL,
+    """            // Patch 18: Initialize RuVector WASM + SONA + HNSW so status reflects reality
+            if (!ruvector.getTrainingStats().initialized) {
+                await ruvector.initializeTraining({ useSona: true }).catch(() => {});
+            }
+            await getHNSWIndex().catch(() => null);
+            const ruvectorStats = ruvector.getTrainingStats();""",
+    """            // Patch 18 / UI-003: with --live, initialize RuVector WASM + SONA + HNSW and
+            // record what was found; otherwise report the last recorded state.
+            if (liveStatus) {
+                if (!ruvector.getTrainingStats().initialized) {
+                    await ruvector.initializeTraining({ useSona: true }).catch(() => {});
+                }
+                await getHNSWIndex().catch(() => null);
+                writeIndexStats({ training: ruvector.getTrainingStats() });
+            } else if (indexStats?.source === 'memory.db') {
+                output.writeln(output.dim('No index stats recorded yet: entry count read from memory.db (--live to load the index)'));
+            } else if (indexStats) {
+                output.writeln(output.dim(`Index stats recorded ${indexStats.updatedAt} (--live to load the index)`));
+            }
+            const ruvectorStats = indexStats?.training ? { ...ruvector.getTrainingStats(), ...indexStats.training } : ruvector.getTrainingStats();""",
+    replaces="18b: neural.js init before status")
+
+append("UI-003: neural status --live option",
+    NEURAL,
+    """
+// UI-003: `neural status --live` loads the index instead of reading the sidecar.
+try {
+    statusCommand.options = [...(statusCommand.options || []), { name: 'live', description: 'Load RuVector, SONA and the HNSW index instead of reading .swarm/index-stats.json', type: 'boolean', default: false }];
+} catch { /* no statusCommand in this build */ }
+""")
+
+append("UI-003: intelligence stats from the sidecar",
+    MCP_HOOKS,
+    """
+// UI-003: the intelligence stats tool (and `hooks intelligence stats`, which
+// calls it) returns the last live result plus current index stats from
+// .swarm/index-stats.json. It runs live, and records that result as the new
+// snapshot, with `live: true` / --live, when no snapshot exists, or when the
+// snapshot predates the last index write or is older than
+// INTELLIGENCE_SNAPSHOT_MAX_AGE_MS. If that live run fails, the old snapshot
+// is returned marked `stale: true`.
+import * as intelligenceStatsTools from './hooks-tools.js';
+import { readIndexStats as readIntelligenceIndexStats, writeIndexStats as writeIntelligenceIndexStats, indexStatsSummary, wantsLiveStatus as wantsLiveIntelligenceStats } from '../memory/index-stats.js';
+const INTELLIGENCE_SNAPSHOT_MAX_AGE_MS = 15 * 60 * 1000;
+function intelligenceSnapshotStale(stats) {
+    const at = Date.parse(stats.intelligence.at);
+    return !(Date.now() - at < INTELLIGENCE_SNAPSHOT_MAX_AGE_MS) || at < Date.parse(stats.indexUpdatedAt ?? 0);
+}
+try {
+    const candidates = new Set(Object.values(intelligenceStatsTools).flat());
+    for (const tool of candidates) {
+        if (!tool || typeof tool.handler !== 'function' || !/intelligence[_/-]?stats$/.test(tool.name || '')) continue;
+        const liveHandler = tool.handler;
+        tool.handler = async function (params = {}, ...rest) {
+            const stats = wantsLiveIntelligenceStats(params) ? null : readIntelligenceIndexStats();
+            const snapshot = stats?.intelligence?.result ? (stale) => ({
+                ...stats.intelligence.result, index: indexStatsSummary(stats), source: 'index-stats', snapshotAt: stats.intelligence.at, stale,
+            }) : null;
+            if (snapshot && !intelligenceSnapshotStale(stats)) return snapshot(false);
+            let result;
+            try { result = await liveHandler.call(this, params, ...rest); }
+            catch (error) { if (snapshot) return snapshot(true); throw error; }
+            if (result && typeof result === 'object' && !result.error) {
+                const recorded = writeIntelligenceIndexStats({ intelligence: { at: new Date().toISOString(), result } });
+                return { ...result, index: indexStatsSummary(recorded) };
+            }
+            return snapshot ? snapshot(true) : result;
+        };
+        if (tool.inputSchema?.properties) {
+            tool.inputSchema.properties.live = { type: 'boolean', description: 'Load the live engines instead of reading .swarm/index-stats.json' };
+        }
+    }
+} catch { /* tool objects not extensible in this build */ }
+""")
@@ -0,0 +1,149 @@
+# bench_patch.py — patch engine + sentinel benchmark over synthetic npx caches
+#
+# For every (versions, scale) case, builds a synthetic cache with synth.py and
+# times, as separate processes (what a session start actually pays):
+#   cold         first patch-all run over a freshly generated cache
+#   warm         patch runs over pristine copies once the cache is hot (median)
+#   idempotent   re-runs over an already patched cache, every op skipped (median)
+#   sentinel     stat-only check against the manifest (median)
+#   sentinel_hash     every recorded file's mtime bumped, content unchanged
+#   sentinel_content  one file reverted to pristine: dry-run content check
+# Results go to bench/results/<timestamp>.json; --compare prints the ratio
+# against an earlier results file. Offline, stdlib only.
+#
+#   python3 bench/bench_patch.py [--versions 1,8] [--scales 1,10] [--repeat 3]
+#                                [--compare bench/results/<old>.json]
+
+import sys, os, json, time, shutil, platform, statistics, subprocess, tempfile, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+import synth
+
+RUNNER = os.path.join(ROOT, "lib", "runner.py")
+SENTINEL = os.path.join(ROOT, "lib", "sentinel.py")
+METRICS = ("cold_ms", "warm_ms", "idempotent_ms", "sentinel_ms", "sentinel_hash_ms", "sentinel_content_ms")
+
+def timed(cmd, env):
+    t = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    return (time.perf_counter() - t) * 1000, proc
+
+def run_case(workdir, versions, scale, repeat, jobs, ops):
+    pristine = os.path.join(workdir, "pristine")
+    home = os.path.join(workdir, "home")
+    bases = synth.build_cache(pristine, versions, scale, ops=ops)
+    env = dict(os.environ, HOME=home,
+               CLAUDE_PATCH_MANIFEST=os.path.join(workdir, "manifest.json"),
+               CLAUDE_PATCH_REPORT=os.path.join(workdir, "report.json"))
+    patch_cmd = [sys.executable, RUNNER, "--all", "--jobs", str(jobs)]
+    sentinel_cmd = [sys.executable, SENTINEL, "--all"]
+
+    def reset():
+        shutil.rmtree(home, ignore_errors=True)
+        shutil.copytree(pristine, home, symlinks=True)
+
+    reset()
+    cold, proc = timed(patch_cmd, env)
+    warns = proc.stdout.count("  WARN:") + proc.stdout.count("  ERROR:")
+    warm = []
+    for _ in range(repeat):
+        reset()
+        warm.append(timed(patch_cmd, env)[0])
+    idem = [timed(patch_cmd, env)[0] for _ in range(repeat)]
+    sentinel = [timed(sentinel_cmd, env)[0] for _ in range(repeat)]
+
+    with open(env["CLAUDE_PATCH_MANIFEST"]) as f:
+        recorded = [p for inst in json.load(f)["installs"].values() for p in inst["files"]]
+    touched = []
+    for _ in range(repeat):
+        now = time.time()
+        for p in recorded:
+            os.utime(p, (now, now))
+        touched.append(timed(sentinel_cmd, env)[0])
+
+    content = []
+    mi_rel = os.path.join("memory", "memory-initializer.js")
+    for _ in range(repeat):
+        rel_base = os.path.relpath(bases[0], pristine)
+        shutil.copyfile(os.path.join(bases[0], mi_rel), os.path.join(home, rel_base, mi_rel))
+        ms, proc = timed(sentinel_cmd, env)
+        content.append(ms)
+        timed(patch_cmd, env)
+
+    size = sum(os.path.getsize(os.path.join(d, f))
+               for d, _, files in os.walk(pristine) for f in files)
+    shutil.rmtree(home, ignore_errors=True)
+    shutil.rmtree(pristine, ignore_errors=True)
+    return {
+        "versions": versions, "scale": scale, "cache_bytes": size,
+        "ops": len(ops), "warn_or_error": warns,
+        "cold_ms": round(cold, 2),
+        "warm_ms": round(statistics.median(warm), 2),
+        "idempotent_ms": round(statistics.median(idem), 2),
+        "sentinel_ms": round(statistics.median(sentinel), 2),
+        "sentinel_hash_ms": round(statistics.median(touched), 2),
+        "sentinel_content_ms": round(statistics.median(content), 2),
+    }
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(cases, old_path):
+    with open(old_path) as f:
+        old = {(c["versions"], c["scale"]): c for c in json.load(f)["cases"]}
+    print(f"\nvs {old_path} (new/old):")
+    for c in cases:
+        prev = old.get((c["versions"], c["scale"]))
+        if not prev:
+            continue
+        ratios = "  ".join(f"{m[:-3]} {c[m] / prev[m]:.2f}x" for m in METRICS if prev.get(m))
+        print(f"  v={c['versions']:<3} x{c['scale']:<4} {ratios}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the patch engine on synthetic caches")
+    ap.add_argument("--versions", default="1,8", help="comma list of simulated cached versions")
+    ap.add_argument("--scales", default="1,10", help="comma list of file-size multipliers")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", default=os.path.join(HERE, "results"))
+    ap.add_argument("--compare", help="earlier results JSON to compare against")
+    args = ap.parse_args(argv)
+
+    ops = synth.record_ops()
+    cases = []
+    print(f"{'versions':>8} {'scale':>6} {'MB':>7} " + " ".join(f"{m[:-3]:>17}" for m in METRICS))
+    for versions in (int(v) for v in args.versions.split(",")):
+        for scale in (float(s) for s in args.scales.split(",")):
+            with tempfile.TemporaryDirectory(prefix="claude-patch-bench-") as workdir:
+                c = run_case(workdir, versions, scale, args.repeat, args.jobs, ops)
+            cases.append(c)
+            flag = f"  ({c['warn_or_error']} WARN/ERROR in cold run)" if c["warn_or_error"] else ""
+            print(f"{versions:>8} {scale:>6g} {c['cache_bytes'] / 1e6:>7.1f} " +
+                  " ".join(f"{c[m]:>17.1f}" for m in METRICS) + flag)
+
+    result = {
+        "when": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_rev(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "jobs": args.jobs,
+        "repeat": args.repeat,
+        "cases": cases,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=1)
+    print(f"\nSaved {path}")
+    if args.compare:
+        compare(cases, args.compare)
+
+if __name__ == "__main__":
+    main()
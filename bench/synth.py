@@ -0,0 +1,144 @@
+# synth.py — synthetic claude-flow npx caches for benchmarking the patch engine
+#
+# Builds ~/.npm/_npx/<hash>/node_modules/@claude-flow/cli trees under a fake
+# HOME. Each dist file holds the real "old" anchors of every registered fix.py
+# (recorded, not copied by hand, so new fixes are picked up automatically),
+# spread through generated JS filler up to a target size. Offline, stdlib only.
+#
+#   python3 bench/synth.py OUT_HOME [--versions N] [--scale X]
+
+import sys, os, random, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lib"))
+from common import TARGETS
+import registry
+
+# Approximate size (bytes) of each target in a current @claude-flow/cli dist.
+# scale=1 reproduces these; the benchmark goes up to 10x.
+BASE_SIZES = {
+    "services/headless-worker-executor.js": 30_000,
+    "services/worker-daemon.js": 35_000,
+    "commands/daemon.js": 20_000,
+    "commands/doctor.js": 40_000,
+    "commands/config.js": 15_000,
+    "commands/memory.js": 45_000,
+    "commands/hooks.js": 150_000,
+    "commands/neural.js": 30_000,
+    "memory/memory-initializer.js": 110_000,
+    "mcp-tools/memory-tools.js": 25_000,
+    "mcp-tools/hooks-tools.js": 120_000,
+    "mcp-tools/embeddings-tools.js": 30_000,
+}
+DEFAULT_SIZE = 30_000
+
+CLI = "node_modules/@claude-flow/cli"
+
+def record_ops(base="/PKG/dist/src"):
+    """[(issue, kind, relpath, old, new, replaces)] for every op in the registry, in run order.
+
+    BASE sits at the real depth of dist/src, so targets outside it (bin/cli.js,
+    as ../../bin/cli.js) keep their place in the package."""
+    issues = registry.discover()
+    ops = []
+    for issue_id in registry.order(issues):
+        def rec(kind):
+            def op(label, filepath, old, new, replaces=None):
+                ops.append((issue_id, kind, os.path.relpath(filepath, base), old, new, replaces))
+            return op
+        def rec_code(kind):
+            def op(label, filepath, code):
+                ops.append((issue_id, kind, os.path.relpath(filepath, base), None, code, None))
+            return op
+        ns = {"__name__": "__fix__", "sys": sys, "os": os, "re": __import__("re"),
+              "base": base, "services": base + "/services", "commands": base + "/commands",
+              "memory": base + "/memory", "patch": rec("one"), "patch_all": rec("all"),
+              "append": rec_code("append"), "create": rec_code("create")}
+        ns.update({name: base + "/" + rel for name, rel in TARGETS.items()})
+        with open(issues[issue_id].fix) as f:
+            exec(compile(f.read(), issues[issue_id].fix, "exec"), ns)
+    return ops
+
+def pristine_anchors(ops):
+    """{relpath: [old anchors present in an unpatched file]}.
+
+    An op whose anchor contains another op's replacement text only exists after
+    that op has run (e.g. NS-002 20g after 20f), so it is left out, as are ops
+    that rewrite another op's output (replaces=) and appends (no anchor).
+    Files only written by create() do not exist in a pristine install.
+    """
+    by_file = {}
+    for _, kind, rel, old, new, replaces in ops:
+        if kind == "create":
+            continue
+        by_file.setdefault(rel, [])
+        if kind != "append" and not replaces:
+            by_file[rel].append((old, new))
+    out = {}
+    for rel, pairs in by_file.items():
+        out[rel] = [old for old, _ in pairs
+                    if not any(n in old and o not in old for o, n in pairs if o != old)]
+    return out
+
+_TEMPLATES = [
+    "    const {a} = await {b}.{c}({d});\n",
+    "    if (!{a} || {a}.length === 0) {{ return {{ success: false, error: '{b} {c}' }}; }}\n",
+    "export function {a}({b}, {c}) {{ return {b}?.{d} ?? {c}; }}\n",
+    "    // {a} {b} {c} {d}\n",
+    "    this.{a} = new Map(); this.{b} = {c}.{d}.bind(this);\n",
+]
+
+def filler(rng, size):
+    words = lambda: "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 12)))
+    parts, n = [], 0
+    while n < size:
+        line = rng.choice(_TEMPLATES).format(a=words(), b=words(), c=words(), d=words())
+        parts.append(line)
+        n += len(line)
+    return "".join(parts)
+
+def build_file(rng, anchors, size):
+    chunk = max(size - sum(map(len, anchors)), 0) // (len(anchors) + 1)
+    parts = [filler(rng, chunk)]
+    for anchor in anchors:
+        parts.append("\n" + anchor + "\n")
+        parts.append(filler(rng, chunk))
+    return "".join(parts)
+
+def build_cache(home, versions=1, scale=1.0, seed=0, ops=None):
+    """Create VERSIONS installs under HOME/.npm/_npx. Returns their BASE dirs."""
+    rng = random.Random(seed)
+    anchors = pristine_anchors(ops if ops is not None else record_ops())
+    # Generate each file once; every simulated version gets an identical copy.
+    files = {rel: build_file(rng, olds, int(BASE_SIZES.get(rel, DEFAULT_SIZE) * scale))
+             for rel, olds in anchors.items()}
+    bases = []
+    for v in range(versions):
+        root = os.path.join(home, ".npm", "_npx", f"{v:016x}", CLI)
+        base = os.path.join(root, "dist", "src")
+        for rel, code in files.items():
+            path = os.path.join(base, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(code)
+        # find_installs() keys on memory-initializer.js; keep one even if no fix targets it.
+        mi = os.path.join(base, "memory", "memory-initializer.js")
+        if not os.path.exists(mi):
+            os.makedirs(os.path.dirname(mi), exist_ok=True)
+            open(mi, "w").close()
+        with open(os.path.join(root, "package.json"), "w") as f:
+            f.write(f'{{"name": "@claude-flow/cli", "version": "3.1.0-alpha.{v}"}}\n')
+        bases.append(base)
+    return bases
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic claude-flow npx cache")
+    ap.add_argument("home", help="fake HOME to create .npm/_npx under")
+    ap.add_argument("--versions", type=int, default=1)
+    ap.add_argument("--scale", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+    for base in build_cache(args.home, args.versions, args.scale, args.seed):
+        print(base)
+
+if __name__ == "__main__":
+    main()
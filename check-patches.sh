@@ -1,45 +1,24 @@
 #!/bin/bash
 # Patch sentinel — checks if claude-flow patches are applied
 # On session start: detects wipe, auto-reapplies, warns user
+#
+# patch-all.sh records size/mtime/hash of every file it touched in a manifest
+# (~/.cache/claude-patch/manifest.json). The sentinel only stats those files;
+# content checks run only for files that changed, and report per issue ID.
 
-MEMORY=$(find ~/.npm/_npx -name "memory-initializer.js" -path "*/memory/*" 2>/dev/null | head -1)
-SERVICES=$(find ~/.npm/_npx -name "worker-daemon.js" -path "*/services/*" 2>/dev/null | head -1)
-
-if [ -z "$MEMORY" ] || [ -z "$SERVICES" ]; then
-  echo "[PATCHES] WARN: Cannot find claude-flow CLI files"
-  exit 0
-fi
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
-VERSION=$(grep -o '"version":"[^"]*"' "$(dirname "$MEMORY")/../../package.json" 2>/dev/null | cut -d'"' -f4)
-COMMANDS_DIR=$(dirname "$SERVICES")/../commands
-MCP_TOOLS_DIR=$(dirname "$MEMORY")/../mcp-tools
-
-# Quick sentinel checks by issue ID:
-# EM-001 (embeddings.json), DM-002 (maxCpuLoad), DM-004 (loadEmbeddingModel),
-# DM-005 (applyTemporalDecay), UI-002 (getHNSWIndex in neural.js),
-# NS-001 (all namespaces), NS-002 (Namespace is required + cannot be 'all'),
-# NS-001 (nsFilter), NS-003 ('patterns' typo)
-if grep -q "embeddings.json" "$MEMORY" 2>/dev/null \
-   && grep -q "maxCpuLoad:" "$SERVICES" 2>/dev/null \
-   && grep -q "loadEmbeddingModel" "$SERVICES" 2>/dev/null \
-   && grep -q "applyTemporalDecay" "$SERVICES" 2>/dev/null \
-   && grep -q "getHNSWIndex" "$COMMANDS_DIR/neural.js" 2>/dev/null \
-   && grep -q "all namespaces" "$MCP_TOOLS_DIR/memory-tools.js" 2>/dev/null \
-   && grep -q "Namespace is required" "$MCP_TOOLS_DIR/memory-tools.js" 2>/dev/null \
-   && grep -q "nsFilter" "$MEMORY" 2>/dev/null \
-   && grep -q "|| 'patterns'" "$MCP_TOOLS_DIR/hooks-tools.js" 2>/dev/null \
-   && grep -q "cannot be .all." "$MCP_TOOLS_DIR/memory-tools.js" 2>/dev/null; then
-  echo "[PATCHES] OK: All patches verified (v$VERSION)"
-  exit 0
-fi
+python3 "$SCRIPT_DIR/lib/sentinel.py"
+case $? in
+  0) exit 0 ;;
+  2) exit 0 ;;  # no claude-flow CLI in npx cache — nothing to patch
+esac
 
 # Patches wiped — auto-reapply and warn
-SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-
 echo ""
 echo "============================================"
 echo "  WARNING: claude-flow patches were wiped!"
-echo "  Likely cause: npx cache update (v$VERSION)"
+echo "  Likely cause: npx cache update"
 echo "============================================"
 echo ""
 
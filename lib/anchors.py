@@ -0,0 +1,146 @@
+# anchors.py — one anchor index per target file, shared by every op on it
+#
+# All old/new strings registered against a file are located in one sweep over
+# the buffer: each distinct anchor is searched exactly once (str.find runs in
+# C), however many ops share it. plan() then resolves the ops against the
+# index and apply() rebuilds the buffer once, edits in offset order.
+#
+# A pure-Python Aho-Corasick automaton was tried for the sweep: on a 150KB
+# dist file with 60 anchors it took ~60ms (build + scan) against ~1.5ms for
+# the per-anchor C sweep, so the automaton is not used.
+
+import time
+
+def find_all(text, pattern):
+    """Offsets of every (possibly overlapping) occurrence of PATTERN in TEXT."""
+    hits = []
+    i = text.find(pattern)
+    while i != -1:
+        hits.append(i)
+        i = text.find(pattern, i + 1)
+    return hits
+
+class AnchorIndex:
+    """Offsets of every distinct anchor in one buffer, and how long each took to find."""
+
+    def __init__(self, text, anchors):
+        self.text = text
+        self.hits = {}
+        self.times = {}
+        for a in set(anchors):
+            if a:
+                t = time.perf_counter()
+                self.hits[a] = find_all(text, a)
+                self.times[a] = time.perf_counter() - t
+
+    def has(self, anchor):
+        return bool(self.hits.get(anchor))
+
+    def spans(self, anchor):
+        return [(i, i + len(anchor)) for i in self.hits.get(anchor, ())]
+
+def _overlaps(span, spans):
+    return any(span[0] < e and s < span[1] for s, e in spans)
+
+def _inside(span, spans):
+    return any(s <= span[0] and span[1] <= e for s, e in spans)
+
+def _replaced(op, index, ops, seen=()):
+    """An op that rewrites OP's inserted text (see "replaces") is in place."""
+    return any(op["label"] in o["replaces"] and o["label"] not in seen
+               and (index.has(o["new"]) or _replaced(o, index, ops, seen + (op["label"],)))
+               for o in ops)
+
+def plan(text, ops):
+    """Resolve OPS (in registration order) against TEXT in one pass.
+
+    Each op is a dict with "kind" ("one" = first occurrence, "all", "append",
+    "create" = the whole buffer),
+    "old", "new", "label" and "replaces" (labels of ops whose inserted text it
+    rewrites). Returns (edits, outcomes, deferred, index):
+      edits    — [(start, end, replacement, op)], non-overlapping
+      outcomes — {id(op): ("skipped" | "warn" | "conflict", detail)}
+      deferred — ops that must be re-planned against the edited text, because
+                 an earlier op in this pass rewrites or re-creates their anchor
+      index    — the AnchorIndex, for per-anchor timings
+    """
+    index = AnchorIndex(text, [a for op in ops for a in (op["old"], op["new"])])
+    # Text that ops have already inserted: an anchor matching inside it would
+    # patch another fix's output (e.g. EM-001 "9: HNSW metadata guard" vs the
+    # block GV-001 adds to deleteEntry()), unless the op declares it replaces it.
+    inserted = {id(op): index.spans(op["new"]) for op in ops}
+    edits, outcomes, deferred, claimed = [], {}, [], []
+    for op in ops:
+        old, new = op["old"], op["new"]
+        if op["kind"] == "create":
+            if text == new or _replaced(op, index, ops):
+                outcomes[id(op)] = ("skipped", None)
+            elif edits:
+                deferred.append(op)
+            else:
+                edits.append((0, len(text), new, op))
+                claimed.append((0, len(text)))
+            continue
+        if op["kind"] == "append":
+            if index.has(new) or any(new in e[2] for e in edits) or _replaced(op, index, ops):
+                outcomes[id(op)] = ("skipped", None)
+            else:
+                edits.append((len(text), len(text), new, op))
+            continue
+        if op["kind"] == "all":
+            if index.has(new) and not index.has(old):
+                outcomes[id(op)] = ("skipped", None)
+                continue
+        elif index.has(new) or any(new in e[2] for e in edits):
+            outcomes[id(op)] = ("skipped", None)
+            continue
+        if _replaced(op, index, ops):
+            outcomes[id(op)] = ("skipped", None)
+            continue
+        spans = index.spans(old)
+        if not spans:
+            # May only exist once an earlier op has run (e.g. NS-002 20f -> 20g).
+            if edits:
+                deferred.append(op)
+            else:
+                outcomes[id(op)] = ("warn", None)
+            continue
+        if op["kind"] == "one":
+            spans = spans[:1]
+            # An earlier edit in this pass inserts a copy of our anchor ahead of
+            # the one we found; sequential semantics would match that one instead.
+            if any(old in e[2] and e[0] <= spans[0][0] for e in edits):
+                deferred.append(op)
+                continue
+            owners = [o for o in ops if o is not op and o["label"] not in op["replaces"]]
+            others = [s for o in owners for s in inserted[id(o)]]
+            if _inside(spans[0], others):
+                owner = next(o for o in owners if _inside(spans[0], inserted[id(o)]))
+                outcomes[id(op)] = ("conflict", owner["label"])
+                continue
+        else:
+            # Overlapping matches of one pattern: keep the leftmost, like str.replace.
+            kept = []
+            for s in spans:
+                if not kept or s[0] >= kept[-1][1]:
+                    kept.append(s)
+            spans = kept
+        if any(_overlaps(s, claimed) for s in spans):
+            deferred.append(op)
+            continue
+        for s in spans:
+            edits.append((s[0], s[1], new, op))
+            claimed.append(s)
+    # Stable: appends at the same offset keep registration order.
+    edits.sort(key=lambda e: e[0])
+    return edits, outcomes, deferred, index
+
+def apply(text, edits):
+    """Rebuild TEXT with non-overlapping EDITS (sorted by offset) in one join."""
+    parts, pos = [], 0
+    for start, end, replacement, _ in edits:
+        parts.append(text[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
@@ -1,63 +1,342 @@
 # common.py — shared patch infrastructure
 # Extracted from apply-patches.sh. Provides patch()/patch_all() + path variables.
+#
+# Ops never touch the disk directly. patch()/patch_all() only register an op
+# against its target file (read once, on first use). commit() resolves all ops
+# on a file against one shared anchor index (anchors.py), rebuilds the buffer
+# with the edits in offset order, and writes it back once via temp file +
+# rename. An ERROR in any op on a file rolls back all ops on that file
+# (WARN = anchor drift, not a failure).
+#
+# All state lives on a PatchSession (one per install), so several installs can
+# be patched side by side. fix.py files run inside session.namespace() and see
+# the same globals they always have: patch, patch_all, base, MI, WD, ...
 
-import sys, os, re
+import sys, os, re, json, stat, time, tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-base = os.environ.get("BASE") or sys.exit("No BASE")
-services = base + "/services"
-commands = base + "/commands"
-memory = base + "/memory"
+import anchors
 
-applied = 0
-skipped = 0
+COMMIT_THREADS = 4
 
-def patch(label, filepath, old, new):
-    global applied, skipped
+# ── Target file paths (relative to BASE) ──
+TARGETS = {
+    "HWE": "services/headless-worker-executor.js",
+    "WD": "services/worker-daemon.js",
+    "DJ": "commands/daemon.js",
+    "DOC": "commands/doctor.js",
+    "MI": "memory/memory-initializer.js",
+
+    "MCP_MEMORY": "mcp-tools/memory-tools.js",
+    "MCP_HOOKS": "mcp-tools/hooks-tools.js",
+    "CLI_MEMORY": "commands/memory.js",
+    "EMB_TOOLS": "mcp-tools/embeddings-tools.js",
+}
+
+class _FileTxn:
+    """Pending edits for one target file."""
+
+    def __init__(self, filepath, missing_ok=False):
+        self.filepath = filepath
+        t = time.perf_counter()
+        self.stamp = _stamp(filepath)
+        if self.stamp is None and not missing_ok:
+            raise FileNotFoundError(f"No such file: {filepath}")
+        # A file a create() op will write: empty buffer, stamp None until then.
+        self.exists = self.stamp is not None
+        self.mode = stat.S_IMODE(os.stat(filepath).st_mode) if self.exists else 0o644
+        self.original = ""
+        if self.exists:
+            with open(filepath, 'r') as f:
+                self.original = f.read()
+        self.code = self.original
+        self.ops = []
+        self.error = None
+        self.stats = {"file": filepath, "bytes_read": self.stamp[0] if self.exists else 0, "bytes_written": 0,
+                      "read_ms": (time.perf_counter() - t) * 1000, "resolve_ms": 0.0,
+                      "write_ms": 0.0, "passes": 0, "ops": 0}
+
+def _stamp(filepath):
+    """(size, mtime_ns) of FILEPATH, or None if it does not exist."""
     try:
-        with open(filepath, 'r') as f:
-            code = f.read()
-        if new in code:
-            skipped += 1
-            return
-        if old not in code:
-            print(f"  WARN: {label} — pattern not found (code may have changed)")
-            return
-        code = code.replace(old, new, 1)
-        with open(filepath, 'w') as f:
-            f.write(code)
-        print(f"  Applied: {label}")
-        applied += 1
-    except Exception as e:
-        print(f"  ERROR: {label} — {e}")
-
-def patch_all(label, filepath, old, new):
-    """Replace ALL occurrences"""
-    global applied, skipped
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def _atomic_write(filepath, code, mode):
+    fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(filepath) + ".",
+                               suffix=".tmp", dir=os.path.dirname(filepath))
     try:
-        with open(filepath, 'r') as f:
-            code = f.read()
-        if new in code and old not in code:
-            skipped += 1
-            return
-        if old not in code:
-            print(f"  WARN: {label} — pattern not found")
-            return
-        code = code.replace(old, new)
-        with open(filepath, 'w') as f:
+        with os.fdopen(fd, 'w') as f:
             f.write(code)
-        print(f"  Applied: {label}")
-        applied += 1
-    except Exception as e:
-        print(f"  ERROR: {label} — {e}")
-
-# ── Target file paths ──
-HWE = services + "/headless-worker-executor.js"
-WD = services + "/worker-daemon.js"
-DJ = commands + "/daemon.js"
-DOC = commands + "/doctor.js"
-MI = memory + "/memory-initializer.js"
-
-MCP_MEMORY = base + "/mcp-tools/memory-tools.js"
-MCP_HOOKS = base + "/mcp-tools/hooks-tools.js"
-CLI_MEMORY = commands + "/memory.js"
-EMB_TOOLS = base + "/mcp-tools/embeddings-tools.js"
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+def read_version(base):
+    """Package version of the install at BASE (dist/src), or None."""
+    try:
+        with open(os.path.join(base, "..", "..", "package.json")) as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+def issue_id(fix_path):
+    """'.../NS-002-targeted-require-namespace/fix.py' -> 'NS-002'"""
+    folder = os.path.basename(os.path.dirname(os.path.abspath(fix_path)))
+    m = re.match(r"[A-Z]+-\d+", folder)
+    return m.group(0) if m else folder
+
+class _Log:
+    """Messages and counts from committing one file, merged into the session afterwards."""
+
+    def __init__(self):
+        self.lines = []
+        self.stats = None
+        self.applied = self.skipped = self.warnings = self.errors = 0
+
+    def warn(self, msg):
+        self.warnings += 1
+        self.lines.append(f"  WARN: {msg}")
+
+    def error(self, msg):
+        self.errors += 1
+        self.lines.append(f"  ERROR: {msg}")
+
+class PatchSession:
+    """Patch state for one install: its BASE, counters and open file transactions."""
+
+    def __init__(self, base, echo=print, dry_run=False):
+        self.base = base
+        self.services = base + "/services"
+        self.commands = base + "/commands"
+        self.memory = base + "/memory"
+        self.echo = echo
+        self.dry_run = dry_run
+        self.issue = None
+        self.targets = None
+        self.ops = []
+        self.files = []
+        self.file_stats = []
+        self.applied = 0
+        self.skipped = 0
+        self.warnings = 0
+        self.errors = 0
+        self._txns = {}
+
+    def _txn(self, filepath, missing_ok=False):
+        txn = self._txns.get(filepath)
+        if txn is None:
+            txn = self._txns[filepath] = _FileTxn(filepath, missing_ok)
+            self.files.append(filepath)
+        return txn
+
+    def _op(self, label, filepath, kind):
+        # bytes_read: file size, charged to the op that loaded the file.
+        # bytes_written: replacement text this op contributed to the buffer.
+        op = {"issue": self.issue, "label": label, "file": filepath, "kind": kind,
+              "status": "error", "replacements": 0, "match_ms": 0.0,
+              "bytes_read": 0, "bytes_written": 0}
+        self.ops.append(op)
+        return op
+
+    def _warn(self, msg):
+        self.warnings += 1
+        self.echo(f"  WARN: {msg}")
+
+    def _error(self, msg):
+        self.errors += 1
+        self.echo(f"  ERROR: {msg}")
+
+    def _register(self, kind, label, filepath, old, new, replaces=None):
+        op = self._op(label, filepath, kind)
+        txn = None
+        try:
+            rel = os.path.relpath(filepath, self.base)
+            if self.targets is not None and rel not in self.targets:
+                raise ValueError(f"{rel} not declared in {self.issue} patch.json")
+            loaded = filepath in self._txns
+            txn = self._txn(filepath, missing_ok=kind == "create")
+            if not txn.exists and kind != "create" and not any(o["kind"] == "create" for o in txn.ops):
+                raise FileNotFoundError(f"No such file: {filepath}")
+            if not loaded:
+                op["bytes_read"] = txn.stats["bytes_read"]
+            if txn.error:
+                self._error(f"{label} — not applied, earlier op on this file failed")
+                return
+            if kind in ("append", "create"):
+                if not isinstance(new, str) or not new:
+                    raise TypeError("code must be a non-empty string")
+            elif not isinstance(old, str) or not isinstance(new, str) or not old:
+                raise TypeError("old/new must be strings and old must be non-empty")
+            if isinstance(replaces, str):
+                replaces = (replaces,)
+            op["status"] = "pending"
+            txn.ops.append({"kind": kind, "label": label, "old": old, "new": new,
+                            "replaces": tuple(replaces or ()), "rec": op})
+        except Exception as e:
+            if txn:
+                txn.error = e
+            self._error(f"{label} — {e}")
+
+    def patch(self, label, filepath, old, new, replaces=None):
+        """Replace the first occurrence of OLD.
+
+        REPLACES names the label(s) of earlier ops whose inserted text this op
+        rewrites (OLD lies inside their NEW). Once this op is in place those
+        ops count as in place too, instead of re-applying or drifting.
+        """
+        self._register("one", label, filepath, old, new, replaces)
+
+    def patch_all(self, label, filepath, old, new, replaces=None):
+        """Replace ALL occurrences"""
+        self._register("all", label, filepath, old, new, replaces)
+
+    def append(self, label, filepath, code):
+        """Add module-level CODE at the end of the file (skipped if already present)."""
+        self._register("append", label, filepath, None, code)
+
+    def create(self, label, filepath, code):
+        """Write a patch-owned module. Skipped if the file already holds exactly CODE."""
+        self._register("create", label, filepath, None, code)
+
+    def _resolve(self, txn, log):
+        """Run every op registered on TXN against its buffer, one anchor sweep per pass.
+
+        Ops whose anchor only appears after an earlier op has run are planned
+        again against the edited buffer, so chained ops keep their sequential
+        meaning. Returns the ops that changed the buffer, in registration order.
+        """
+        code, todo = txn.original, txn.ops
+        while todo:
+            txn.stats["passes"] += 1
+            edits, outcomes, deferred, index = anchors.plan(code, todo)
+            for op in todo:
+                op["rec"]["match_ms"] += (index.times.get(op["old"], 0) + index.times.get(op["new"], 0)) * 1000
+            for _, _, new, op in edits:
+                op["rec"]["replacements"] += 1
+                op["rec"]["bytes_written"] += len(new)
+            for op in todo:
+                status, detail = outcomes.get(id(op), (None, None))
+                if status is None:
+                    continue
+                op["rec"]["status"] = status
+                if status == "skipped":
+                    log.skipped += 1
+                elif status == "warn":
+                    hint = " (code may have changed)" if op["kind"] == "one" else ""
+                    log.warn(f"{op['label']} — pattern not found{hint}")
+                else:
+                    log.warn(f"{op['label']} — anchor lies inside text inserted by '{detail}', not applied")
+            if edits:
+                code = anchors.apply(code, edits)
+            todo = deferred
+        txn.code = code
+        return [op for op in txn.ops if op["rec"]["status"] == "pending"]
+
+    def _commit_file(self, filepath, txn):
+        """Resolve and write one file. Thread-safe: reports through its own _Log."""
+        log = _Log()
+        log.stats = txn.stats
+        txn.stats["ops"] = len(txn.ops)
+        changed = []
+        if not txn.error:
+            t = time.perf_counter()
+            try:
+                changed = self._resolve(txn, log)
+                txn.stats["resolve_ms"] = (time.perf_counter() - t) * 1000
+            except Exception as e:
+                txn.error = e
+                log.error(f"{filepath} — {e}")
+        if txn.error:
+            if txn.ops:
+                log.error(f"{filepath} — rolled back {len(txn.ops)} op(s)")
+            for op in txn.ops:
+                op["rec"]["status"] = "error"
+            return log
+        if not changed or self.dry_run:
+            return log
+        try:
+            t = time.perf_counter()
+            if _stamp(filepath) != txn.stamp:
+                raise RuntimeError("file changed on disk during patching")
+            if not txn.exists:
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            _atomic_write(filepath, txn.code, txn.mode)
+            txn.stats["write_ms"] = (time.perf_counter() - t) * 1000
+            txn.stats["bytes_written"] = os.path.getsize(filepath)
+        except Exception as e:
+            log.error(f"{filepath} — rolled back {len(changed)} op(s): {e}")
+            for op in changed:
+                op["rec"]["status"] = "error"
+            return log
+        for op in changed:
+            op["rec"]["status"] = "applied"
+            log.lines.append(f"  Applied: {op['label']}")
+        log.applied += len(changed)
+        return log
+
+    def commit(self, jobs=COMMIT_THREADS):
+        """Resolve and write each file's ops. Files with a failed op are left untouched.
+
+        Every file is its own transaction, so files are committed concurrently
+        (issues in independent groups never share a file). In a dry run nothing
+        is written; ops that would apply stay "pending".
+        """
+        items = list(self._txns.items())
+        if jobs > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+                logs = list(pool.map(lambda item: self._commit_file(*item), items))
+        else:
+            logs = [self._commit_file(f, txn) for f, txn in items]
+        for log in logs:
+            self.file_stats.append(log.stats)
+            for line in log.lines:
+                self.echo(line)
+            self.applied += log.applied
+            self.skipped += log.skipped
+            self.warnings += log.warnings
+            self.errors += log.errors
+        self._txns.clear()
+
+    def issues(self):
+        """{issue: {"ops": [labels in place], "missing": [labels not in place]}}"""
+        out = {}
+        for op in self.ops:
+            entry = out.setdefault(op["issue"], {"ops": [], "missing": []})
+            in_place = op["status"] in ("applied", "skipped")
+            entry["ops" if in_place else "missing"].append(op["label"])
+        return out
+
+    def namespace(self):
+        """Globals a fix.py runs with."""
+        ns = {
+            "__name__": "__fix__",
+            "sys": sys, "os": os, "re": re,
+            "base": self.base,
+            "services": self.services,
+            "commands": self.commands,
+            "memory": self.memory,
+            "patch": self.patch,
+            "patch_all": self.patch_all,
+            "append": self.append,
+            "create": self.create,
+        }
+        ns.update({name: self.base + "/" + rel for name, rel in TARGETS.items()})
+        return ns
+
+    def run_fix(self, fix_path, targets=None):
+        """Register the ops of one fix.py. TARGETS, if given, are the only files it may touch."""
+        self.issue = issue_id(fix_path)
+        self.targets = set(targets) if targets is not None else None
+        with open(fix_path) as f:
+            src = f.read()
+        exec(compile(src, fix_path, "exec"), self.namespace())
@@ -0,0 +1,54 @@
+# manifest.py — fingerprints of every file a patch run touched
+# Written by runner.py after each run, read by sentinel.py on session start.
+#
+# {
+#   "installs": {
+#     "<BASE>": {
+#       "version": "3.1.0-alpha.44",
+#       "files":  {"<path>": {"size": …, "mtime_ns": …, "sha256": "…"}},
+#       "issues": {"NS-002": {"ops": [labels in place], "missing": [labels not applied]}},
+#       "skipped": {"UI-002": "target not in this version: commands/neural.js"}
+#     }
+#   }
+# }
+
+import os, json, hashlib
+
+from common import _atomic_write
+
+def manifest_path():
+    return os.environ.get("CLAUDE_PATCH_MANIFEST") or os.path.expanduser(
+        "~/.cache/claude-patch/manifest.json")
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def fingerprint(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha256(path)}
+
+def changed(path, fp):
+    """True if PATH no longer matches fingerprint FP. Hashes only when the stat differs."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True
+    if st.st_size == fp["size"] and st.st_mtime_ns == fp["mtime_ns"]:
+        return False
+    return st.st_size != fp["size"] or sha256(path) != fp["sha256"]
+
+def load(path=None):
+    try:
+        with open(path or manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"installs": {}}
+
+def save(manifest, path=None):
+    path = path or manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, json.dumps(manifest, indent=1, sort_keys=True), 0o644)
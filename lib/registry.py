@@ -0,0 +1,125 @@
+# registry.py — issue folders, their declared targets, dependencies and versions
+#
+# Each issue folder with a fix.py declares itself in patch.json:
+#
+#   {
+#     "targets":  ["memory/memory-initializer.js"],   # relative to BASE (dist/src)
+#     "creates":  ["services/project-config.js"],     # new modules the fix writes
+#     "depends":  ["EM-001"],                         # issues that must run first
+#     "versions": ">=3.1.0-alpha.1 <3.2.0"            # optional, default: any
+#   }
+#
+# plan() orders issues topologically (ties by ID) and drops, per install, the
+# ones whose targets are missing or whose version range excludes the install.
+# Files listed under "creates" need not exist; the fix's create() writes them.
+# Only os.path.exists() is used for that; no target file is read.
+
+import os, re, json
+from collections import namedtuple
+
+Issue = namedtuple("Issue", "id dir fix targets depends versions creates")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def discover(root=ROOT):
+    """Every issue folder under ROOT that has a fix.py, keyed by issue ID."""
+    issues = {}
+    for name in sorted(os.listdir(root)):
+        d = os.path.join(root, name)
+        m = re.match(r"[A-Z]+-\d+", name)
+        if not m or not os.path.isfile(os.path.join(d, "fix.py")):
+            continue
+        try:
+            with open(os.path.join(d, "patch.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        issues[m.group(0)] = Issue(m.group(0), d, os.path.join(d, "fix.py"),
+                                   tuple(meta.get("targets", ())),
+                                   tuple(meta.get("depends", ())),
+                                   meta.get("versions"),
+                                   tuple(meta.get("creates", ())))
+    return issues
+
+def order(issues):
+    """Issue IDs in dependency order (Kahn; ties broken by ID for stable output)."""
+    for issue in issues.values():
+        for dep in issue.depends:
+            if dep not in issues:
+                raise ValueError(f"{issue.id} depends on unknown issue {dep}")
+    indegree = {i: len(issues[i].depends) for i in issues}
+    dependents = {i: [] for i in issues}
+    for issue in issues.values():
+        for dep in issue.depends:
+            dependents[dep].append(issue.id)
+    ready = sorted(i for i, n in indegree.items() if n == 0)
+    out = []
+    while ready:
+        i = ready.pop(0)
+        out.append(i)
+        for j in dependents[i]:
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                ready.append(j)
+                ready.sort()
+    if len(out) != len(issues):
+        cycle = sorted(i for i, n in indegree.items() if n)
+        raise ValueError(f"dependency cycle between {', '.join(cycle)}")
+    return out
+
+def _version_key(v):
+    core, _, pre = v.partition("-")
+    nums = tuple(int(x) if x.isdigit() else 0 for x in core.split("."))
+    nums += (0,) * (3 - len(nums))
+    # A release sorts after its prereleases: 3.1.0-alpha.9 < 3.1.0.
+    pre_key = tuple((0, int(x), "") if x.isdigit() else (1, 0, x) for x in pre.split(".")) if pre else ((2, 0, ""),)
+    return nums, pre_key
+
+def in_range(version, spec):
+    """True if VERSION satisfies SPEC, a space-separated list like '>=3.1.0 <3.2.0'."""
+    if not spec or spec == "*":
+        return True
+    if not version:
+        return False
+    for clause in spec.split():
+        m = re.match(r"(>=|<=|>|<|=)?(.+)", clause)
+        op, bound = m.group(1) or "=", _version_key(m.group(2))
+        v = _version_key(version)
+        ok = {">=": v >= bound, "<=": v <= bound, ">": v > bound,
+              "<": v < bound, "=": v == bound}[op]
+        if not ok:
+            return False
+    return True
+
+def plan(base, version, issues=None, only=None):
+    """(issues to run in order, {issue ID: skip reason}) for one install.
+
+    ONLY restricts the run to those IDs plus everything they depend on.
+    """
+    issues = issues if issues is not None else discover()
+    ids = order(issues)
+    if only:
+        wanted, stack = set(), list(only)
+        while stack:
+            i = stack.pop()
+            if i not in issues:
+                raise ValueError(f"unknown issue {i}")
+            if i not in wanted:
+                wanted.add(i)
+                stack.extend(issues[i].depends)
+        ids = [i for i in ids if i in wanted]
+    run, skipped = [], {}
+    for i in ids:
+        issue = issues[i]
+        missing_deps = [d for d in issue.depends if d in skipped]
+        if missing_deps:
+            skipped[i] = f"depends on skipped {', '.join(missing_deps)}"
+        elif not in_range(version, issue.versions):
+            skipped[i] = f"v{version} outside {issue.versions}"
+        else:
+            absent = [t for t in issue.targets if not os.path.exists(os.path.join(base, t))]
+            if absent:
+                skipped[i] = f"target not in this version: {', '.join(absent)}"
+            else:
+                run.append(issue)
+    return run, skipped
@@ -0,0 +1,190 @@
+# runner.py — runs the issue registry against one or more claude-flow installs
+# Called by patch-all.sh. Issues come from registry.py (patch.json in each
+# folder), in dependency order. Each install gets its own PatchSession; with --all,
+# every install in the npx cache is patched in parallel with a process pool.
+# After the run, every touched file is fingerprinted into the manifest that
+# check-patches.sh (sentinel.py) verifies on session start, and per-op timings
+# and outcomes go to a JSON run report (--report).
+
+import sys, os, glob, json, time, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import PatchSession, read_version, _atomic_write
+import manifest, registry
+
+NPX_GLOB = "~/.npm/_npx/*/node_modules/@claude-flow/cli/dist/src/memory/memory-initializer.js"
+
+def find_installs():
+    """BASE dirs of every cached install, most recently modified first."""
+    hits = glob.glob(os.path.expanduser(NPX_GLOB))
+    hits.sort(key=os.path.getmtime, reverse=True)
+    return [os.path.dirname(os.path.dirname(h)) for h in hits]
+
+def _run(session, only=None):
+    run, skipped = registry.plan(session.base, read_version(session.base), only=only)
+    for issue_id, reason in skipped.items():
+        session.echo(f"  SKIP: {issue_id} — {reason}")
+    for issue in run:
+        try:
+            session.run_fix(issue.fix, (issue.targets + issue.creates) or None)
+        except Exception as e:
+            session._error(f"{issue.id} — {e}")
+    session.commit()
+    return skipped
+
+def patch_install(base, only=None):
+    """Apply the registry to one install. Runs in a pool worker; returns a plain dict."""
+    lines = []
+    t = time.perf_counter()
+    session = PatchSession(base, echo=lines.append)
+    skipped = _run(session, only)
+    return {
+        "elapsed_ms": (time.perf_counter() - t) * 1000,
+        "base": base,
+        "version": read_version(base),
+        "applied": session.applied,
+        "skipped": session.skipped,
+        "warnings": session.warnings,
+        "errors": session.errors,
+        "lines": lines,
+        "files": {p: manifest.fingerprint(p) for p in session.files if os.path.exists(p)},
+        "issues": session.issues(),
+        "skipped_issues": skipped,
+        "ops": session.ops,
+        "file_stats": session.file_stats,
+    }
+
+def check_install(base, only=None):
+    """Dry-run the registry against one install without writing.
+
+    Returns {issue: [labels that would still apply]} for issues not fully in place.
+    """
+    session = PatchSession(base, echo=lambda line: None, dry_run=True)
+    _run(session, only)
+    pending = {}
+    for op in session.ops:
+        if op["status"] == "pending":
+            pending.setdefault(op["issue"], []).append(op["label"])
+    return pending
+
+def record(results):
+    """Merge this run's fingerprints into the manifest; drop installs that are gone."""
+    m = manifest.load()
+    installs = {b: v for b, v in m.get("installs", {}).items() if os.path.isdir(b)}
+    for r in results:
+        installs[r["base"]] = {"version": r["version"], "files": r["files"],
+                               "issues": r["issues"], "skipped": r["skipped_issues"]}
+    m["installs"] = installs
+    manifest.save(m)
+
+def group_by_version(results):
+    groups = {}
+    for r in results:
+        groups.setdefault(r["version"] or "unknown", []).append(r)
+    return groups
+
+def print_report(results):
+    for r in results:
+        print(f"[PATCHES] Patching v{r['version'] or '?'} at: {r['base']}")
+        for line in r["lines"]:
+            print(line)
+    applied = sum(r["applied"] for r in results)
+    skipped = sum(r["skipped"] for r in results)
+    if len(results) == 1:
+        print(f"\n[PATCHES] Done: {applied} applied, {skipped} already present")
+        return
+    print(f"\n[PATCHES] Done: {len(results)} installs, {applied} applied, {skipped} already present")
+    for version, group in sorted(group_by_version(results).items()):
+        print(f"  v{version}: {len(group)} install(s), "
+              f"{sum(r['applied'] for r in group)} applied, "
+              f"{sum(r['skipped'] for r in group)} already present, "
+              f"{sum(r['warnings'] for r in group)} warn, "
+              f"{sum(r['errors'] for r in group)} error")
+
+def report_path():
+    return os.environ.get("CLAUDE_PATCH_REPORT") or os.path.expanduser(
+        "~/.cache/claude-patch/report.json")
+
+def write_report(results, path, elapsed_ms):
+    """Machine-readable run report: per install, every op and every file with timings."""
+    report = {
+        "finished": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "elapsed_ms": round(elapsed_ms, 3),
+        "installs": [{
+            "base": r["base"],
+            "version": r["version"],
+            "elapsed_ms": round(r["elapsed_ms"], 3),
+            "applied": r["applied"],
+            "skipped": r["skipped"],
+            "warnings": r["warnings"],
+            "errors": r["errors"],
+            "skipped_issues": r["skipped_issues"],
+            "files": r["file_stats"],
+            "ops": r["ops"],
+        } for r in results],
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, json.dumps(report, indent=1), 0o644)
+
+def print_timings(results, top=3):
+    """Short summary: slowest files and ops, and anchors that drifted to WARN."""
+    files = sorted((f for r in results for f in r["file_stats"]),
+                   key=lambda f: f["read_ms"] + f["resolve_ms"] + f["write_ms"], reverse=True)
+    ops = sorted((o for r in results for o in r["ops"]), key=lambda o: o["match_ms"], reverse=True)
+    if files:
+        print("[PATCHES] Slowest files: " + ", ".join(
+            f"{os.path.basename(f['file'])} {f['read_ms'] + f['resolve_ms'] + f['write_ms']:.1f}ms"
+            for f in files[:top]))
+    if ops:
+        print("[PATCHES] Slowest ops: " + ", ".join(
+            f"{o['issue']} '{o['label']}' {o['match_ms']:.2f}ms" for o in ops[:top]))
+    drift = sorted({(o["issue"], o["label"]) for r in results for o in r["ops"]
+                    if o["status"] in ("warn", "conflict")})
+    if drift:
+        print(f"[PATCHES] Drifting anchors: {len(drift)} (" +
+              ", ".join(f"{i} '{l}'" for i, l in drift[:top]) +
+              (", …" if len(drift) > top else "") + ")")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Apply claude-flow patches")
+    ap.add_argument("--all", action="store_true", help="patch every install in the npx cache")
+    ap.add_argument("--base", action="append", default=[], help="install dist/src dir (repeatable)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="parallel installs with --all")
+    ap.add_argument("--report", default=report_path(), help="JSON run report path")
+    ap.add_argument("only", nargs="*", metavar="ISSUE",
+                    help="only these issue IDs (plus their dependencies); default: all")
+    args = ap.parse_args(argv)
+
+    bases = args.base or ([os.environ["BASE"]] if os.environ.get("BASE") else [])
+    if not bases:
+        found = find_installs()
+        bases = found if args.all else found[:1]
+    if not bases:
+        print("[PATCHES] No claude-flow CLI found in npx cache")
+        return 1
+
+    # Same-version installs stay adjacent in the report.
+    bases.sort(key=lambda b: read_version(b) or "")
+    only = args.only or None
+    t = time.perf_counter()
+    if len(bases) == 1 or args.jobs <= 1:
+        results = [patch_install(b, only) for b in bases]
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(bases))) as pool:
+            results = list(pool.map(patch_install, bases, [only] * len(bases)))
+    print_report(results)
+    print_timings(results)
+    try:
+        record(results)
+    except OSError as e:
+        print(f"[PATCHES] WARN: could not write manifest — {e}")
+    try:
+        write_report(results, args.report, (time.perf_counter() - t) * 1000)
+        print(f"[PATCHES] Report: {args.report}")
+    except OSError as e:
+        print(f"[PATCHES] WARN: could not write report — {e}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+// MS-001 replay against real sql.js: pending writes are journaled once and
+// replayed onto a memory.db that another process changed in the meantime.
+//
+//   node --test tests/*.test.mjs
+//
+// sql.js comes from SQLJS_DIR, else from a claude-flow npx cache under
+// ~/.npm/_npx (it is a @claude-flow/cli dependency); skipped if neither exists.
+import { test } from 'node:test';
+import assert from 'node:assert/strict';
+import fs from 'node:fs';
+import os from 'node:os';
+import path from 'node:path';
+import { createRequire } from 'node:module';
+import { fileURLToPath, pathToFileURL } from 'node:url';
+
+const repo = path.dirname(path.dirname(fileURLToPath(import.meta.url)));
+
+function findSqlJs() {
+    if (process.env.SQLJS_DIR) return process.env.SQLJS_DIR;
+    const npx = path.join(os.homedir(), '.npm', '_npx');
+    let hashes = [];
+    try { hashes = fs.readdirSync(npx); } catch { return null; }
+    for (const hash of hashes) {
+        const dir = path.join(npx, hash, 'node_modules', 'sql.js');
+        if (fs.existsSync(path.join(dir, 'package.json'))) return dir;
+    }
+    return null;
+}
+
+// memory-store.js as MS-001's fix.py creates it, beside a stub project-config.
+function installMemoryStore(dir) {
+    const fix = fs.readFileSync(path.join(repo, 'MS-001-coalesced-db-writes', 'fix.py'), 'utf-8');
+    const source = fix.split('MEMORY_STORE,\n    """')[1].split('""")')[0].replace(/\\\\/g, '\\');
+    fs.mkdirSync(path.join(dir, 'memory'), { recursive: true });
+    fs.mkdirSync(path.join(dir, 'services'), { recursive: true });
+    fs.writeFileSync(path.join(dir, 'memory', 'memory-store.js'), source);
+    fs.writeFileSync(path.join(dir, 'services', 'project-config.js'),
+        "export function readProjectConfig() { return { memory: { sqlite: 'sql.js', flushMs: 60000 } }; }\n");
+    fs.writeFileSync(path.join(dir, 'package.json'), '{"type":"module"}');
+    return path.join(dir, 'memory', 'memory-store.js');
+}
+
+const sqlJsDir = findSqlJs();
+
+test('MS-001 replays pending writes once onto a changed file', { skip: !sqlJsDir && 'sql.js not found (set SQLJS_DIR)' }, async () => {
+    const SQL = await createRequire(import.meta.url)(sqlJsDir)();
+    const dir = fs.mkdtempSync(path.join(os.tmpdir(), 'ms001-'));
+    const store = await import(pathToFileURL(installMemoryStore(dir)).href);
+    const dbPath = path.join(dir, 'memory.db');
+    const seed = new SQL.Database();
+    seed.run('CREATE TABLE entries (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT)');
+    seed.run('CREATE TABLE counters (name TEXT PRIMARY KEY, n INTEGER)');
+    seed.run("INSERT INTO counters VALUES ('hits', 0)");
+    fs.writeFileSync(dbPath, Buffer.from(seed.export()));
+    const otherProcessWrites = (key) => {
+        const other = new SQL.Database(fs.readFileSync(dbPath));
+        other.run('INSERT INTO entries (key) VALUES (?)', [key]);
+        fs.writeFileSync(dbPath, Buffer.from(other.export()));
+        other.close();
+        const t = new Date(Date.now() + 5000);
+        fs.utimesSync(dbPath, t, t); // a distinct mtime even on coarse clocks
+    };
+    const rows = (sql) => {
+        const db = new SQL.Database(fs.readFileSync(dbPath));
+        try { return db.exec(sql)[0]?.values ?? []; } finally { db.close(); }
+    };
+
+    const db = await store.openMemoryDb(SQL, dbPath);
+    db.run('INSERT INTO entries (key) VALUES (?)', ['mine']);                  // Database.run with params
+    db.run('UPDATE counters SET n = n + ? WHERE name = ?', [1, 'hits']);
+    db.prepare('INSERT INTO entries (key) VALUES (?)').run(['prepared']);       // Statement.run
+    store.persistMemoryDb(dbPath, db);
+    db.close();
+
+    otherProcessWrites('theirs');
+    store.flushMemoryDb(dbPath);
+
+    assert.deepEqual(rows('SELECT key FROM entries ORDER BY id').map((r) => r[0]).sort(), ['mine', 'prepared', 'theirs']);
+    assert.deepEqual(rows("SELECT n FROM counters WHERE name = 'hits'"), [[1]]);
+    assert.equal(store.getMemoryStoreStatus()[0].mergeConflicts, 0);
+
+    // A copy a caller still holds survives a reload, and its writes reach the new copy.
+    const held = await store.openMemoryDb(SQL, dbPath);
+    otherProcessWrites('reload');
+    const current = await store.openMemoryDb(SQL, dbPath);
+    assert.notEqual(held, current);
+    held.run('INSERT INTO entries (key) VALUES (?)', ['late']);
+    store.persistMemoryDb(dbPath, held);
+    held.close();
+    current.close();
+    store.flushMemoryDb(dbPath);
+    assert.deepEqual(rows('SELECT key FROM entries ORDER BY id').map((r) => r[0]).sort(), ['late', 'mine', 'prepared', 'reload', 'theirs']);
+});